@@ -8,37 +8,26 @@ Created: 24 September 2011
 Licensed under: GNU General Public License v2
 """
 
-import os
 import sys
 from pprint import pprint
-import pickle
 from sets import Set
+from scoring import aminoAcids,encodeSequence,encodePair,decodeSequence,createSubstitutionMatrix,createProfile
+from matrices import scoringMatrices,getMatrix
+from result import AlignmentResult,SILENT,SUMMARY,FULL,verbosityLevels
+from stats import startStats,markStats,finishStats
+from wavefront import wavefrontLinear
+from tiled import tiledAlign
+from trie import trieAlign
+try:
+	import numpy
+except ImportError:
+	numpy = None # only needed by the numpy engine
 
-scoringMatrices = ["blosum50"] #Currently only supporting BLOSUM50
-aminoAcids = "ARNDCQEGHILKMFPSTWYV"
+MININF = float("-inf") # minus infinity in Pyhton
+engines = ["python","numpy","wfa","tiled"]
 trace = {-1:'-',0:'\\',1:'|',2:'-',3:' '}
 
-def readScoringMatrix(matrixName):
-	"""Read the scoring matrix (either from a pickle file, if it exists, or from 
-	a text file - if none exists, returns None). 
-	"""
-	
-	matrix = None
-	if os.path.isfile(matrixName+".p"):
-		pckl_file = open(matrixName+".p","rb")
-		matrix = pickle.load(pckl_file)
-		pckl_file.close()
-	elif os.path.isfile(matrixName+".txt"):
-		lines = open(matrixName+".txt","r").readlines()
-		matrix = []
-		for line in lines:
-			matrix.append(line.rstrip().split("\t"))
-		pckl_file = open(matrixName+".p","wb")
-		pickle.dump(matrix,pckl_file)
-		pckl_file.close()
-	return matrix
-	
-def areArgumentsValid(seqA,seqB,gap,match,mismatch,matrixName):
+def areArgumentsValid(seqA,seqB,gap,match,mismatch,matrixName,engine="python",band=None,xdrop=None):
 	"""Verify the validity of the arguments
 	"""
 	
@@ -49,6 +38,15 @@ def areArgumentsValid(seqA,seqB,gap,match,mismatch,matrixName):
 	if matrixName and matrixName not in scoringMatrices:
 		print "Do not have the values for this matrix."
 		return False
+	if engine not in engines:
+		print "The engine should be one of: "+", ".join(engines)+"."
+		return False
+	if engine=="numpy" and numpy==None:
+		print "The numpy engine needs NumPy to be installed."
+		return False
+	if engine=="wfa" and matrixName!=None:
+		print "The wfa engine needs match and mismatch values."
+		return False
 	try:
 		int(gap)
 	except:
@@ -61,57 +59,158 @@ def areArgumentsValid(seqA,seqB,gap,match,mismatch,matrixName):
 		except:
 			print "The match and mismatch values should be integers."
 			return False		
-	if not set(aminoAcids).issuperset(set(seqA)) or not set(aminoAcids).issuperset(set(seqB)):
-		print "The sequences must be composed of aminoacids ("+aminoAcids+")."
+	try:
+		if (band!=None and int(band)<0) or (xdrop!=None and int(xdrop)<0):
+			raise ValueError
+	except:
+		print "The band and X-drop values should be positive integers."
 		return False
 	return True
 	
-def needle(seqA,seqB,gap,match=None,mismatch=None,matrixName=None):
+def needle(seqA,seqB,gap,match=None,mismatch=None,matrixName=None,linearSpace=False,engine="python",verbosity=SUMMARY,\
+	band=None,xdrop=None):
 	"""Apply Needleman-Wunch on two AA sequences (global alignment)
 	Using the linear gap model.
+	If linearSpace is True, Hirschberg's divide and conquer algorithm is 
+	used instead, keeping only O(len(seqA)+len(seqB)) values in memory.
+	If a band width and/or an X-drop value are given, only the cells of a
+	diagonal band and/or the cells scoring at most xdrop below the best one
+	are computed (see needleBanded); the result tells if the optimal path may
+	have been clipped, so the alignment can be retried with a wider band.
+	The engine ("python" or "numpy") computes the dynamic programming matrix;
+	the "tiled" engine computes it by tiles on all the cores (see tiled.py);
+	with match/mismatch values, the "wfa" engine computes the wavefronts of
+	the alignment instead (see wavefront.py), which is much faster for 
+	similar sequences.
+	The verbosity is SILENT, SUMMARY (the alignment) or FULL (also all the 
+	matrices, as in align.txt).
+	Returns an AlignmentResult (see result.py).
 	"""
 	
+	stats = startStats(seqA,seqB) # - None if the stats are off (see stats.py)
+	
 	#Verify the arguments
-	if not areArgumentsValid(seqA,seqB,gap,match,mismatch,matrixName):
+	if not areArgumentsValid(seqA,seqB,gap,match,mismatch,matrixName,engine,band,xdrop):
+		return
+	if linearSpace and (band!=None or xdrop!=None):
+		print "The linear space and banded modes can not be combined."
+		return
+	if engine in ["wfa","tiled"] and (linearSpace or band!=None or xdrop!=None):
+		print "The "+engine+" engine can not be combined with the linear space or banded modes."
 		return
 	gap=int(gap)
 	if match!=None and mismatch!=None:
 		match = int(match)
 		mismatch = int(mismatch)
 	
-	print "Aligning sequence "+seqA+" with sequence "+seqB+" using Needleman-Wunch:"
-	
-	#Compute the matrix of pair scores
+	#Encode the sequences (this also checks that they only contain aminoacids)
+	encoded = encodePair(seqA,seqB)
+	if encoded==None:
+		return
+	codesA,codesB = encoded
 	if matrixName==None:
-		pairScores = createMatrixOfPairScores(seqA,seqB,match,mismatch)
+		substitution = createSubstitutionMatrix(match,mismatch)
 	else:
-		blosum50 = readScoringMatrix(matrixName)
-		pairScores = createMatrixOfPairScores(seqA,seqB,matrix=blosum50)
-	print "Here is the matrix of pair scores for the two sequences: "
-	pprint(pairScores)
+		substitution = getMatrix(matrixName)
+	markStats(stats,"setup")
+	
+	if engine=="wfa":
+		if verbosity>=SUMMARY:
+			print "Aligning sequence "+seqA+" with sequence "+seqB+" using Needleman-Wunch (wavefront):"
+		aligned = wavefrontLinear(codesA,codesB,match,mismatch,gap)
+		markStats(stats,"fill")
+		if aligned==None:
+			return
+		score,alignedA,alignedB = aligned
+		if verbosity>=SUMMARY:
+			print "Here is a global alignment (score "+str(score)+"):"
+			print alignedA
+			print alignedB
+		return finishStats(stats,AlignmentResult(score,alignedA,alignedB,0,len(seqA),0,len(seqB)))
+	
+	if engine=="tiled":
+		if verbosity>=SUMMARY:
+			print "Aligning sequence "+seqA+" with sequence "+seqB+" using Needleman-Wunch (tiled):"
+		score,alignedA,alignedB = tiledAlign(codesA,codesB,gap,substitution,local=False)[:3]
+		markStats(stats,"fill")
+		if verbosity>=SUMMARY:
+			print "Here is a global alignment (score "+str(score)+"):"
+			print alignedA
+			print alignedB
+		return finishStats(stats,AlignmentResult(score,alignedA,alignedB,0,len(seqA),0,len(seqB)))
+	
+	if band!=None or xdrop!=None:
+		band = int(band) if band!=None else None
+		xdrop = int(xdrop) if xdrop!=None else None
+		limits = (["band "+str(band)] if band!=None else [])+(["X-drop "+str(xdrop)] if xdrop!=None else [])
+		if verbosity>=SUMMARY:
+			print "Aligning sequence "+seqA+" with sequence "+seqB+" using Needleman-Wunch ("+", ".join(limits)+"):"
+		score,alignedA,alignedB,clipped = needleBanded(codesA,codesB,gap,substitution,band,xdrop)
+		markStats(stats,"fill")
+		if verbosity>=SUMMARY:
+			if score==None:
+				print "No global alignment was found within the X-drop limit."
+			else:
+				print "Here is a global alignment (score "+str(score)+"):"
+				print alignedA
+				print alignedB
+			if clipped:
+				print "The optimal alignment may have been clipped, retry with a wider band or X-drop."
+		return finishStats(stats,AlignmentResult(score,alignedA,alignedB,0,len(seqA),0,len(seqB),clipped))
+	
+	if linearSpace:
+		if verbosity>=SUMMARY:
+			print "Aligning sequence "+seqA+" with sequence "+seqB+" using Needleman-Wunch (linear space):"
+		alignment = [[],[]]
+		score = hirschberg(codesA,codesB,gap,substitution,0,len(seqA),0,len(seqB),alignment)
+		markStats(stats,"fill")
+		if verbosity>=SUMMARY:
+			print "Here is a global alignment (score "+str(score)+"):"
+			for i in range(len(alignment)): print ''.join(alignment[i])
+		return finishStats(stats,AlignmentResult(score,''.join(alignment[0]),''.join(alignment[1]),0,len(seqA),0,len(seqB)))
+	
+	if verbosity>=SUMMARY:
+		print "Aligning sequence "+seqA+" with sequence "+seqB+" using Needleman-Wunch:"
+	
+	#Compute the matrix of pair scores (its rows are shared with the query profile)
+	profile = createProfile(codesA,substitution)
+	pairScores = [profile[codeB] for codeB in codesB]
+	markStats(stats,"pair scores")
+	if verbosity==FULL:
+		print "Here is the matrix of pair scores for the two sequences: "
+		pprint(pairScores)
+	
+	markStats(stats,"output")
 	
 	#Generate the dynamic programming matrix (global align., linear gap model)
-	# - initialize the first row of the dp matrix using the gap value 
-	dpMatrix = []
-	dpMatrix.append(range(0,-gap*(len(seqA)+1),-gap))
-	dpMatrixTrack = []
-	dpMatrixTrack.append([trace[2]]*(len(seqA)+1)) # - put '-' on first row
-	for i,aB in enumerate(seqB):
-		dpMatrix.append([])
-		dpMatrix[i+1].append(-gap*(i+1))
-		dpMatrixTrack.append([])
-		dpMatrixTrack[i+1].append(trace[1]) # - put '|' on first column
-		for j,aA in enumerate(seqA):
-			maxArgs = [dpMatrix[i][j] + pairScores[i][j],\
-				dpMatrix[i][j+1] - gap,\
-				dpMatrix[i+1][j] - gap]
-			maxVal = max(maxArgs)
-			dpMatrix[i+1].append(maxVal)
-			dpMatrixTrack[i+1].append(trace[maxArgs.index(maxVal)])
-	print "Here is the global dynamic programming matrix for the two sequences: "
-	pprint(dpMatrix)
-	print "Here is the global dynamic programming traceback for the two sequences: "
-	pprint(dpMatrixTrack)
+	if engine=="numpy":
+		dpMatrix,dpMatrixTrack = fillMatrixNumpy(numpy.array(profile,dtype=numpy.int32),codesB,len(seqA),gap,local=False)
+	else:
+		# - initialize the first row of the dp matrix using the gap value 
+		dpMatrix = []
+		dpMatrix.append(range(0,-gap*(len(seqA)+1),-gap))
+		dpMatrixTrack = []
+		dpMatrixTrack.append([trace[2]]*(len(seqA)+1)) # - put '-' on first row
+		for i,aB in enumerate(seqB):
+			dpMatrix.append([])
+			dpMatrix[i+1].append(-gap*(i+1))
+			dpMatrixTrack.append([])
+			dpMatrixTrack[i+1].append(trace[1]) # - put '|' on first column
+			for j,aA in enumerate(seqA):
+				maxArgs = [dpMatrix[i][j] + pairScores[i][j],\
+					dpMatrix[i][j+1] - gap,\
+					dpMatrix[i+1][j] - gap]
+				maxVal = max(maxArgs)
+				dpMatrix[i+1].append(maxVal)
+				dpMatrixTrack[i+1].append(trace[maxArgs.index(maxVal)])
+	markStats(stats,"fill")
+	if verbosity==FULL:
+		print "Here is the global dynamic programming matrix for the two sequences: "
+		pprint(asLists(dpMatrix))
+		print "Here is the global dynamic programming traceback for the two sequences: "
+		pprint(asLists(dpMatrixTrack))
+	
+	markStats(stats,"output")
 	
 	#Backtracking
 	# Start from bottom right corner
@@ -133,63 +232,113 @@ def needle(seqA,seqB,gap,match=None,mismatch=None,matrixName=None):
 			alignment[0].insert(0,seqA[loc[1]-1])
 			alignment[1].insert(0,seqB[loc[0]-1])
 			loc = (loc[0]-1,loc[1]-1)		
-	print "Here is a global alignment:"
+	score = int(dpMatrix[-1][-1])
+	markStats(stats,"traceback")
+	if verbosity==FULL:
+		print "Here is a global alignment:"
+	elif verbosity==SUMMARY:
+		print "Here is a global alignment (score "+str(score)+"):"
 	#pprint(alignment)
-	for i in range(len(alignment)): print ''.join(alignment[i])
+	if verbosity>=SUMMARY:
+		for i in range(len(alignment)): print ''.join(alignment[i])
 	
-	return
+	return finishStats(stats,AlignmentResult(score,''.join(alignment[0]),''.join(alignment[1]),0,len(seqA),0,len(seqB)))
 
-def water(seqA,seqB,gap,match=None,mismatch=None,matrixName=None):
+def water(seqA,seqB,gap,match=None,mismatch=None,matrixName=None,engine="python",verbosity=SUMMARY):
 	"""Apply Smith-Waterman on two AA sequences (local alignment).
 	Using linear gap model.
+	The engine ("python" or "numpy") computes the dynamic programming matrix;
+	the "tiled" engine computes it by tiles on all the cores (see tiled.py).
+	The verbosity is SILENT, SUMMARY (the alignment) or FULL (also all the 
+	matrices, as in align.txt).
+	Returns an AlignmentResult (see result.py).
 	"""
 	
+	stats = startStats(seqA,seqB) # - None if the stats are off (see stats.py)
+	
 	#Verify the arguments
-	if not areArgumentsValid(seqA,seqB,gap,match,mismatch,matrixName):
+	if not areArgumentsValid(seqA,seqB,gap,match,mismatch,matrixName,engine):
+		return
+	if engine=="wfa":
+		print "The wfa engine only computes global alignments."
 		return
 	gap=int(gap)
 	if match!=None and mismatch!=None:
 		match = int(match)
 		mismatch = int(mismatch)
 	
-	print "Aligning sequence "+seqA+" with sequence "+seqB+" using Smith-Waterman:"
-		
-	#Compute the matrix of pair scores
+	#Encode the sequences (this also checks that they only contain aminoacids)
+	encoded = encodePair(seqA,seqB)
+	if encoded==None:
+		return
+	codesA,codesB = encoded
 	if matrixName==None:
-		pairScores = createMatrixOfPairScores(seqA,seqB,match,mismatch)
+		substitution = createSubstitutionMatrix(match,mismatch)
 	else:
-		blosum50 = readScoringMatrix(matrixName)
-		pairScores = createMatrixOfPairScores(seqA,seqB,matrix=blosum50)
-	print "Here is the matrix of pair scores for the two sequences: "
-	pprint(pairScores)
+		substitution = getMatrix(matrixName)
+	markStats(stats,"setup")
+	
+	if engine=="tiled":
+		if verbosity>=SUMMARY:
+			print "Aligning sequence "+seqA+" with sequence "+seqB+" using Smith-Waterman (tiled):"
+		score,alignedA,alignedB,startA,endA,startB,endB = tiledAlign(codesA,codesB,gap,substitution,local=True)
+		markStats(stats,"fill")
+		if verbosity>=SUMMARY:
+			print "Here is a local alignment (score "+str(score)+"):"
+			print alignedA
+			print alignedB
+		return finishStats(stats,AlignmentResult(score,alignedA,alignedB,startA,endA,startB,endB))
+	
+	if verbosity>=SUMMARY:
+		print "Aligning sequence "+seqA+" with sequence "+seqB+" using Smith-Waterman:"
+		
+	#Compute the matrix of pair scores (its rows are shared with the query profile)
+	profile = createProfile(codesA,substitution)
+	pairScores = [profile[codeB] for codeB in codesB]
+	markStats(stats,"pair scores")
+	if verbosity==FULL:
+		print "Here is the matrix of pair scores for the two sequences: "
+		pprint(pairScores)
+	
+	markStats(stats,"output")
 	
 	#Generate the dynamic programming matrix (local align., linear gap model)
-	# - initialize the first row of the dp matrix with zeros
-	dpMatrix = []
-	dpMatrix.append([0]*(len(seqA)+1))
-	dpMatrixTrack = []
-	dpMatrixTrack.append([trace[2]]*(len(seqA)+1)) # put '-' on first row
-	overallMax = [-1,[]] # compute this maximum while generating the dp matrix 
-	for i,aB in enumerate(seqB):
-		dpMatrix.append([])
-		dpMatrix[i+1].append(0) # - put zeros on first column
-		dpMatrixTrack.append([])
-		dpMatrixTrack[i+1].append(trace[1]) # - put '|' on first column
-		for j,aA in enumerate(seqA):
-			maxArgs = [dpMatrix[i][j] + pairScores[i][j],\
-				dpMatrix[i][j+1] - gap,\
-				dpMatrix[i+1][j] - gap,\
-				0]
-			maxVal = max(maxArgs)
-			dpMatrix[i+1].append(maxVal)
-			dpMatrixTrack[i+1].append(trace[maxArgs.index(maxVal)])
-			if maxVal > overallMax[0]:
-				overallMax[0] = maxVal
-				overallMax[1] = (i+1,j+1)
-	print "Here is the local dynamic programming matrix for the two sequences: "
-	pprint(dpMatrix)
-	print "Here is the local dynamic programming traceback for the two sequences: "
-	pprint(dpMatrixTrack)
+	if engine=="numpy":
+		dpMatrix,dpMatrixTrack = fillMatrixNumpy(numpy.array(profile,dtype=numpy.int32),codesB,len(seqA),gap,local=True)
+		# the first maximum in row order, as found by the python engine
+		maxLoc = numpy.unravel_index(numpy.argmax(dpMatrix[1:,1:]),(len(seqB),len(seqA)))
+		overallMax = [int(dpMatrix[maxLoc[0]+1,maxLoc[1]+1]),(maxLoc[0]+1,maxLoc[1]+1)]
+	else:
+		# - initialize the first row of the dp matrix with zeros
+		dpMatrix = []
+		dpMatrix.append([0]*(len(seqA)+1))
+		dpMatrixTrack = []
+		dpMatrixTrack.append([trace[2]]*(len(seqA)+1)) # put '-' on first row
+		overallMax = [-1,[]] # compute this maximum while generating the dp matrix 
+		for i,aB in enumerate(seqB):
+			dpMatrix.append([])
+			dpMatrix[i+1].append(0) # - put zeros on first column
+			dpMatrixTrack.append([])
+			dpMatrixTrack[i+1].append(trace[1]) # - put '|' on first column
+			for j,aA in enumerate(seqA):
+				maxArgs = [dpMatrix[i][j] + pairScores[i][j],\
+					dpMatrix[i][j+1] - gap,\
+					dpMatrix[i+1][j] - gap,\
+					0]
+				maxVal = max(maxArgs)
+				dpMatrix[i+1].append(maxVal)
+				dpMatrixTrack[i+1].append(trace[maxArgs.index(maxVal)])
+				if maxVal > overallMax[0]:
+					overallMax[0] = maxVal
+					overallMax[1] = (i+1,j+1)
+	markStats(stats,"fill")
+	if verbosity==FULL:
+		print "Here is the local dynamic programming matrix for the two sequences: "
+		pprint(asLists(dpMatrix))
+		print "Here is the local dynamic programming traceback for the two sequences: "
+		pprint(asLists(dpMatrixTrack))
+	
+	markStats(stats,"output")
 	
 	#Backtracking
 	# Start from the maximum value from the dp matrix
@@ -210,63 +359,335 @@ def water(seqA,seqB,gap,match=None,mismatch=None,matrixName=None):
 			alignment[0].insert(0,seqA[loc[1]-1])
 			alignment[1].insert(0,seqB[loc[0]-1])
 			loc = (loc[0]-1,loc[1]-1)		
-	print "Here is a local alignment:"
+	score = int(overallMax[0])
+	markStats(stats,"traceback")
+	if verbosity==FULL:
+		print "Here is a local alignment:"
+	elif verbosity==SUMMARY:
+		print "Here is a local alignment (score "+str(score)+"):"
 	#pprint(alignment)
-	for i in range(len(alignment)): print ''.join(alignment[i])
+	if verbosity>=SUMMARY:
+		for i in range(len(alignment)): print ''.join(alignment[i])
 	
-	return
+	# the backtracking stopped on the cell before the start of the alignment
+	endB,endA = overallMax[1]
+	return finishStats(stats,AlignmentResult(score,''.join(alignment[0]),''.join(alignment[1]),\
+		int(loc[1]),int(endA),int(loc[0]),int(endB)))
 
-def createMatrixOfPairScores(seqA,seqB,match=None,mismatch=None,matrix=None):
-	"""Create the matrix of pair scores for two sequences, based either on match/mismatch
-	values or on a scoring matrix.
+def needleTargets(seqA,targets,gap,match=None,mismatch=None,matrixName=None,verbosity=SUMMARY):
+	"""Apply Needleman-Wunch on an AA sequence against many AA sequences
+	(global alignments, linear gap model), e.g. isoforms or variants sharing
+	long prefixes: the rows of the dynamic programming matrix are computed
+	once for all the targets with the same prefix (see trie.py).
+	The verbosity is SILENT or SUMMARY (the alignments).
+	Returns the AlignmentResult of each target (see result.py).
 	"""
 	
-	pairScores = []
-	if matrix==None:
-		for i,aB in enumerate(seqB):
-			pairScores.append([])
-			for j,aA in enumerate(seqA):
-				if aA == aB:
-					pairScores[i].append(match)
-				else:
-					pairScores[i].append(mismatch)
+	#Verify the arguments
+	if not targets:
+		return []
+	if not areArgumentsValid(seqA,targets[0],gap,match,mismatch,matrixName):
+		return
+	gap=int(gap)
+	if matrixName==None:
+		substitution = createSubstitutionMatrix(int(match),int(mismatch))
 	else:
-		for i,aB in enumerate(seqB):
-			pairScores.append([])
-			for j,aA in enumerate(seqA):
-				pairScores[i].append(int(matrix[matrix[0].index(aA)][matrix[0].index(aB)]))			
-	return pairScores
+		substitution = getMatrix(matrixName)
+	
+	#Encode the sequences (this also checks that they only contain aminoacids)
+	codesA = encodeSequence(seqA)
+	codes = [encodeSequence(seqB) for seqB in targets]
+	if codesA==None or None in codes:
+		print "The sequences must be composed of aminoacids ("+aminoAcids+")."
+		return
+	
+	alignments,computed = trieAlign(codesA,codes,gap,substitution)
+	results = []
+	for seqB,(score,alignedA,alignedB) in zip(targets,alignments):
+		if verbosity>=SUMMARY:
+			print "Here is a global alignment of "+seqA+" with "+seqB+" (score "+str(score)+"):"
+			print alignedA
+			print alignedB
+		results.append(AlignmentResult(score,alignedA,alignedB,0,len(seqA),0,len(seqB)))
+	if verbosity>=SUMMARY:
+		print "Computed "+str(computed)+" rows for "+str(sum([len(seqB) for seqB in targets]))+" target residues."
+	return results
+
+def fillMatrixNumpy(profile,codesB,lenA,gap,local):
+	"""Compute the dynamic programming matrix and the traceback matrix with 
+	NumPy, one row at a time (global or local alignment, linear gap model).
+	The pair scores of row i are the row codesB[i] of the query profile.
+	The diagonal and vertical moves of a row only depend on the previous row.
+	The horizontal moves are resolved with a running maximum, since
+	row[j] = max over k<=j of (row[k] - gap*(j-k)). The traceback follows 
+	the same preferences as the python engine ('\\', then '|', then '-').
+	"""
+	
+	lenB = len(codesB)
+	offsets = gap*numpy.arange(lenA+1,dtype=numpy.int32)
+	dpMatrix = numpy.zeros((lenB+1,lenA+1),dtype=numpy.int32)
+	tracks = numpy.zeros((lenB+1,lenA+1),dtype=numpy.uint8)
+	if not local:
+		dpMatrix[0] = -offsets
+	tracks[0] = 2 # - put '-' on first row
+	tracks[1:,0] = 1 # - put '|' on first column
+	for i in range(lenB):
+		diag = dpMatrix[i,:-1] + profile[codesB[i]]
+		up = dpMatrix[i,1:] - gap
+		row = dpMatrix[i+1]
+		if not local:
+			row[0] = -gap*(i+1)
+		row[1:] = numpy.maximum(diag,up)
+		if local:
+			row[1:] = numpy.maximum(row[1:],0)
+		row[:] = numpy.maximum.accumulate(row+offsets) - offsets
+		left = row[:-1] - gap
+		tracks[i+1,1:] = numpy.where(row[1:]==diag,0,\
+			numpy.where(row[1:]==up,1,\
+			numpy.where(row[1:]==left,2,3)))
+	traceChars = numpy.array([trace[0],trace[1],trace[2],trace[3]])
+	return dpMatrix,traceChars[tracks]
+
+def asLists(matrix):
+	"""Return the matrix as a list of lists (converting NumPy arrays), so 
+	that both engines print it in the same way.
+	"""
+	
+	if hasattr(matrix,"tolist"):
+		return matrix.tolist()
+	return matrix
+
+def nwScoreRow(codesA,codesB,gap,substitution):
+	"""Compute the last row of the global dynamic programming matrix of codesB 
+	(rows) against codesA (columns), keeping only two rows in memory.
+	"""
+	
+	prevRow = [-gap*j for j in range(len(codesA)+1)]
+	for i,codeB in enumerate(codesB):
+		row = [prevRow[0]-gap]
+		for j,codeA in enumerate(codesA):
+			row.append(max(prevRow[j] + substitution[codeA][codeB],\
+				prevRow[j+1] - gap,\
+				row[j] - gap))
+		prevRow = row
+	return prevRow
+
+def needleBlock(codesA,codesB,gap,substitution,alignment):
+	"""Globally align two short encoded sequences using the full dynamic 
+	programming matrix, and append the result to alignment. Used by hirschberg 
+	when one of the sequences has less than two aminoacids, so the matrix has 
+	O(n+m) cells. Returns the score.
+	"""
+	
+	seqA,seqB = decodeSequence(codesA),decodeSequence(codesB)
+	dpMatrix = [[-gap*j for j in range(len(codesA)+1)]]
+	dpMatrixTrack = [[trace[2]]*(len(codesA)+1)]
+	for i,codeB in enumerate(codesB):
+		dpMatrix.append([-gap*(i+1)])
+		dpMatrixTrack.append([trace[1]])
+		for j,codeA in enumerate(codesA):
+			maxArgs = [dpMatrix[i][j] + substitution[codeA][codeB],\
+				dpMatrix[i][j+1] - gap,\
+				dpMatrix[i+1][j] - gap]
+			maxVal = max(maxArgs)
+			dpMatrix[i+1].append(maxVal)
+			dpMatrixTrack[i+1].append(trace[maxArgs.index(maxVal)])
+	
+	#Backtracking (same preferences as in needle)
+	loc = (len(seqB),len(seqA))
+	block = [[],[]]
+	while loc != (0,0):
+		direction = dpMatrixTrack[loc[0]][loc[1]]
+		if direction=='-':
+			block[0].append(seqA[loc[1]-1])
+			block[1].append('-')
+			loc = (loc[0],loc[1]-1)
+		elif direction=='|':
+			block[0].append('-')
+			block[1].append(seqB[loc[0]-1])
+			loc = (loc[0]-1,loc[1])
+		elif direction=='\\':
+			block[0].append(seqA[loc[1]-1])
+			block[1].append(seqB[loc[0]-1])
+			loc = (loc[0]-1,loc[1]-1)
+	alignment[0].extend(reversed(block[0]))
+	alignment[1].extend(reversed(block[1]))
+	return dpMatrix[-1][-1]
 
-if len(sys.argv)!=1 and len(sys.argv)!=6 and len(sys.argv)!=7:
-	print "Usage: python align.py"
-	print "Usage: python align.py global blossum50 gap HEAGAWGHEE PAWHEAE"
-	print "Usage: python align.py global match mismatch gap HEAGAWGHEE PAWHEAE"
-	exit(0)
-elif len(sys.argv)==1:
-	#Default behaviour
-	seqA = "HEAGAWGHEE"
-	seqB = "PAWHEAE"
-	#needle(seqA,seqB,gap=2,match=1,mismatch=-2)
-	needle(seqA,seqB,gap=8,matrixName="blosum50")
-	seqA = "GHGKKVADALTN"
-	seqB = "GHKRLLT"
-	needle(seqA,seqB,gap=8,matrixName="blosum50")
-	water(seqA,seqB,gap=8,matrixName="blosum50")
-elif len(sys.argv)==6 or len(sys.argv)==7:
-	#Alignment according to the received arguments
-	# global or local
-	#   using matrix or match/mismatch values
-	if sys.argv[1]=="global":
-		if len(sys.argv)==6:
-			needle(sys.argv[4],sys.argv[5],gap=sys.argv[3],matrixName=sys.argv[2])
+def hirschberg(codesA,codesB,gap,substitution,startA,endA,startB,endB,alignment):
+	"""Globally align codesA[startA:endA] with codesB[startB:endB] in linear 
+	space (Hirschberg's algorithm), appending the result to alignment. 
+	Returns the score.
+	The middle row of seqB is aligned against every prefix of seqA with a 
+	forward pass, and against every suffix with a backward pass; the 
+	optimal path crosses it where the sum of the two is maximal.
+	"""
+	
+	if endA-startA < 2 or endB-startB < 2:
+		return needleBlock(codesA[startA:endA],codesB[startB:endB],gap,substitution,alignment)
+	midB = (startB+endB)/2
+	scoreTop = nwScoreRow(codesA[startA:endA],codesB[startB:midB],gap,substitution)
+	scoreBottom = nwScoreRow(codesA[startA:endA][::-1],codesB[midB:endB][::-1],gap,substitution)
+	lenA = endA-startA
+	bestK = 0
+	bestScore = None
+	for k in range(lenA+1):
+		if bestScore==None or scoreTop[k]+scoreBottom[lenA-k] >= bestScore:
+			bestScore = scoreTop[k]+scoreBottom[lenA-k]
+			bestK = k
+	hirschberg(codesA,codesB,gap,substitution,startA,startA+bestK,startB,midB,alignment)
+	hirschberg(codesA,codesB,gap,substitution,startA+bestK,endA,midB,endB,alignment)
+	return bestScore
+
+def needleBanded(codesA,codesB,gap,substitution,band,xdrop):
+	"""Globally align two encoded sequences computing only some of the cells of 
+	the dynamic programming matrix: with a band width, the diagonals from 
+	min(0,lenA-lenB)-band to max(0,lenA-lenB)+band (so both corners are in the 
+	band); with an X-drop value, the cells scoring at most xdrop below the best 
+	score computed so far (the others are dropped, and a row ends at the first
+	dropped cell after the end of the previous row). Every row is kept as its 
+	first column and its values, so the work and the memory are O(n*band).
+	The traceback follows the same preferences as needle.
+	Returns the score (None if the bottom right cell was dropped), the two 
+	aligned sequences, and whether the path touches a limit of the computed 
+	region, in which case a better path may have been clipped.
+	"""
+	
+	lenA,lenB = len(codesA),len(codesB)
+	diagLo,diagHi = -lenB,lenA
+	if band!=None:
+		diagLo,diagHi = min(0,lenA-lenB)-band,max(0,lenA-lenB)+band
+	best = 0
+	rows = [] # [first column, values] of every row
+	for i in range(lenB+1):
+		lo,hi = max(0,i+diagLo),min(lenA,i+diagHi)
+		prevLo,prevHi = lo,lo-2
+		if i > 0:
+			prevLo,prev = rows[-1]
+			prevHi = prevLo+len(prev)-1
+			lo = max(lo,prevLo)
+		values = []
+		for j in range(lo,hi+1):
+			maxArgs = [MININF,MININF,MININF] # diagonal, vertical, horizontal
+			if i==0 and j==0:
+				maxArgs[0] = 0
+			if i > 0 and j > 0 and prevLo <= j-1 <= prevHi:
+				maxArgs[0] = prev[j-1-prevLo] + substitution[codesA[j-1]][codesB[i-1]]
+			if i > 0 and prevLo <= j <= prevHi:
+				maxArgs[1] = prev[j-prevLo] - gap
+			if j > lo:
+				maxArgs[2] = values[-1] - gap
+			maxVal = max(maxArgs)
+			if xdrop!=None and maxVal < best-xdrop:
+				maxVal = MININF
+				if j > prevHi+1:
+					break
+			values.append(maxVal)
+		# - keep only the computed part of the row
+		while values and values[-1]==MININF:
+			values.pop()
+		while values and values[0]==MININF:
+			values.pop(0)
+			lo += 1
+		if not values:
+			return None,'','',True
+		best = max(best,max(values))
+		rows.append([lo,values])
+	
+	#Backtracking (same preferences as in needle)
+	lo,values = rows[lenB]
+	if lo+len(values)-1 != lenA:
+		return None,'','',True
+	score = values[-1]
+	loc = (lenB,lenA)
+	alignment = [[],[]]
+	clipped = False
+	while loc != (0,0):
+		i,j = loc
+		lo,values = rows[i]
+		if (j==lo and lo > 0) or (j==lo+len(values)-1 and j < lenA):
+			clipped = True
+		val = values[j-lo]
+		if i > 0 and j > 0 and cellValue(rows,i-1,j-1) + substitution[codesA[j-1]][codesB[i-1]] == val:
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append(aminoAcids[codesB[i-1]])
+			loc = (i-1,j-1)
+		elif i > 0 and cellValue(rows,i-1,j) - gap == val:
+			alignment[0].append('-')
+			alignment[1].append(aminoAcids[codesB[i-1]])
+			loc = (i-1,j)
 		else:
-			needle(sys.argv[5],sys.argv[6],gap=sys.argv[4],match=sys.argv[2],mismatch=sys.argv[3])
-	elif sys.argv[1]=="local":
-		if len(sys.argv)==6:
-			water(sys.argv[4],sys.argv[5],gap=sys.argv[3],matrixName=sys.argv[2])
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append('-')
+			loc = (i,j-1)
+	return score,''.join(reversed(alignment[0])),''.join(reversed(alignment[1])),clipped
+
+def cellValue(rows,i,j):
+	"""Return the value of cell (i,j) of a banded matrix (see needleBanded), 
+	minus infinity if it was not computed.
+	"""
+	
+	lo,values = rows[i]
+	if lo <= j < lo+len(values):
+		return values[j-lo]
+	return MININF
+
+if __name__=="__main__":
+	# Options (e.g. --linear, --engine=numpy, --verbosity=full) can be given anywhere on the command line
+	options = {}
+	for arg in sys.argv[1:]:
+		if arg.startswith("--"):
+			name,_,value = arg[2:].partition("=")
+			options[name] = value
+	args = [arg for arg in sys.argv if not arg.startswith("--")]
+	linearSpace = "linear" in options
+	engine = options.get("engine","python")
+	band = options.get("band")
+	xdrop = options.get("xdrop")
+	# The default run shows all the matrices (align.txt); otherwise they are only
+	# printed when the output goes to a terminal
+	defaultVerbosity = "full" if len(args)==1 or sys.stdout.isatty() else "summary"
+	verbosity = verbosityLevels.get(options.get("verbosity",defaultVerbosity))
+
+	if (len(args)!=1 and len(args)!=6 and len(args)!=7) or\
+	 not set(options).issubset(["linear","engine","verbosity","band","xdrop"]) or verbosity==None:
+		print "Usage: python align.py [options]"
+		print "Usage: python align.py global blossum50 gap HEAGAWGHEE PAWHEAE [options]"
+		print "Usage: python align.py global match mismatch gap HEAGAWGHEE PAWHEAE [options]"
+		print "  --linear: global alignment in linear space (Hirschberg)"
+		print "  --engine=python|numpy|wfa|tiled: engine computing the alignment (wfa: global, with match/mismatch values)"
+		print "  --verbosity=silent|summary|full: what to print (full also prints the matrices)"
+		print "  --band=N, --xdrop=N: global alignment restricted to a diagonal band / by X-drop"
+		exit(0)
+	elif len(args)==1:
+		#Default behaviour
+		seqA = "HEAGAWGHEE"
+		seqB = "PAWHEAE"
+		#needle(seqA,seqB,gap=2,match=1,mismatch=-2)
+		needle(seqA,seqB,gap=8,matrixName="blosum50",linearSpace=linearSpace,engine=engine,verbosity=verbosity,\
+			band=band,xdrop=xdrop)
+		seqA = "GHGKKVADALTN"
+		seqB = "GHKRLLT"
+		needle(seqA,seqB,gap=8,matrixName="blosum50",linearSpace=linearSpace,engine=engine,verbosity=verbosity,\
+			band=band,xdrop=xdrop)
+		water(seqA,seqB,gap=8,matrixName="blosum50",engine=engine,verbosity=verbosity)
+	elif len(args)==6 or len(args)==7:
+		#Alignment according to the received arguments
+		# global or local
+		#   using matrix or match/mismatch values
+		if args[1]=="global":
+			if len(args)==6:
+				needle(args[4],args[5],gap=args[3],matrixName=args[2],linearSpace=linearSpace,engine=engine,verbosity=verbosity,\
+					band=band,xdrop=xdrop)
+			else:
+				needle(args[5],args[6],gap=args[4],match=args[2],mismatch=args[3],linearSpace=linearSpace,engine=engine,verbosity=verbosity,\
+					band=band,xdrop=xdrop)
+		elif args[1]=="local":
+			if len(args)==6:
+				water(args[4],args[5],gap=args[3],matrixName=args[2],engine=engine,verbosity=verbosity)
+			else:
+				water(args[5],args[6],gap=args[4],match=args[2],mismatch=args[3],engine=engine,verbosity=verbosity)
 		else:
-			water(sys.argv[5],sys.argv[6],gap=sys.argv[4],match=sys.argv[2],mismatch=sys.argv[3])
-	else:
-		print "Usage: python align.py global blossum50 gap HEAGAWGHEE PAWHEAE"
-		print sys.argv[1]+" is not a valid arg. Use global or local."
-		exit(0)
\ No newline at end of file
+			print "Usage: python align.py global blossum50 gap HEAGAWGHEE PAWHEAE"
+			print args[1]+" is not a valid arg. Use global or local."
+			exit(0)
\ No newline at end of file
@@ -8,38 +8,33 @@ Created: 28 September 2011
 Licensed under: GNU General Public License v2
 """
 
-import os
 import sys
 from pprint import pprint
-import pickle
 from sets import Set
+from scoring import aminoAcids,encodePair,createSubstitutionMatrix,createProfile
+from matrices import scoringMatrices,getMatrix
+from result import AlignmentResult,SILENT,SUMMARY,FULL,verbosityLevels
+from stats import startStats,markStats,finishStats
+from wavefront import wavefrontAffine
+try:
+	import numpy
+except ImportError:
+	numpy = None # only needed by the striped score engine
 
 MININF = float("-inf") # minus infinity in Pyhton
+LANES = None # number of lanes of the striped query profile (None: one per residue of the query)
+STRIPEDMIN = 32 # shorter queries are scored by waterEnd, faster than the profile engine for them
+engines = ["python","wfa"] # engines of the global alignment
 
-scoringMatrices = ["blosum50"] #Currently only supporting BLOSUM50
-aminoAcids = "ARNDCQEGHILKMFPSTWYV"
+# Bit layout of the packed traceback (one byte per cell, see newTraceback)
+M_SOURCE = 3 # 2 bits for the source of M: one of the following
+FROM_M, FROM_IX, FROM_IY, FROM_NONE = 0,1,2,3
+IX_EXTEND = 4 # Ix comes from Ix (otherwise from M)
+IY_EXTEND = 8 # Iy comes from Iy (otherwise from M)
+TOP_MARGIN = 16
+LEFT_MARGIN = 32
 
-def readScoringMatrix(matrixName):
-	"""Read the scoring matrix (either from a pickle file, if it exists, or from 
-	a text file - if none exists, returns None). 
-	"""
-	
-	matrix = None
-	if os.path.isfile(matrixName+".p"):
-		pckl_file = open(matrixName+".p","rb")
-		matrix = pickle.load(pckl_file)
-		pckl_file.close()
-	elif os.path.isfile(matrixName+".txt"):
-		lines = open(matrixName+".txt","r").readlines()
-		matrix = []
-		for line in lines:
-			matrix.append(line.rstrip().split("\t"))
-		pckl_file = open(matrixName+".p","wb")
-		pickle.dump(matrix,pckl_file)
-		pckl_file.close()
-	return matrix
-	
-def areArgumentsValid(seqA,seqB,gap,expand,match,mismatch,matrixName):
+def areArgumentsValid(seqA,seqB,gap,expand,match,mismatch,matrixName,band=None,xdrop=None,engine="python"):
 	"""Verify the validity of the arguments
 	"""
 	
@@ -50,6 +45,12 @@ def areArgumentsValid(seqA,seqB,gap,expand,match,mismatch,matrixName):
 	if matrixName and matrixName not in scoringMatrices:
 		print "Do not have the values for this matrix."
 		return False
+	if engine not in engines:
+		print "The engine should be one of: "+", ".join(engines)+"."
+		return False
+	if engine=="wfa" and matrixName!=None:
+		print "The wfa engine needs match and mismatch values."
+		return False
 	try:
 		int(gap)
 		int(expand)
@@ -63,14 +64,30 @@ def areArgumentsValid(seqA,seqB,gap,expand,match,mismatch,matrixName):
 		except:
 			print "The match and mismatch values should be integers."
 			return False		
-	if not set(aminoAcids).issuperset(set(seqA)) or not set(aminoAcids).issuperset(set(seqB)):
-		print "The sequences must be composed of aminoacids ("+aminoAcids+")."
+	try:
+		if (band!=None and int(band)<0) or (xdrop!=None and int(xdrop)<0):
+			raise ValueError
+	except:
+		print "The band and X-drop values should be positive integers."
 		return False
 	return True
 	
-def needle(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
+def needle(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None,linearSpace=False,verbosity=SUMMARY,\
+	band=None,xdrop=None,engine="python"):
 	"""Apply Needleman-Wunch on two AA sequences (global alignment)
 	Using the affine gap model.
+	If linearSpace is True, the Myers-Miller divide and conquer algorithm is 
+	used instead, keeping only O(len(seqA)+len(seqB)) values in memory.
+	If a band width and/or an X-drop value are given, only the cells of a
+	diagonal band and/or the cells scoring at most xdrop below the best one
+	are computed (see needleBanded); the result tells if the optimal path may
+	have been clipped, so the alignment can be retried with a wider band.
+	With match/mismatch values, the "wfa" engine computes the wavefronts of
+	the alignment instead of the matrices (see wavefront.py), which is much
+	faster for similar sequences.
+	The verbosity is SILENT, SUMMARY (the alignment) or FULL (also all the 
+	matrices and the backtracking steps, as in align_affine.txt).
+	Returns an AlignmentResult (see result.py).
 	
 	Notations for the backtracking matrices:
 	M(i,j) = 	Iy(i-1,j-1)+s 	|
@@ -82,10 +99,19 @@ def needle(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
 	Iy(i,j) = 	Iy(i,j-1)-e		-
 				M(i,j-1)-d		/
 				left margin		||
+	The directions are stored packed, one byte per cell (see newTraceback).
 	"""
 	
+	stats = startStats(seqA,seqB) # - None if the stats are off (see stats.py)
+	
 	#Verify the arguments
-	if not areArgumentsValid(seqA,seqB,gap,extend,match,mismatch,matrixName):
+	if not areArgumentsValid(seqA,seqB,gap,extend,match,mismatch,matrixName,band,xdrop,engine):
+		return
+	if linearSpace and (band!=None or xdrop!=None):
+		print "The linear space and banded modes can not be combined."
+		return
+	if engine=="wfa" and (linearSpace or band!=None or xdrop!=None):
+		print "The wfa engine can not be combined with the linear space or banded modes."
 		return
 	gap=int(gap)
 	extend=int(extend)
@@ -93,16 +119,73 @@ def needle(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
 		match = int(match)
 		mismatch = int(mismatch)
 	
-	print "Aligning sequence "+seqA+" with sequence "+seqB+" using Needleman-Wunch:"
-	
-	#Compute the matrix of pair scores
+	#Encode the sequences (this also checks that they only contain aminoacids)
+	encoded = encodePair(seqA,seqB)
+	if encoded==None:
+		return
+	codesA,codesB = encoded
 	if matrixName==None:
-		pairScores = createMatrixOfPairScores(seqA,seqB,match,mismatch)
+		substitution = createSubstitutionMatrix(match,mismatch)
 	else:
-		blosum50 = readScoringMatrix(matrixName)
-		pairScores = createMatrixOfPairScores(seqA,seqB,matrix=blosum50)
-	print "Here is the matrix of pair scores for the two sequences: "
-	pprint(pairScores)
+		substitution = getMatrix(matrixName)
+	markStats(stats,"setup")
+	
+	if engine=="wfa":
+		if verbosity>=SUMMARY:
+			print "Aligning sequence "+seqA+" with sequence "+seqB+" using Needleman-Wunch (wavefront):"
+		aligned = wavefrontAffine(codesA,codesB,match,mismatch,gap,extend)
+		markStats(stats,"fill")
+		if aligned==None:
+			return
+		score,alignedA,alignedB = aligned
+		if verbosity>=SUMMARY:
+			print "Here is a global alignment (score "+str(score)+"):"
+			print alignedA
+			print alignedB
+		return finishStats(stats,AlignmentResult(score,alignedA,alignedB,0,len(seqA),0,len(seqB)))
+	
+	if band!=None or xdrop!=None:
+		band = int(band) if band!=None else None
+		xdrop = int(xdrop) if xdrop!=None else None
+		limits = (["band "+str(band)] if band!=None else [])+(["X-drop "+str(xdrop)] if xdrop!=None else [])
+		if verbosity>=SUMMARY:
+			print "Aligning sequence "+seqA+" with sequence "+seqB+" using Needleman-Wunch ("+", ".join(limits)+"):"
+		score,alignedA,alignedB,clipped = needleBanded(codesA,codesB,gap,extend,substitution,band,xdrop)
+		markStats(stats,"fill")
+		if verbosity>=SUMMARY:
+			if score==None:
+				print "No global alignment was found within the X-drop limit."
+			else:
+				print "Here is a global alignment (score "+str(score)+"):"
+				print alignedA
+				print alignedB
+			if clipped:
+				print "The optimal alignment may have been clipped, retry with a wider band or X-drop."
+		return finishStats(stats,AlignmentResult(score,alignedA,alignedB,0,len(seqA),0,len(seqB),clipped))
+	
+	if linearSpace:
+		if verbosity>=SUMMARY:
+			print "Aligning sequence "+seqA+" with sequence "+seqB+" using Needleman-Wunch (linear space):"
+		alignment = [[],[]]
+		score = myersMiller(codesA,codesB,gap,extend,substitution,0,len(seqA),0,len(seqB),1,None,False,alignment)
+		markStats(stats,"fill")
+		if verbosity>=SUMMARY:
+			print "Here is a global alignment (score "+str(score)+"):"
+			for i in range(len(alignment)): print ''.join(alignment[i])
+		return finishStats(stats,AlignmentResult(score,''.join(alignment[0]),''.join(alignment[1]),0,len(seqA),0,len(seqB)))
+	
+	if verbosity>=SUMMARY:
+		print "Aligning sequence "+seqA+" with sequence "+seqB+" using Needleman-Wunch:"
+	
+	#Compute the matrix of pair scores (its rows are shared with the query profile)
+	profile = createProfile(codesA,substitution)
+	pairScores = [profile[codeB] for codeB in codesB]
+	markStats(stats,"pair scores")
+	if verbosity==FULL:
+		print "Here is the matrix of pair scores for the two sequences: "
+		pprint(pairScores)
+	
+	markStats(stats,"output")
 	
 	#Generate the dynamic programming matrix (global align., affine gap model)
 	Iy = []
@@ -114,13 +197,9 @@ def needle(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
 	M[0] += [MININF]*len(seqA)
 	Ix.append([MININF])
 	Ix[0] += range(-gap,-gap-extend*len(seqA),-extend)
-	# - initialize tracking matrices
-	trackIy = []
-	trackM = []
-	trackIx = []
-	trackIy.append([' ']*(len(seqA)+1)) # put ' ' on first Iy row
-	trackM.append([' ']*(len(seqA)+1)) # put ' ' on first M row
-	trackIx.append([' ']+['--']*(len(seqA))) # put '--' on first Ix row
+	# - initialize the packed traceback (its margins are already set)
+	width = len(seqA)+1
+	track = newTraceback(len(seqA),len(seqB))
 	for i,aB in enumerate(seqB):
 		Iy.append([])
 		M.append([])
@@ -129,13 +208,7 @@ def needle(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
 		Iy[i+1].append(-gap-extend*i)
 		M[i+1].append(MININF)
 		Ix[i+1].append(MININF)
-		# - initialize tracking matrices for first column
-		trackIy.append([])
-		trackIy[i+1].append('||') # put '||' on first Iy column
-		trackM.append([])
-		trackM[i+1].append(' ') # put ' ' on first M column
-		trackIx.append([])
-		trackIx[i+1].append(' ') # put ' ' on first Ix column
+		row = (i+1)*width
 		for j,aA in enumerate(seqA):
 			maxArgs_Ix = [M[i][j+1]-gap,\
 						Ix[i][j+1]-extend]
@@ -150,30 +223,32 @@ def needle(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
 			Iy[i+1].append(maxVal_Iy)
 			M[i+1].append(maxVal)
 			Ix[i+1].append(maxVal_Ix)
-			# - update tracking matrices
-			if maxArgs_Iy.index(maxVal_Iy) == 0: trackIy[i+1].append('/')
-			else: trackIy[i+1].append('-')
-			if maxArgs.index(maxVal) == 0: trackM[i+1].append('\\')
-			elif maxArgs.index(maxVal) == 1: trackM[i+1].append('-')
-			else: trackM[i+1].append('|')
-			if maxArgs_Ix.index(maxVal_Ix) == 0: trackIx[i+1].append('|')
-			else: trackIx[i+1].append('\\')
-	
-	print "Here is the global dynamic programming matrix for the two sequences: "
-	print "Iy="
-	pprint(Iy)
-	print "M="
-	pprint(M)
-	print "Ix="
-	pprint(Ix)
-	
-	print "Here is the global dynamic programming traceback for the two sequences: "
-	print "trackIy="
-	pprint(trackIy)
-	print "trackM="
-	pprint(trackM)
-	print "trackIx="
-	pprint(trackIx)
+			# - update the traceback (the M source is the index in maxArgs)
+			cell = maxArgs.index(maxVal)
+			if maxArgs_Ix.index(maxVal_Ix) == 1: cell |= IX_EXTEND
+			if maxArgs_Iy.index(maxVal_Iy) == 1: cell |= IY_EXTEND
+			track[row+j+1] = cell
+	
+	markStats(stats,"fill")
+	if verbosity==FULL:
+		print "Here is the global dynamic programming matrix for the two sequences: "
+		print "Iy="
+		pprint(Iy)
+		print "M="
+		pprint(M)
+		print "Ix="
+		pprint(Ix)
+		
+		print "Here is the global dynamic programming traceback for the two sequences: "
+		trackIy,trackM,trackIx = unpackTraceback(track,len(seqA),len(seqB))
+		print "trackIy="
+		pprint(trackIy)
+		print "trackM="
+		pprint(trackM)
+		print "trackIx="
+		pprint(trackIx)
+	
+	markStats(stats,"output")
 	
 	#Backtracking
 	# Start from bottom right corner
@@ -184,50 +259,61 @@ def needle(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
 	alignment =[[],[]]
 	# Go towards the top left corner
 	while loc != (0,0):
-		print loc
-		print alignment
+		if verbosity==FULL:
+			print loc
+			print alignment
+		cell = track[loc[0]*width+loc[1]]
 		if loc[0]==0 or loc[1]==0: #margin hit
-			if trackIx[loc[0]][loc[1]]=='--': # top margin hit, go left
+			if cell & TOP_MARGIN: # top margin hit, go left
 				which = 2
 				alignment[0].insert(0,seqA[loc[1]-1])
 				alignment[1].insert(0,'-')
 				loc = (loc[0],loc[1]-1)
-			elif trackIy[loc[0]][loc[1]]=='||': # left margin hit, go up
+			elif cell & LEFT_MARGIN: # left margin hit, go up
 				which = 1
 				alignment[0].insert(0,'-')
 				alignment[1].insert(0,seqB[loc[0]-1])
 				loc = (loc[0]-1,loc[1])
 		elif which==0:
-			direction = trackIy[loc[0]][loc[1]]
-			if direction=='-': which = 0 #from Iy
-			elif direction=='/': which = 1 #from M
+			if cell & IY_EXTEND: which = 0 #from Iy
+			else: which = 1 #from M
 			alignment[0].insert(0,seqA[loc[1]-1])
 			alignment[1].insert(0,'-')
 			loc = (loc[0],loc[1]-1)
 		elif which==2:
-			direction = trackIx[loc[0]][loc[1]]
-			if direction=='|': which = 1 #from M
-			elif direction=='\\': which = 2 #from Ix
+			if cell & IX_EXTEND: which = 2 #from Ix
+			else: which = 1 #from M
 			alignment[0].insert(0,'-')
 			alignment[1].insert(0,seqB[loc[0]-1])
 			loc = (loc[0]-1,loc[1])
 		elif which==1:
-			direction = trackM[loc[0]][loc[1]]
+			source = cell & M_SOURCE
 			alignment[0].insert(0,seqA[loc[1]-1])
 			alignment[1].insert(0,seqB[loc[0]-1])
 			loc = (loc[0]-1,loc[1]-1)
-			if direction=='|': which = 0 #from Iy
-			elif direction=='\\': which = 1 #from M
-			elif direction=='-': which = 2 #from Ix
-	print "Here is a global alignment:"
+			if source==FROM_IY: which = 0 #from Iy
+			elif source==FROM_M: which = 1 #from M
+			elif source==FROM_IX: which = 2 #from Ix
+	markStats(stats,"traceback")
+	if verbosity==FULL:
+		print "Here is a global alignment:"
+	elif verbosity==SUMMARY:
+		print "Here is a global alignment (score "+str(score)+"):"
 	#pprint(alignment)
-	for i in range(len(alignment)): print ''.join(alignment[i])
+	if verbosity>=SUMMARY:
+		for i in range(len(alignment)): print ''.join(alignment[i])
 	
-	return
+	return finishStats(stats,AlignmentResult(score,''.join(alignment[0]),''.join(alignment[1]),0,len(seqA),0,len(seqB)))
 
-def water(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
+def water(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None,linearSpace=False,verbosity=SUMMARY):
 	"""Apply Smith-Waterman on two AA sequences (local alignment)
 	Using the affine gap model.
+	If linearSpace is True, the end and then the start of the best local 
+	alignment are found keeping only two rows in memory, and the region 
+	between them is aligned with the Myers-Miller algorithm.
+	The verbosity is SILENT, SUMMARY (the alignment) or FULL (also all the 
+	matrices and the backtracking steps, as in align_affine.txt).
+	Returns an AlignmentResult (see result.py).
 	
 	Notations for the backtracking matrices:
 	M(i,j) = 	Iy(i-1,j-1)+s 	|
@@ -239,8 +325,11 @@ def water(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
 	Iy(i,j) = 	Iy(i,j-1)-e		-
 				M(i,j-1)-d		/
 				left margin		||
+	The directions are stored packed, one byte per cell (see newTraceback).
 	"""
 	
+	stats = startStats(seqA,seqB) # - None if the stats are off (see stats.py)
+	
 	#Verify the arguments
 	if not areArgumentsValid(seqA,seqB,gap,extend,match,mismatch,matrixName):
 		return
@@ -250,16 +339,45 @@ def water(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
 		match = int(match)
 		mismatch = int(mismatch)
 	
-	print "Aligning sequence "+seqA+" with sequence "+seqB+" using Smith-Waterman:"
-	
-	#Compute the matrix of pair scores
+	#Encode the sequences (this also checks that they only contain aminoacids)
+	encoded = encodePair(seqA,seqB)
+	if encoded==None:
+		return
+	codesA,codesB = encoded
 	if matrixName==None:
-		pairScores = createMatrixOfPairScores(seqA,seqB,match,mismatch)
+		substitution = createSubstitutionMatrix(match,mismatch)
 	else:
-		blosum50 = readScoringMatrix(matrixName)
-		pairScores = createMatrixOfPairScores(seqA,seqB,matrix=blosum50)
-	print "Here is the matrix of pair scores for the two sequences: "
-	pprint(pairScores)
+		substitution = getMatrix(matrixName)
+	markStats(stats,"setup")
+	
+	if linearSpace:
+		if verbosity>=SUMMARY:
+			print "Aligning sequence "+seqA+" with sequence "+seqB+" using Smith-Waterman (linear space):"
+		alignment = [[],[]]
+		score,endB,endA = waterEnd(codesA,codesB,gap,extend,substitution)
+		markStats(stats,"fill")
+		startB,startA = endB,endA
+		if score > 0:
+			startB,startA = waterStart(codesA,codesB,gap,extend,substitution,endA,endB,score)
+			myersMiller(codesA,codesB,gap,extend,substitution,startA,endA,startB,endB,1,1,True,alignment)
+		markStats(stats,"traceback")
+		if verbosity>=SUMMARY:
+			print "Here is a local alignment (score "+str(score)+"):"
+			for i in range(len(alignment)): print ''.join(alignment[i])
+		return finishStats(stats,AlignmentResult(score,''.join(alignment[0]),''.join(alignment[1]),startA,endA,startB,endB))
+	
+	if verbosity>=SUMMARY:
+		print "Aligning sequence "+seqA+" with sequence "+seqB+" using Smith-Waterman:"
+	
+	#Compute the matrix of pair scores (its rows are shared with the query profile)
+	profile = createProfile(codesA,substitution)
+	pairScores = [profile[codeB] for codeB in codesB]
+	markStats(stats,"pair scores")
+	if verbosity==FULL:
+		print "Here is the matrix of pair scores for the two sequences: "
+		pprint(pairScores)
+	
+	markStats(stats,"output")
 	
 	#Generate the dynamic programming matrix (global align., affine gap model)
 	Iy = []
@@ -269,13 +387,9 @@ def water(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
 	Iy.append([MININF]*(len(seqA)+1))
 	M.append([0]*(len(seqA)+1))
 	Ix.append([MININF]*(len(seqA)+1))
-	# - initialize tracking matrices
-	trackIy = []
-	trackM = []
-	trackIx = []
-	trackIy.append([' ']*(len(seqA)+1)) # put ' ' on first Iy row
-	trackM.append([' ']*(len(seqA)+1)) # put ' ' on first M row
-	trackIx.append([' ']+['--']*(len(seqA))) # put '--' on first Ix row
+	# - initialize the packed traceback (its margins are already set)
+	width = len(seqA)+1
+	track = newTraceback(len(seqA),len(seqB))
 	overallMax = [-1,[]] # compute this maximum while generating the dp matrix
 	for i,aB in enumerate(seqB):
 		Iy.append([])
@@ -285,13 +399,7 @@ def water(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
 		Iy[i+1].append(MININF)
 		M[i+1].append(0)
 		Ix[i+1].append(MININF)
-		# - initialize tracking matrices for first column
-		trackIy.append([])
-		trackIy[i+1].append('||') # put '||' on first Iy column
-		trackM.append([])
-		trackM[i+1].append(' ') # put ' ' on first M column
-		trackIx.append([])
-		trackIx[i+1].append(' ') # put ' ' on first Ix column
+		row = (i+1)*width
 		for j,aA in enumerate(seqA):
 			maxArgs_Ix = [M[i][j+1]-gap,\
 						Ix[i][j+1]-extend]
@@ -307,35 +415,37 @@ def water(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
 			Iy[i+1].append(maxVal_Iy)
 			M[i+1].append(maxVal)
 			Ix[i+1].append(maxVal_Ix)
-			# - update tracking matrices
-			if maxArgs_Iy.index(maxVal_Iy) == 0: trackIy[i+1].append('/')
-			else: trackIy[i+1].append('-')
-			if maxArgs.index(maxVal) == 0: trackM[i+1].append('\\')
-			elif maxArgs.index(maxVal) == 1: trackM[i+1].append('-')
-			elif maxArgs.index(maxVal) == 2: trackM[i+1].append('|')
-			else: trackM[i+1].append(' ')
-			if maxArgs_Ix.index(maxVal_Ix) == 0: trackIx[i+1].append('|')
-			else: trackIx[i+1].append('\\')
+			# - update the traceback (the M source is the index in maxArgs,
+			# FROM_NONE if the local alignment starts here)
+			cell = maxArgs.index(maxVal)
+			if maxArgs_Ix.index(maxVal_Ix) == 1: cell |= IX_EXTEND
+			if maxArgs_Iy.index(maxVal_Iy) == 1: cell |= IY_EXTEND
+			track[row+j+1] = cell
 			# - update the overall maximu value
 			if maxVal > overallMax[0]:
 				overallMax[0] = maxVal
 				overallMax[1] = (i+1,j+1)
 	
-	print "Here is the local dynamic programming matrix for the two sequences: "
-	print "Iy="
-	pprint(Iy)
-	print "M="
-	pprint(M)
-	print "Ix="
-	pprint(Ix)
-	
-	print "Here is the local dynamic programming traceback for the two sequences: "
-	print "trackIy="
-	pprint(trackIy)
-	print "trackM="
-	pprint(trackM)
-	print "trackIx="
-	pprint(trackIx)
+	markStats(stats,"fill")
+	if verbosity==FULL:
+		print "Here is the local dynamic programming matrix for the two sequences: "
+		print "Iy="
+		pprint(Iy)
+		print "M="
+		pprint(M)
+		print "Ix="
+		pprint(Ix)
+		
+		print "Here is the local dynamic programming traceback for the two sequences: "
+		trackIy,trackM,trackIx = unpackTraceback(track,len(seqA),len(seqB))
+		print "trackIy="
+		pprint(trackIy)
+		print "trackM="
+		pprint(trackM)
+		print "trackIx="
+		pprint(trackIx)
+	
+	markStats(stats,"output")
 	
 	#Backtracking
 	# Start from the maximum value from the dp matrix
@@ -347,101 +457,602 @@ def water(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None):
 	while loc != (0,0):
 		if which==1 and M[loc[0]][loc[1]] == 0:
 			break
-		print loc
-		print alignment
+		if verbosity==FULL:
+			print loc
+			print alignment
+		cell = track[loc[0]*width+loc[1]]
 		if loc[0]==0 or loc[1]==0: #margin hit
-			if trackIx[loc[0]][loc[1]]=='--': # top margin hit, go left
+			if cell & TOP_MARGIN: # top margin hit, go left
 				which = 2
 				alignment[0].insert(0,seqA[loc[1]-1])
 				alignment[1].insert(0,'-')
 				loc = (loc[0],loc[1]-1)
-			elif trackIy[loc[0]][loc[1]]=='||': # left margin hit, go up
+			elif cell & LEFT_MARGIN: # left margin hit, go up
 				which = 1
 				alignment[0].insert(0,'-')
 				alignment[1].insert(0,seqB[loc[0]-1])
 				loc = (loc[0]-1,loc[1])
 		elif which==0: #Iy
-			direction = trackIy[loc[0]][loc[1]]
-			if direction=='-': which = 0 #from Iy
-			elif direction=='/': which = 1 #from M
+			if cell & IY_EXTEND: which = 0 #from Iy
+			else: which = 1 #from M
 			alignment[0].insert(0,seqA[loc[1]-1])
 			alignment[1].insert(0,'-')
 			loc = (loc[0],loc[1]-1)
 		elif which==2: #Ix
-			direction = trackIx[loc[0]][loc[1]]
-			if direction=='|': which = 1 #from M
-			elif direction=='\\': which = 2 #from Ix
+			if cell & IX_EXTEND: which = 2 #from Ix
+			else: which = 1 #from M
 			alignment[0].insert(0,'-')
 			alignment[1].insert(0,seqB[loc[0]-1])
 			loc = (loc[0]-1,loc[1])
 		elif which==1: #M
-			direction = trackM[loc[0]][loc[1]]
+			source = cell & M_SOURCE
 			alignment[0].insert(0,seqA[loc[1]-1])
 			alignment[1].insert(0,seqB[loc[0]-1])
 			loc = (loc[0]-1,loc[1]-1)
-			if direction=='|': which = 0 #from Iy
-			elif direction=='\\': which = 1 #from M
-			elif direction=='-': which = 2 #from Ix
-	print "Here is a local alignment:"
+			if source==FROM_IY: which = 0 #from Iy
+			elif source==FROM_M: which = 1 #from M
+			elif source==FROM_IX: which = 2 #from Ix
+	markStats(stats,"traceback")
+	if verbosity==FULL:
+		print "Here is a local alignment:"
+	elif verbosity==SUMMARY:
+		print "Here is a local alignment (score "+str(overallMax[0])+"):"
 	#pprint(alignment)
-	for i in range(len(alignment)): print ''.join(alignment[i])
+	if verbosity>=SUMMARY:
+		for i in range(len(alignment)): print ''.join(alignment[i])
+	
+	# the backtracking stopped on the cell before the start of the alignment
+	endB,endA = overallMax[1]
+	return finishStats(stats,AlignmentResult(overallMax[0],''.join(alignment[0]),''.join(alignment[1]),loc[1],endA,loc[0],endB))
+
+def newTraceback(lenA,lenB):
+	"""Create the packed traceback of an alignment of a sequence of length lenA
+	(columns) with a sequence of length lenB (rows): a bytearray with one uint8 
+	per cell, cell (i,j) being at index i*(lenA+1)+j. The bits 0-1 hold the 
+	source of M (FROM_M, FROM_IX, FROM_IY or FROM_NONE), bit 2 is set when Ix
+	extends Ix, bit 3 when Iy extends Iy, and the bits 4 and 5 flag the top
+	and left margins. The margins are initialized here.
+	"""
+	
+	width = lenA+1
+	track = bytearray([FROM_NONE])*(width*(lenB+1))
+	for j in range(1,width):
+		track[j] = FROM_NONE | TOP_MARGIN
+	for i in range(1,lenB+1):
+		track[i*width] = FROM_NONE | LEFT_MARGIN
+	return track
+
+def unpackTraceback(track,lenA,lenB):
+	"""Expand the packed traceback into the three matrices of directions 
+	(trackIy, trackM, trackIx), with the characters described in needle.
+	"""
+	
+	width = lenA+1
+	mChars = {FROM_M:'\\',FROM_IX:'-',FROM_IY:'|',FROM_NONE:' '}
+	trackIy,trackM,trackIx = [],[],[]
+	for i in range(lenB+1):
+		trackIy.append([])
+		trackM.append([])
+		trackIx.append([])
+		for j in range(width):
+			cell = track[i*width+j]
+			if i==0 or j==0:
+				trackIy[i].append('||' if cell & LEFT_MARGIN else ' ')
+				trackIx[i].append('--' if cell & TOP_MARGIN else ' ')
+			else:
+				trackIy[i].append('-' if cell & IY_EXTEND else '/')
+				trackIx[i].append('\\' if cell & IX_EXTEND else '|')
+			trackM[i].append(mChars[cell & M_SOURCE])
+	return trackIy,trackM,trackIx
+
+def affineRows(codesA,codesB,gap,extend,substitution,startA,endA,startB,endB,entryState,local):
+	"""Generate, one row at a time, the [Iy,M,Ix] rows of the dynamic programming 
+	matrices of codesB[startB:endB] (rows) against codesA[startA:endA] (columns), for
+	paths that start in entryState (0 => Iy, 1 => M, 2 => Ix) at the top left cell.
+	Coordinates are absolute, so that the margins of needle are reproduced: on 
+	the first row the gaps are kept in Ix, and on the first column in Iy. In 
+	local mode (water) the margins are only used as starting cells.
+	"""
 	
-	return
+	width = endA-startA+1
+	Iy,M,Ix = [MININF]*width,[MININF]*width,[MININF]*width
+	row = [Iy,M,Ix]
+	row[entryState][0] = 0
+	for j in range(1,width):
+		if startB > 0:
+			Iy[j] = max(M[j-1]-gap,Iy[j-1]-extend)
+		elif not local: # top margin
+			Ix[j] = max(M[j-1]-gap,Ix[j-1]-extend)
+	yield row
+	for i in range(startB+1,endB+1):
+		codeB = codesB[i-1]
+		prevIy,prevM,prevIx = row
+		Iy,M,Ix = [MININF]*width,[MININF]*width,[MININF]*width
+		row = [Iy,M,Ix]
+		if startA > 0:
+			Ix[0] = max(prevM[0]-gap,prevIx[0]-extend)
+		elif not local: # left margin
+			Iy[0] = max(prevM[0]-gap,prevIy[0]-extend)
+		for j in range(1,width):
+			M[j] = max(prevM[j-1],prevIx[j-1],prevIy[j-1]) + substitution[codesA[startA+j-1]][codeB]
+			Ix[j] = max(prevM[j]-gap,prevIx[j]-extend)
+			Iy[j] = max(M[j-1]-gap,Iy[j-1]-extend)
+		yield row
 
-def createMatrixOfPairScores(seqA,seqB,match=None,mismatch=None,matrix=None):
-	"""Create the matrix of pair scores for two sequences, based either on match/mismatch
-	values or on a scoring matrix.
+def affineReverseRows(codesA,codesB,gap,extend,substitution,startA,endA,startB,endB,exitState,local):
+	"""Generate, one row at a time from the bottom row endB up to startB, the 
+	[Iy,M,Ix] rows with the best score of the remaining path from each cell 
+	and state to the bottom right cell, where it must end in exitState (or in 
+	any state if exitState is None). This is the mirror image of affineRows
+	(endB is always greater than zero).
 	"""
 	
-	pairScores = []
-	if matrix==None:
-		for i,aB in enumerate(seqB):
-			pairScores.append([])
-			for j,aA in enumerate(seqA):
-				if aA == aB:
-					pairScores[i].append(match)
-				else:
-					pairScores[i].append(mismatch)
+	width = endA-startA+1
+	last = width-1
+	Iy,M,Ix = [MININF]*width,[MININF]*width,[MININF]*width
+	row = [Iy,M,Ix]
+	for state in range(3):
+		if exitState==None or exitState==state:
+			row[state][last] = 0
+	for j in range(last-1,-1,-1):
+		M[j] = Iy[j+1]-gap
+		Iy[j] = Iy[j+1]-extend
+	yield endB,row
+	for i in range(endB-1,startB-1,-1):
+		codeB = codesB[i]
+		nextIy,nextM,nextIx = row
+		Iy,M,Ix = [MININF]*width,[MININF]*width,[MININF]*width
+		row = [Iy,M,Ix]
+		for j in range(last,-1,-1):
+			diag = MININF
+			if j < last:
+				diag = nextM[j+1] + substitution[codesA[startA+j]][codeB]
+			down = MININF
+			if startA+j > 0:
+				down = nextIx[j]
+			right = MININF
+			if j < last and i > 0:
+				right = Iy[j+1]
+			M[j] = max(diag,down-gap,right-gap)
+			Ix[j] = max(diag,down-extend)
+			Iy[j] = max(diag,right-extend)
+			if not local and startA+j==0: # left margin, vertical gaps are in Iy
+				M[j] = max(M[j],nextIy[j]-gap)
+				Iy[j] = max(Iy[j],nextIy[j]-extend)
+			if not local and i==0 and j < last: # top margin, horizontal gaps are in Ix
+				M[j] = max(M[j],Ix[j+1]-gap)
+				Ix[j] = max(Ix[j],Ix[j+1]-extend)
+		yield i,row
+
+def affineBlock(codesA,codesB,gap,extend,substitution,startA,endA,startB,endB,entryState,exitState,local,alignment):
+	"""Align codesA[startA:endA] with codesB[startB:endB] using the full dynamic 
+	programming matrices, and append the result to alignment. Used by 
+	myersMiller when one of the sequences has less than two aminoacids, so the 
+	matrices have O(n+m) cells. The traceback follows the same preferences as 
+	needle and water. Returns the score.
+	"""
+	
+	rows = list(affineRows(codesA,codesB,gap,extend,substitution,startA,endA,startB,endB,entryState,local))
+	i,j = endB,endA
+	end = rows[-1]
+	if exitState==None:
+		maxArgs = [end[0][-1],end[1][-1],end[2][-1]]
+		score = max(maxArgs)
+		which = maxArgs.index(score)
 	else:
-		for i,aB in enumerate(seqB):
-			pairScores.append([])
-			for j,aA in enumerate(seqA):
-				pairScores[i].append(int(matrix[matrix[0].index(aA)][matrix[0].index(aB)]))			
-	return pairScores
+		which = exitState
+		score = end[which][-1]
+	block = [[],[]]
+	while (i,j) != (startB,startA):
+		row = rows[i-startB]
+		val = row[which][j-startA]
+		if not local and i==0: # top margin hit, go left
+			which = 2
+			block[0].append(aminoAcids[codesA[j-1]])
+			block[1].append('-')
+			j -= 1
+		elif not local and j==0: # left margin hit, go up
+			which = 0
+			block[0].append('-')
+			block[1].append(aminoAcids[codesB[i-1]])
+			i -= 1
+		elif which==0: #Iy
+			if row[1][j-1-startA]-gap == val: which = 1 #from M
+			block[0].append(aminoAcids[codesA[j-1]])
+			block[1].append('-')
+			j -= 1
+		elif which==2: #Ix
+			prevRow = rows[i-1-startB]
+			if prevRow[1][j-startA]-gap == val: which = 1 #from M
+			block[0].append('-')
+			block[1].append(aminoAcids[codesB[i-1]])
+			i -= 1
+		else: #M
+			prevRow = rows[i-1-startB]
+			prevVal = val - substitution[codesA[j-1]][codesB[i-1]]
+			if prevRow[1][j-1-startA] == prevVal: which = 1 #from M
+			elif prevRow[2][j-1-startA] == prevVal: which = 2 #from Ix
+			else: which = 0 #from Iy
+			block[0].append(aminoAcids[codesA[j-1]])
+			block[1].append(aminoAcids[codesB[i-1]])
+			i -= 1
+			j -= 1
+	alignment[0].extend(reversed(block[0]))
+	alignment[1].extend(reversed(block[1]))
+	return score
 
-if len(sys.argv)!=1 and len(sys.argv)!=7 and len(sys.argv)!=8:
-	print "Usage: python align_affine.py"
-	print "Usage: python align_affine.py global blosum50 gap extend HEAGAWGHEE PAWHEAE"
-	print "Usage: python align_affine.py global match mismatch gap extend HEAGAWGHEE PAWHEAE"
-	exit(0)
-elif len(sys.argv)==1:
-	#Default behaviour
-	# first example
-	seqA = "HEAGAWGHEE"
-	seqB = "PAWHEAE"
-	needle(seqA,seqB,gap=10,extend=1,matrixName="blosum50")
-	water(seqA,seqB,gap=10,extend=1,matrixName="blosum50")
-	# a second example
-	seqA = "GHGKKVADALTN"
-	seqB = "GHKRLLT"
-	needle(seqA,seqB,gap=10,extend=1,matrixName="blosum50")
-	# a third example
-	seqA = "VLSPADK"
-	seqB = "HLAESK"
-	needle(seqA,seqB,gap=12,extend=2,matrixName="blosum50")
-elif len(sys.argv)==7 or len(sys.argv)==8:
-	#Alignment according to the received arguments
-	if sys.argv[1]=="global":
-		if len(sys.argv)==7:
-			needle(sys.argv[5],sys.argv[6],gap=sys.argv[3],extend=sys.argv[4],matrixName=sys.argv[2])
-		else:
-			needle(sys.argv[6],sys.argv[7],gap=sys.argv[4],extend=sys.argv[5],match=sys.argv[2],mismatch=sys.argv[3])
-	elif sys.argv[1]=="local":
-		if len(sys.argv)==7:
-			water(sys.argv[5],sys.argv[6],gap=sys.argv[3],extend=sys.argv[4],matrixName=sys.argv[2])
-		else:
-			water(sys.argv[6],sys.argv[7],gap=sys.argv[4],extend=sys.argv[5],match=sys.argv[2],mismatch=sys.argv[3])
+def myersMiller(codesA,codesB,gap,extend,substitution,startA,endA,startB,endB,entryState,exitState,local,alignment):
+	"""Align codesA[startA:endA] with codesB[startB:endB] in linear space, for paths
+	starting in entryState and ending in exitState (None for any state), and 
+	append the result to alignment. Returns the score.
+	The middle row of codesB is reached with a forward pass from the top and a 
+	reverse pass from the bottom; the optimal path goes through the cell and 
+	state where the sum of the two is maximal, which splits the problem in two.
+	Keeping the state of the split cell (instead of only its column) is what 
+	lets a gap that crosses the middle row be charged a single opening penalty.
+	"""
+	
+	if endA-startA < 2 or endB-startB < 2:
+		return affineBlock(codesA,codesB,gap,extend,substitution,startA,endA,startB,endB,entryState,exitState,local,alignment)
+	midB = (startB+endB)/2
+	for top in affineRows(codesA,codesB,gap,extend,substitution,startA,endA,startB,midB,entryState,local):
+		pass
+	for i,bottom in affineReverseRows(codesA,codesB,gap,extend,substitution,startA,endA,midB,endB,exitState,local):
+		pass
+	bestScore = None
+	for k in range(endA-startA+1):
+		for state in (0,2,1): # on ties, prefer the rightmost cell, and M then Ix
+			if bestScore==None or top[state][k]+bottom[state][k] >= bestScore:
+				bestScore = top[state][k]+bottom[state][k]
+				bestK,bestState = k,state
+	del top,bottom
+	myersMiller(codesA,codesB,gap,extend,substitution,startA,startA+bestK,startB,midB,entryState,bestState,local,alignment)
+	myersMiller(codesA,codesB,gap,extend,substitution,startA+bestK,endA,midB,endB,bestState,exitState,local,alignment)
+	return bestScore
+
+def needleBanded(codesA,codesB,gap,extend,substitution,band,xdrop):
+	"""Globally align two encoded sequences computing only some of the cells of 
+	the dynamic programming matrices: with a band width, the diagonals from 
+	min(0,lenA-lenB)-band to max(0,lenA-lenB)+band (so both corners are in the 
+	band); with an X-drop value, the cells whose best state scores at most 
+	xdrop below the best score computed so far (the others are dropped, and a 
+	row ends at the first dropped cell after the end of the previous row). 
+	Every row is kept as its first column and its [Iy,M,Ix] values, so the 
+	work and the memory are O(n*band). The margins and the traceback follow 
+	the same rules as needle.
+	Returns the score (None if the bottom right cell was dropped), the two 
+	aligned sequences, and whether the path touches a limit of the computed 
+	region, in which case a better path may have been clipped.
+	"""
+	
+	lenA,lenB = len(codesA),len(codesB)
+	diagLo,diagHi = -lenB,lenA
+	if band!=None:
+		diagLo,diagHi = min(0,lenA-lenB)-band,max(0,lenA-lenB)+band
+	best = 0
+	rows = [] # [first column, Iy, M, Ix] of every row
+	for i in range(lenB+1):
+		lo,hi = max(0,i+diagLo),min(lenA,i+diagHi)
+		prevLo,prevHi = lo,lo-2
+		if i > 0:
+			prevLo,prevIy,prevM,prevIx = rows[-1]
+			prevHi = prevLo+len(prevM)-1
+			lo = max(lo,prevLo)
+		Iy,M,Ix = [],[],[]
+		for j in range(lo,hi+1):
+			valIy,valM,valIx = MININF,MININF,MININF
+			if i==0 and j==0:
+				valM = 0
+			elif i==0: # top margin, the gaps are kept in Ix
+				valIx = max(M[-1]-gap,Ix[-1]-extend)
+			elif j==0: # left margin, the gaps are kept in Iy
+				valIy = max(prevM[0]-gap,prevIy[0]-extend)
+			else:
+				if prevLo <= j-1 <= prevHi:
+					k = j-1-prevLo
+					valM = max(prevM[k],prevIx[k],prevIy[k]) + substitution[codesA[j-1]][codesB[i-1]]
+				if prevLo <= j <= prevHi:
+					valIx = max(prevM[j-prevLo]-gap,prevIx[j-prevLo]-extend)
+				if j > lo:
+					valIy = max(M[-1]-gap,Iy[-1]-extend)
+			if xdrop!=None and max(valIy,valM,valIx) < best-xdrop:
+				valIy,valM,valIx = MININF,MININF,MININF
+				if j > prevHi+1:
+					break
+			Iy.append(valIy)
+			M.append(valM)
+			Ix.append(valIx)
+		# - keep only the computed part of the row
+		while M and max(Iy[-1],M[-1],Ix[-1])==MININF:
+			Iy.pop(); M.pop(); Ix.pop()
+		while M and max(Iy[0],M[0],Ix[0])==MININF:
+			Iy.pop(0); M.pop(0); Ix.pop(0)
+			lo += 1
+		if not M:
+			return None,'','',True
+		best = max(best,max(Iy),max(M),max(Ix))
+		rows.append([lo,Iy,M,Ix])
+	
+	#Backtracking (same preferences as in needle)
+	lo,Iy,M,Ix = rows[lenB]
+	if lo+len(M)-1 != lenA:
+		return None,'','',True
+	maxArgs = [Iy[-1],M[-1],Ix[-1]]
+	score = max(maxArgs)
+	which = maxArgs.index(score)
+	i,j = lenB,lenA
+	alignment = [[],[]]
+	clipped = False
+	while (i,j) != (0,0):
+		lo = rows[i][0]
+		if (j==lo and lo > 0) or (j==lo+len(rows[i][2])-1 and j < lenA):
+			clipped = True
+		val = rows[i][which+1][j-lo]
+		if i==0: # top margin hit, go left
+			which = 2
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append('-')
+			j -= 1
+		elif j==0: # left margin hit, go up
+			which = 0
+			alignment[0].append('-')
+			alignment[1].append(aminoAcids[codesB[i-1]])
+			i -= 1
+		elif which==0: #Iy
+			if bandCell(rows,i,1,j-1)-gap == val: which = 1 #from M
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append('-')
+			j -= 1
+		elif which==2: #Ix
+			if bandCell(rows,i-1,1,j)-gap == val: which = 1 #from M
+			alignment[0].append('-')
+			alignment[1].append(aminoAcids[codesB[i-1]])
+			i -= 1
+		else: #M
+			prevVal = val - substitution[codesA[j-1]][codesB[i-1]]
+			if bandCell(rows,i-1,1,j-1) == prevVal: which = 1 #from M
+			elif bandCell(rows,i-1,2,j-1) == prevVal: which = 2 #from Ix
+			else: which = 0 #from Iy
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append(aminoAcids[codesB[i-1]])
+			i -= 1
+			j -= 1
+	return score,''.join(reversed(alignment[0])),''.join(reversed(alignment[1])),clipped
+
+def bandCell(rows,i,state,j):
+	"""Return the value of a state (0 => Iy, 1 => M, 2 => Ix) in cell (i,j) of
+	banded matrices (see needleBanded), minus infinity if it was not computed.
+	"""
+	
+	lo = rows[i][0]
+	values = rows[i][state+1]
+	if lo <= j < lo+len(values):
+		return values[j-lo]
+	return MININF
+
+def waterEnd(codesA,codesB,gap,extend,substitution):
+	"""Find the score and the (row,column) end cell of the best local alignment, 
+	keeping only two rows of the dynamic programming matrices in memory. 
+	The end cell is the same one that water starts backtracking from.
+	"""
+	
+	prevIy,prevM,prevIx = [MININF]*(len(codesA)+1),[0]*(len(codesA)+1),[MININF]*(len(codesA)+1)
+	overallMax = [0,0,0]
+	for i,codeB in enumerate(codesB):
+		Iy,M,Ix = [MININF],[0],[MININF]
+		for j,codeA in enumerate(codesA):
+			Ix.append(max(prevM[j+1]-gap,prevIx[j+1]-extend))
+			Iy.append(max(M[j]-gap,Iy[j]-extend))
+			M.append(max(max(prevM[j],prevIx[j],prevIy[j])+substitution[codeA][codeB],0))
+			if M[j+1] > overallMax[0]:
+				overallMax = [M[j+1],i+1,j+1]
+		prevIy,prevM,prevIx = Iy,M,Ix
+	return overallMax
+
+def waterScore(seqA,seqB,gap,extend,match=None,mismatch=None,matrixName=None,lanes=LANES):
+	"""Compute only the score and the (row,column) end cell of the best local 
+	alignment of seqA with seqB (affine gap model), using a striped query 
+	profile of seqA. No traceback matrices are built, so this is the function
+	to use when only the scores are needed (e.g. when searching a database).
+	Queries shorter than STRIPEDMIN residues are scored by waterEnd instead:
+	for them the NumPy calls of each row cost more than the loop over the
+	cells of the row.
+	Returns [score,endB,endA], the same values as waterEnd.
+	"""
+	
+	if not areArgumentsValid(seqA,seqB,gap,extend,match,mismatch,matrixName):
+		return
+	if numpy==None:
+		print "The striped score engine needs NumPy to be installed."
+		return
+	encoded = encodePair(seqA,seqB)
+	if encoded==None:
+		return
+	codesA,codesB = encoded
+	if matrixName==None:
+		substitution = createSubstitutionMatrix(int(match),int(mismatch))
 	else:
-		print "Usage: python align_affine.py global blosum50 gap extend HEAGAWGHEE PAWHEAE"
-		print sys.argv[1]+" is not a valid arg. Use global or local."
+		substitution = getMatrix(matrixName)
+	if len(codesA) < STRIPEDMIN:
+		return waterEnd(codesA,codesB,int(gap),int(extend),substitution)
+	profile = createQueryProfile(codesA,substitution,lanes)
+	return stripedWater(profile,codesB,int(gap),int(extend))
+
+def createQueryProfile(codesA,substitution,lanes=LANES):
+	"""Create the striped query profile of the encoded sequence codesA: for 
+	every residue code, the scores against codesA arranged as a 
+	(segments x lanes) int16 array, where lane l holds the positions 
+	l*segments ... (l+1)*segments-1 of codesA. The padding positions after 
+	the end of codesA get the lowest score, so they never start an alignment.
+	By default (lanes None) there is a lane per position of codesA, and one
+	segment: each row is then computed by a fixed number of NumPy calls.
+	"""
+	
+	if lanes==None:
+		lanes = max(1,len(codesA))
+	segLen = max(1,(len(codesA)+lanes-1)/lanes)
+	low = numpy.iinfo(numpy.int16).min/2
+	profile = numpy.empty((len(aminoAcids),lanes*segLen),dtype=numpy.int16)
+	profile.fill(low)
+	profile[:,:len(codesA)] = createProfile(codesA,substitution)
+	# - position j goes to lane j/segLen, segment j%segLen
+	profile = profile.reshape(len(aminoAcids),lanes,segLen).transpose(0,2,1).copy()
+	return profile
+
+def stripedWater(profile,codesB,gap,extend):
+	"""Compute the score and the end cell of the best local alignment of the
+	query (given as a striped profile) with the encoded sequence codesB, using
+	int16 lanes first and int32 lanes if the score gets too close to the int16
+	limit. Returns [score,endB,endA].
+	"""
+	
+	result = stripedWaterPass(profile,codesB,gap,extend,numpy.int16)
+	if result==None: # overflow, recompute with wider lanes
+		result = stripedWaterPass(profile.astype(numpy.int32),codesB,gap,extend,numpy.int32)
+	return result
+
+def stripedWaterPass(profile,codesB,gap,extend,dtype):
+	"""One pass of Smith-Waterman over the query profile (in the striped
+	layout of Farrar, without his lazy-F loop) with the 
+	recurrences of water: M comes from the best of M, Ix and Iy on the 
+	diagonal, Ix (vertical gaps) from M and Ix on the previous row, and Iy
+	(horizontal gaps) from M and Iy on the left. 
+	M and Ix of a whole row only depend on the previous row, so they are 
+	computed for all the segments and lanes at once. Iy is first computed 
+	within each lane; the gaps that cross from one lane to the next are then 
+	carried over all at once by a running maximum over the lanes: what
+	enters lane l is the best of what leaves the lanes before it, less
+	extend for each position in between. 
+	Values saturate at a floor (so subtracting gap or extend never wraps 
+	around); returns None if the score could overflow dtype.
+	"""
+	
+	segLen,lanes = profile.shape[1:]
+	low = numpy.iinfo(dtype).min + gap + extend
+	limit = numpy.iinfo(dtype).max - int(profile.max())
+	if gap+extend > numpy.iinfo(dtype).max/2:
+		return None
+	overallMax = [0,0,0]
+	H = numpy.zeros((segLen,lanes),dtype=dtype) # best of M, Ix and Iy
+	M = numpy.zeros((segLen,lanes),dtype=dtype)
+	Ix = numpy.empty((segLen,lanes),dtype=dtype)
+	Ix.fill(low)
+	diag = numpy.empty((segLen,lanes),dtype=dtype)
+	# - what a horizontal gap loses from lane to lane, and from segment to segment
+	laneDecay = extend*segLen*numpy.arange(lanes,dtype=numpy.int64)
+	segmentDecay = (extend*numpy.arange(segLen,dtype=numpy.int64))[:,None]
+	carried = numpy.empty(lanes,dtype=numpy.int64)
+	carried[0] = low
+	for i,code in enumerate(codesB):
+		# - diagonal: previous segment, and previous lane for the first segment
+		diag[1:] = H[:-1]
+		diag[0,1:] = H[-1,:-1]
+		diag[0,0] = 0
+		Ix = numpy.maximum(numpy.maximum(M-gap,Ix-extend),low)
+		M = numpy.maximum(diag+profile[code],0)
+		# - horizontal gaps within each lane (the first lane starts from M(i,0)=0)
+		Iy = numpy.empty((segLen,lanes),dtype=dtype)
+		vIy = numpy.empty(lanes,dtype=dtype)
+		vIy.fill(low)
+		vIy[0] = -gap
+		for k in range(segLen):
+			Iy[k] = vIy
+			vIy = numpy.maximum(numpy.maximum(M[k]-gap,vIy-extend),low)
+		# - carry the horizontal gaps over to the next lanes (in int64, the
+		# decays do not fit in dtype)
+		carried[1:] = (numpy.maximum.accumulate(vIy+laneDecay)-laneDecay)[:-1]
+		Iy = numpy.maximum(Iy,numpy.maximum(carried-segmentDecay,low).astype(dtype))
+		H = numpy.maximum(numpy.maximum(M,Ix),Iy)
+		# - update the overall maximum (first one in row order, as in water)
+		rowMax = int(M.max())
+		if rowMax > limit:
+			return None
+		if rowMax > overallMax[0]:
+			segments,laneIds = numpy.nonzero(M==rowMax)
+			overallMax = [rowMax,i+1,int((laneIds*segLen+segments).min())+1]
+	return overallMax
+
+def waterStart(codesA,codesB,gap,extend,substitution,endA,endB,score):
+	"""Find the (row,column) start cell of the best local alignment ending in
+	(endB,endA) with the given score: the cell closest to the end from which 
+	a path starting in M reaches the end with the whole score. 
+	"""
+	
+	for i,row in affineReverseRows(codesA,codesB,gap,extend,substitution,0,endA,0,endB,1,True):
+		for j in range(endA,-1,-1):
+			if row[1][j] == score:
+				return i,j
+
+if __name__=="__main__":
+	# Options (e.g. --linear, --scoreonly, --engine=wfa, --verbosity=full) can be given anywhere on the command line
+	options = {}
+	for arg in sys.argv[1:]:
+		if arg.startswith("--"):
+			name,_,value = arg[2:].partition("=")
+			options[name] = value
+	args = [arg for arg in sys.argv if not arg.startswith("--")]
+	linearSpace = "linear" in options
+	engine = options.get("engine","python")
+	band = options.get("band")
+	xdrop = options.get("xdrop")
+	# The default run shows all the matrices (align_affine.txt); otherwise they 
+	# are only printed when the output goes to a terminal
+	defaultVerbosity = "full" if len(args)==1 or sys.stdout.isatty() else "summary"
+	verbosity = verbosityLevels.get(options.get("verbosity",defaultVerbosity))
+
+	if (len(args)!=1 and len(args)!=7 and len(args)!=8) or\
+	 not set(options).issubset(["linear","scoreonly","engine","verbosity","band","xdrop"]) or verbosity==None:
+		print "Usage: python align_affine.py [options]"
+		print "Usage: python align_affine.py global blosum50 gap extend HEAGAWGHEE PAWHEAE [options]"
+		print "Usage: python align_affine.py global match mismatch gap extend HEAGAWGHEE PAWHEAE [options]"
+		print "  --linear: alignment in linear space (Myers-Miller)"
+		print "  --scoreonly: local alignment score and end cell only (query profile engine)"
+		print "  --engine=python|wfa: engine of the global alignment (wfa: with match/mismatch values)"
+		print "  --verbosity=silent|summary|full: what to print (full also prints the matrices)"
+		print "  --band=N, --xdrop=N: global alignment restricted to a diagonal band / by X-drop"
 		exit(0)
+	elif len(args)==1:
+		#Default behaviour
+		# first example
+		seqA = "HEAGAWGHEE"
+		seqB = "PAWHEAE"
+		needle(seqA,seqB,gap=10,extend=1,matrixName="blosum50",linearSpace=linearSpace,verbosity=verbosity,\
+			band=band,xdrop=xdrop,engine=engine)
+		water(seqA,seqB,gap=10,extend=1,matrixName="blosum50",linearSpace=linearSpace,verbosity=verbosity)
+		# a second example
+		seqA = "GHGKKVADALTN"
+		seqB = "GHKRLLT"
+		needle(seqA,seqB,gap=10,extend=1,matrixName="blosum50",linearSpace=linearSpace,verbosity=verbosity,\
+			band=band,xdrop=xdrop,engine=engine)
+		# a third example
+		seqA = "VLSPADK"
+		seqB = "HLAESK"
+		needle(seqA,seqB,gap=12,extend=2,matrixName="blosum50",linearSpace=linearSpace,verbosity=verbosity,\
+			band=band,xdrop=xdrop,engine=engine)
+	elif len(args)==7 or len(args)==8:
+		#Alignment according to the received arguments
+		if args[1]=="global":
+			if len(args)==7:
+				needle(args[5],args[6],gap=args[3],extend=args[4],matrixName=args[2],linearSpace=linearSpace,verbosity=verbosity,\
+					band=band,xdrop=xdrop,engine=engine)
+			else:
+				needle(args[6],args[7],gap=args[4],extend=args[5],match=args[2],mismatch=args[3],linearSpace=linearSpace,verbosity=verbosity,\
+					band=band,xdrop=xdrop,engine=engine)
+		elif args[1]=="local" and engine!="python":
+			print "The "+engine+" engine only computes global alignments."
+		elif args[1]=="local" and "scoreonly" in options:
+			if len(args)==7:
+				result = waterScore(args[5],args[6],gap=args[3],extend=args[4],matrixName=args[2])
+			else:
+				result = waterScore(args[6],args[7],gap=args[4],extend=args[5],match=args[2],mismatch=args[3])
+			if result!=None:
+				print "Best local alignment score: "+str(result[0])+", ending at "+str(tuple(result[1:]))
+		elif args[1]=="local":
+			if len(args)==7:
+				water(args[5],args[6],gap=args[3],extend=args[4],matrixName=args[2],linearSpace=linearSpace,verbosity=verbosity)
+			else:
+				water(args[6],args[7],gap=args[4],extend=args[5],match=args[2],mismatch=args[3],linearSpace=linearSpace,verbosity=verbosity)
+		else:
+			print "Usage: python align_affine.py global blosum50 gap extend HEAGAWGHEE PAWHEAE"
+			print args[1]+" is not a valid arg. Use global or local."
+			exit(0)
@@ -0,0 +1,260 @@
+"""This is a Python script for aligning many pairs of aminoacid sequences in
+one run, with needle or water from align.py (linear gap model) or
+align_affine.py (affine gap model).
+
+The pairs are read from a file or from the standard input, either as TSV
+lines (seqA, seqB, or name, seqA, seqB) or as FASTA records (each two
+records form a pair). They are aligned in chunks by a pool of processes,
+with only a few chunks in flight, and one record per alignment is written
+as soon as its chunk is done (TSV or JSON lines, in the order of the
+input), so the memory used does not depend on the size of the input.
+With --stats, the timings of the alignments (see stats.py) are added up
+and printed at the end. A pair that can not be aligned (not aminoacid
+sequences, or an error of the aligner) is skipped, and reported on the
+standard error.
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import sys
+import json
+import multiprocessing
+from collections import deque
+from fasta import openText,readFasta
+from scoring import encodeSequence
+from matrices import scoringMatrices
+from result import SILENT
+from cache import cached
+from stats import enableStats,StatsSummary
+import align
+import align_affine
+
+CHUNK = 64 # pairs sent to a worker at a time
+fields = ["name","score","identity","startA","endA","startB","endB","gapOpens","clipped","alignedA","alignedB"]
+
+# - state of a worker process, set once by initWorker
+worker = {}
+
+def getAligner(model,mode,useCache=False):
+	"""Return needle or water (mode "global" or "local") of align.py or
+	align_affine.py (model "linear" or "affine"), with the result cache if
+	useCache is True (see cache.py).
+	"""
+
+	module = align_affine if model=="affine" else align
+	aligner = module.water if mode=="local" else module.needle
+	if useCache:
+		aligner = cached(aligner)
+	return aligner
+
+def initWorker(model,mode,parameters,useCache,withStats=False,aligner=None):
+	"""Prepare the alignments in a worker process (with the given aligner, if
+	any, instead of getAligner).
+	"""
+
+	worker["aligner"] = getAligner(model,mode,useCache) if aligner==None else aligner
+	worker["parameters"] = parameters
+	enableStats(withStats)
+
+def alignChunk(pairs):
+	"""Align a chunk of (name,seqA,seqB) pairs. Returns the records (dicts with
+	the fields) of the alignments, the (name,reason) pairs of the pairs that
+	were skipped (not aminoacid sequences, or the aligner failed), and the
+	StatsSummary of the alignments computed (not the ones answered from the
+	cache).
+	"""
+
+	records = []
+	skipped = []
+	summary = StatsSummary()
+	for name,seqA,seqB in pairs:
+		if not seqA or not seqB or encodeSequence(seqA)==None or encodeSequence(seqB)==None:
+			skipped.append((name,"not aminoacid sequences"))
+			continue
+		try:
+			result = worker["aligner"](seqA,seqB,verbosity=SILENT,**worker["parameters"])
+		except Exception as error:
+			# - one failing pair does not stop the chunk (nor the pool)
+			skipped.append((name,"the aligner failed ("+type(error).__name__+": "+str(error)+")"))
+			continue
+		if result==None:
+			skipped.append((name,"no alignment"))
+			continue
+		if result.stats!=None:
+			summary.add(result.stats)
+		records.append({"name":name,"score":result.score,"identity":round(result.identity,4),\
+			"startA":result.startA,"endA":result.endA,"startB":result.startB,"endB":result.endB,\
+			"gapOpens":result.gapOpens,"clipped":result.clipped,"alignedA":result.alignedA,"alignedB":result.alignedB})
+	return records,skipped,summary
+
+def readPairs(path,inputFormat):
+	"""Generate the (name,seqA,seqB) pairs of a TSV or FASTA file ("-" is the
+	standard input). The pairs of a TSV file without names are named after
+	their line number, and the FASTA pairs after their two records.
+	"""
+
+	if inputFormat=="fasta":
+		first = None
+		for name,seq in readFasta(path):
+			if first==None:
+				first = (name,seq)
+			else:
+				yield first[0]+"/"+name,first[1],seq
+				first = None
+		if first!=None:
+			sys.stderr.write("The last FASTA record ("+first[0]+") has no pair.\n")
+		return
+	pairFile = openText(path)
+	for lineNumber,line in enumerate(pairFile):
+		words = line.rstrip("\r\n").split("\t")
+		if not line.strip() or line.startswith("#"):
+			continue
+		if len(words)==2:
+			yield str(lineNumber+1),words[0].strip().upper(),words[1].strip().upper()
+		elif len(words)==3:
+			yield words[0],words[1].strip().upper(),words[2].strip().upper()
+		else:
+			sys.stderr.write("Line "+str(lineNumber+1)+" is not a pair of sequences.\n")
+	pairFile.close()
+
+def readChunks(pairs,chunkSize):
+	"""Generate the pairs in chunks.
+	"""
+
+	chunk = []
+	for pair in pairs:
+		chunk.append(pair)
+		if len(chunk)==chunkSize:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+def formatRecord(record,outputFormat):
+	"""Return the line of a record, as TSV or JSON.
+	"""
+
+	if outputFormat=="jsonl":
+		return json.dumps(record,sort_keys=True)+"\n"
+	return "\t".join(["" if record[field]==None else str(record[field]) for field in fields])+"\n"
+
+def alignPairs(pairs,output,model="linear",mode="global",parameters={},outputFormat="tsv",\
+	processes=None,chunkSize=CHUNK,useCache=False,summary=None,aligner=None):
+	"""Align the (name,seqA,seqB) pairs, writing one record per alignment to
+	the output file (in the order of the pairs). The parameters are the
+	keyword arguments of the aligner (gap, extend, matrixName...); the
+	aligner is the one of the model and mode, unless one is given.
+	If a StatsSummary is given, the stats of the alignments are added to it.
+	Returns the number of pairs aligned and skipped.
+	"""
+
+	if processes==None:
+		processes = multiprocessing.cpu_count()
+	counts = [0,0] # aligned, skipped
+	def write(found):
+		records,skipped,chunkSummary = found
+		if summary!=None:
+			summary.add(chunkSummary)
+		for record in records:
+			output.write(formatRecord(record,outputFormat))
+		for name,reason in skipped:
+			sys.stderr.write("Skipped the pair "+name+": "+reason+".\n")
+		output.flush()
+		counts[0] += len(records)
+		counts[1] += len(skipped)
+
+	if outputFormat=="tsv":
+		output.write("#"+"\t".join(fields)+"\n")
+	if processes==1:
+		initWorker(model,mode,parameters,useCache,summary!=None,aligner)
+		for chunk in readChunks(pairs,chunkSize):
+			write(alignChunk(chunk))
+	else:
+		pool = multiprocessing.Pool(processes,initWorker,(model,mode,parameters,useCache,summary!=None,aligner))
+		# - only a few chunks per process are in flight, so the input is never
+		# read in memory as a whole
+		pending = deque()
+		for chunk in readChunks(pairs,chunkSize):
+			pending.append(pool.apply_async(alignChunk,(chunk,)))
+			if len(pending) >= 4*processes:
+				write(pending.popleft().get())
+		while pending:
+			write(pending.popleft().get())
+		pool.close()
+		pool.join()
+	return counts[0],counts[1]
+
+if __name__=="__main__":
+	# Options (e.g. --mode=local, --format=jsonl) can be given anywhere on the command line
+	options = {}
+	for arg in sys.argv[1:]:
+		if arg.startswith("--"):
+			name,_,value = arg[2:].partition("=")
+			options[name] = value
+	args = [arg for arg in sys.argv if not arg.startswith("--")]
+
+	if len(args) > 2 or not set(options).issubset(["model","mode","matrix","match","mismatch","gap","extend",\
+	 "linear","engine","band","xdrop","input","format","output","processes","chunk","cache","stats"]) or\
+	 options.get("model","linear") not in ["linear","affine"] or options.get("mode","global") not in ["global","local"] or\
+	 options.get("input","tsv") not in ["tsv","fasta"] or options.get("format","tsv") not in ["tsv","jsonl"]:
+		print "Usage: python batch.py [pairs.tsv|pairs.fasta|-] [options]"
+		print "  the pairs are read from the standard input if no file is given"
+		print "  --model=linear|affine: gap model (align.py or align_affine.py), default linear"
+		print "  --mode=global|local: Needleman-Wunch or Smith-Waterman, default global"
+		print "  --matrix=name: scoring matrix ("+", ".join(scoringMatrices)+"), default blosum62"
+		print "  --match=1 --mismatch=-1: match/mismatch values instead of a matrix"
+		print "  --gap=8 --extend=1: gap (opening) and extension penalties"
+		print "  --linear, --engine=name, --band=N, --xdrop=N: as in align.py and align_affine.py"
+		print "  --input=tsv|fasta: format of the pairs (TSV: seqA, seqB or name, seqA, seqB;"
+		print "    FASTA: each two records), default fasta for .fa/.fasta files, else tsv"
+		print "  --format=tsv|jsonl: format of the records, default tsv"
+		print "  --output=file: write the records to a file instead of the standard output"
+		print "  --processes=N: number of worker processes, default the number of cores"
+		print "  --chunk=64: pairs sent to a worker at a time"
+		print "  --cache: use the cache of the alignment results (see cache.py)"
+		print "  --stats: print the time of each phase of the alignments, their GCUPS and peak memory"
+		exit(0)
+	path = args[1] if len(args)==2 else "-"
+	inputFormat = options.get("input")
+	if inputFormat==None:
+		isFasta = [ext for ext in [".fa",".fasta",".faa"] if path.endswith(ext) or path.endswith(ext+".gz")]
+		inputFormat = "fasta" if isFasta else "tsv"
+	model,mode = options.get("model","linear"),options.get("mode","global")
+	try:
+		parameters = {"gap":int(options.get("gap",8))}
+		if model=="affine":
+			parameters["extend"] = int(options.get("extend",1))
+		if "match" in options or "mismatch" in options:
+			parameters["match"],parameters["mismatch"] = int(options.get("match")),int(options.get("mismatch"))
+		else:
+			parameters["matrixName"] = options.get("matrix","blosum62")
+		for name in ["band","xdrop"]:
+			if name in options:
+				parameters[name] = int(options[name])
+		processes = int(options["processes"]) if "processes" in options else None
+		chunkSize = int(options.get("chunk",CHUNK))
+	except (TypeError,ValueError):
+		print "The numeric options should be integers (and match and mismatch go together)."
+		exit(0)
+	if "linear" in options:
+		parameters["linearSpace"] = True
+	if "engine" in options:
+		parameters["engine"] = options["engine"]
+
+	#Check the parameters once, on a small pair (the aligner prints what is wrong)
+	try:
+		if getAligner(model,mode)("A","A",verbosity=SILENT,**parameters)==None:
+			exit(0)
+	except TypeError:
+		print "Some options are not supported by the "+mode+" alignment of the "+model+" gap model."
+		exit(0)
+	output = open(options["output"],"w") if "output" in options else sys.stdout
+	summary = StatsSummary() if "stats" in options else None
+	aligned,skipped = alignPairs(readPairs(path,inputFormat),output,model,mode,parameters,\
+		options.get("format","tsv"),processes,chunkSize,"cache" in options,summary)
+	if output!=sys.stdout:
+		output.close()
+	sys.stderr.write("Aligned "+str(aligned)+" pairs ("+str(skipped)+" skipped).\n")
+	if summary!=None:
+		sys.stderr.write("\n".join(summary.lines())+"\n")
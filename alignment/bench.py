@@ -0,0 +1,367 @@
+"""Benchmark of the engines of needle and water (align.py and align_affine.py)
+on random and mutated pairs of aminoacid sequences, and cross-checks of
+their results, so that a faster engine can not silently change the scores.
+
+Every engine is timed in a fresh process (its peak memory is then the one
+of the alignment), and reported with its cells per second, as long as the
+pair is below the cell limit of the engine (the python engines would take
+hours on the longest pairs). The cross-checks run on the small pairs:
+- every engine gives the score of the python engine, and every alignment
+  scores what its engine reports, with the residues of the sequences;
+- the affine gap model with gap == extend gives the scores of the linear one;
+- a sequence aligned with itself has the same global and local score;
+- the striped score engine gives the score of water;
+- the linear space mode of needle gives the score of the full matrix with
+  every scoring matrix, match/mismatch values and a few gap penalties (and
+  an alignment of the two sequences with this score: Hirschberg may pick
+  another one of the optimal alignments).
+The pairs of a batch (batch.py) are also checked in worker processes: with
+the tiled engine, which can not start a pool of its own there, and with an
+aligner that raises, whose pairs are skipped without stopping the run.
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import sys
+import json
+import time
+import random
+import multiprocessing
+from StringIO import StringIO
+from scoring import aminoAcids,encodeSequence,createSubstitutionMatrix
+from matrices import scoringMatrices,getMatrix
+from result import SILENT
+from stats import enableStats,peakMemory
+import align
+import align_affine
+import batch
+
+LENGTHS = [10,100,1000,5000,20000]
+MUTATION = 0.1 # rate of substitutions, insertions and deletions of the mutated pairs
+CHECK_CELLS = 40000 # the cross-checks run on the pairs of at most so many cells
+BAND = 32 # half width of the band of the banded engines
+MATRIX,GAP,EXTEND = "blosum62",10,1 # scoring of the benchmark (linear gap: GAP)
+MATCH,MISMATCH = 2,-1 # scoring of the wfa engines
+LINEAR_GAPS = [2,8,12] # gaps of the checks of the linear space mode
+EXAMPLES = [("HEAGAWGHEE","PAWHEAE"),("GHGKKVADALTN","GHKRLLT")] # the examples of align.py, also cross-checked
+
+# Engines: name => (model, mode, function aligning seqA with seqB); the wfa
+# engines need match/mismatch values, so they are also checked with them
+benchEngines = {
+	"needle/python":("linear","global",lambda a,b: align.needle(a,b,GAP,matrixName=MATRIX,verbosity=SILENT)),
+	"needle/numpy":("linear","global",lambda a,b: align.needle(a,b,GAP,matrixName=MATRIX,engine="numpy",verbosity=SILENT)),
+	"needle/linear":("linear","global",lambda a,b: align.needle(a,b,GAP,matrixName=MATRIX,linearSpace=True,verbosity=SILENT)),
+	"needle/banded":("linear","global",lambda a,b: align.needle(a,b,GAP,matrixName=MATRIX,band=BAND,verbosity=SILENT)),
+	"needle/tiled":("linear","global",lambda a,b: align.needle(a,b,GAP,matrixName=MATRIX,engine="tiled",verbosity=SILENT)),
+	"needle/wfa":("linear","global",lambda a,b: align.needle(a,b,GAP,match=MATCH,mismatch=MISMATCH,engine="wfa",verbosity=SILENT)),
+	"water/python":("linear","local",lambda a,b: align.water(a,b,GAP,matrixName=MATRIX,verbosity=SILENT)),
+	"water/numpy":("linear","local",lambda a,b: align.water(a,b,GAP,matrixName=MATRIX,engine="numpy",verbosity=SILENT)),
+	"water/tiled":("linear","local",lambda a,b: align.water(a,b,GAP,matrixName=MATRIX,engine="tiled",verbosity=SILENT)),
+	"needle_affine/python":("affine","global",lambda a,b: align_affine.needle(a,b,GAP,EXTEND,matrixName=MATRIX,verbosity=SILENT)),
+	"needle_affine/linear":("affine","global",lambda a,b: align_affine.needle(a,b,GAP,EXTEND,matrixName=MATRIX,linearSpace=True,verbosity=SILENT)),
+	"needle_affine/banded":("affine","global",lambda a,b: align_affine.needle(a,b,GAP,EXTEND,matrixName=MATRIX,band=BAND,verbosity=SILENT)),
+	"needle_affine/wfa":("affine","global",lambda a,b: align_affine.needle(a,b,GAP,EXTEND,match=MATCH,mismatch=MISMATCH,engine="wfa",verbosity=SILENT)),
+	"water_affine/python":("affine","local",lambda a,b: align_affine.water(a,b,GAP,EXTEND,matrixName=MATRIX,verbosity=SILENT)),
+	"water_affine/linear":("affine","local",lambda a,b: align_affine.water(a,b,GAP,EXTEND,matrixName=MATRIX,linearSpace=True,verbosity=SILENT)),
+	"water_affine/striped":("affine","local",lambda a,b: align_affine.waterScore(a,b,GAP,EXTEND,matrixName=MATRIX)),
+}
+engineOrder = ["needle/python","needle/numpy","needle/linear","needle/banded","needle/tiled","needle/wfa",\
+	"water/python","water/numpy","water/tiled","needle_affine/python","needle_affine/linear","needle_affine/banded",\
+	"needle_affine/wfa","water_affine/python","water_affine/linear","water_affine/striped"]
+
+# Largest pair (len(seqA)*len(seqB)) timed by each engine; the banded engines
+# only compute a band, and the wfa engines are fast on similar sequences
+cellLimits = {"python":2e6,"numpy":3e7,"linear":2e6,"banded":4e8,"tiled":2e6,"wfa":2e6,"striped":1e7}
+mutatedLimits = {"wfa":3e7}
+
+def randomSequence(length,rand):
+	"""Return a random aminoacid sequence.
+	"""
+
+	return ''.join([rand.choice(aminoAcids) for i in range(length)])
+
+def mutateSequence(seq,rate,rand):
+	"""Return a copy of a sequence with substitutions, insertions and
+	deletions (each a third of the rate), and at least one residue.
+	"""
+
+	mutated = []
+	for aa in seq:
+		event = rand.random()
+		if event < rate/3:
+			mutated.append(rand.choice(aminoAcids))
+		elif event < 2*rate/3:
+			mutated.append(aa+rand.choice(aminoAcids))
+		elif event >= rate:
+			mutated.append(aa)
+	return ''.join(mutated) or seq
+
+def createPairs(lengths,seed=1):
+	"""Return the (kind,seqA,seqB) pairs of the benchmark: for each length, a
+	pair of random sequences and a sequence with a mutated copy of it.
+	"""
+
+	rand = random.Random(seed)
+	pairs = []
+	for length in lengths:
+		pairs.append(("random",randomSequence(length,rand),randomSequence(length,rand)))
+		seq = randomSequence(length,rand)
+		pairs.append(("mutated",seq,mutateSequence(seq,MUTATION,rand)))
+	return pairs
+
+def runEngine(name,seqA,seqB,queue):
+	"""Align a pair with an engine, in a process of its own, and put its
+	score, wall time (seconds) and peak memory (kilobytes) in the queue.
+	"""
+
+	enableStats()
+	start = time.time()
+	result = benchEngines[name][2](seqA,seqB)
+	if result==None:
+		queue.put(None)
+	elif name.endswith("/striped"):
+		# - only a score (no AlignmentResult, nor stats)
+		queue.put((result[0],time.time()-start,peakMemory()))
+	else:
+		queue.put((result.score,result.stats.total,result.stats.peakMemory))
+
+def timeEngine(name,seqA,seqB):
+	"""Return the score, wall time and peak memory of an engine on a pair,
+	measured in a new process (None if the engine failed).
+	"""
+
+	queue = multiprocessing.Queue()
+	process = multiprocessing.Process(target=runEngine,args=(name,seqA,seqB,queue))
+	process.start()
+	found = queue.get()
+	process.join()
+	return found
+
+def scoreAlignment(alignedA,alignedB,substitution,gap,extend=None):
+	"""Return the score of an alignment (two aligned strings) with the linear
+	gap model, or with the affine one if extend is given (gap for the first
+	residue of a gap, extend for the next ones). As in the margins of the
+	matrices of needle, a gap starting on the first column may turn once
+	into a gap in the other sequence, which is then extended.
+	"""
+
+	score = 0
+	for i,(aA,aB) in enumerate(zip(alignedA,alignedB)):
+		if aA!='-' and aB!='-':
+			score += substitution[encodeSequence(aA)[0]][encodeSequence(aB)[0]]
+		elif extend==None or i==0:
+			score -= gap
+		elif (alignedA[i-1]=='-')==(aA=='-') and (alignedB[i-1]=='-')==(aB=='-'):
+			score -= extend
+		elif alignedA[:i].count('-')==i or alignedB[:i].count('-')==i:
+			score -= extend # - the turn of a gap starting on the first column
+		else:
+			score -= gap
+	return score
+
+def checkAlignment(name,result,seqA,seqB,substitution,gap,extend=None):
+	"""Return the problems of an alignment: its score is not the score of its
+	aligned strings, or they are not the residues of the sequences.
+	"""
+
+	problems = []
+	if scoreAlignment(result.alignedA,result.alignedB,substitution,gap,extend)!=result.score:
+		problems.append(name+": the alignment scores "+\
+			str(scoreAlignment(result.alignedA,result.alignedB,substitution,gap,extend))+", not "+str(result.score))
+	if result.alignedA.replace('-','')!=seqA[result.startA:result.endA] or\
+	 result.alignedB.replace('-','')!=seqB[result.startB:result.endB]:
+		problems.append(name+": the aligned strings are not the residues of the sequences")
+	return problems
+
+def crossCheck(seqA,seqB):
+	"""Return the problems found by the cross-checks on a pair (see the
+	description of the module).
+	"""
+
+	problems = []
+	substitution = getMatrix(MATRIX)
+	simple = createSubstitutionMatrix(MATCH,MISMATCH)
+	wide = max(len(seqA),len(seqB)) # - a band covering the whole matrix
+
+	#Every engine against the python engine (and the scores of its alignment)
+	reference = {}
+	for name in engineOrder:
+		model,mode,aligner = benchEngines[name]
+		if name.endswith("/wfa") or name.endswith("/striped"):
+			continue
+		result = aligner(seqA,seqB)
+		if result==None:
+			problems.append(name+": no alignment")
+			continue
+		if name.endswith("/banded"):
+			continue # - a narrow band may clip the alignment (checked below with a wide band)
+		problems.extend(checkAlignment(name,result,seqA,seqB,substitution,GAP,EXTEND if model=="affine" else None))
+		if (model,mode) not in reference:
+			reference[(model,mode)] = result.score
+		elif result.score!=reference[(model,mode)]:
+			problems.append(name+": score "+str(result.score)+" instead of "+str(reference[(model,mode)]))
+	for name,result,model in [("needle/banded (wide)",align.needle(seqA,seqB,GAP,matrixName=MATRIX,band=wide,verbosity=SILENT),"linear"),\
+		("needle_affine/banded (wide)",align_affine.needle(seqA,seqB,GAP,EXTEND,matrixName=MATRIX,band=wide,verbosity=SILENT),"affine")]:
+		if result.clipped or result.score!=reference[(model,"global")]:
+			problems.append(name+": score "+str(result.score)+" instead of "+str(reference[(model,"global")]))
+	striped = benchEngines["water_affine/striped"][2](seqA,seqB)
+	if striped!=None and striped[0]!=reference[("affine","local")]:
+		problems.append("water_affine/striped: score "+str(striped[0])+" instead of "+str(reference[("affine","local")]))
+
+	#The wfa engines against the python engines, with match/mismatch values
+	for name,result,expected,extend in [\
+		("needle/wfa",benchEngines["needle/wfa"][2](seqA,seqB),\
+			align.needle(seqA,seqB,GAP,match=MATCH,mismatch=MISMATCH,verbosity=SILENT),None),\
+		("needle_affine/wfa",benchEngines["needle_affine/wfa"][2](seqA,seqB),\
+			align_affine.needle(seqA,seqB,GAP,EXTEND,match=MATCH,mismatch=MISMATCH,verbosity=SILENT),EXTEND)]:
+		if result==None:
+			problems.append(name+": no alignment")
+			continue
+		problems.extend(checkAlignment(name,result,seqA,seqB,simple,GAP,extend))
+		if result.score!=expected.score:
+			problems.append(name+": score "+str(result.score)+" instead of "+str(expected.score))
+
+	#The affine gap model with gap == extend is the linear one
+	for mode,linear,affine in [\
+		("global",align.needle(seqA,seqB,GAP,matrixName=MATRIX,verbosity=SILENT),\
+			align_affine.needle(seqA,seqB,GAP,GAP,matrixName=MATRIX,verbosity=SILENT)),\
+		("local",align.water(seqA,seqB,GAP,matrixName=MATRIX,verbosity=SILENT),\
+			align_affine.water(seqA,seqB,GAP,GAP,matrixName=MATRIX,verbosity=SILENT))]:
+		if linear.score!=affine.score:
+			problems.append("affine "+mode+" with gap == extend: score "+str(affine.score)+" instead of "+str(linear.score))
+
+	#A sequence aligned with itself: the global and the local scores are the
+	# sum of the scores of its residues
+	expected = sum([substitution[code][code] for code in encodeSequence(seqA)])
+	for name,result in [("needle",align.needle(seqA,seqA,GAP,matrixName=MATRIX,verbosity=SILENT)),\
+		("water",align.water(seqA,seqA,GAP,matrixName=MATRIX,verbosity=SILENT)),\
+		("needle_affine",align_affine.needle(seqA,seqA,GAP,EXTEND,matrixName=MATRIX,verbosity=SILENT)),\
+		("water_affine",align_affine.water(seqA,seqA,GAP,EXTEND,matrixName=MATRIX,verbosity=SILENT))]:
+		if result.score!=expected:
+			problems.append(name+" of seqA with itself: score "+str(result.score)+" instead of "+str(expected))
+
+	#The linear space mode against the full matrix, with every scoring
+	for scoring in [{"matrixName":matrixName} for matrixName in scoringMatrices]+\
+		[{"match":1,"mismatch":-2},{"match":MATCH,"mismatch":MISMATCH}]:
+		if "matrixName" in scoring:
+			scoringSubstitution = getMatrix(scoring["matrixName"])
+		else:
+			scoringSubstitution = createSubstitutionMatrix(scoring["match"],scoring["mismatch"])
+		for gap in LINEAR_GAPS:
+			name = "needle/linear ("+", ".join([key+" "+str(scoring[key]) for key in sorted(scoring)])+", gap "+str(gap)+")"
+			full = align.needle(seqA,seqB,gap,verbosity=SILENT,**scoring)
+			linear = align.needle(seqA,seqB,gap,linearSpace=True,verbosity=SILENT,**scoring)
+			problems.extend(checkAlignment(name,linear,seqA,seqB,scoringSubstitution,gap))
+			if linear.score!=full.score:
+				problems.append(name+": score "+str(linear.score)+" instead of "+str(full.score))
+	return problems
+
+def failingAligner(seqA,seqB,**parameters):
+	"""An aligner that always raises (see checkBatch).
+	"""
+
+	raise RuntimeError("failing engine")
+
+def checkBatch(processes=2):
+	"""Return the problems found on the runs of batch.py with a pool of
+	processes: pairs longer than a tile aligned by the tiled engine in the
+	workers get the scores of the python engine, and the pairs of an aligner
+	that raises are all skipped and reported, and the run goes on.
+	"""
+
+	problems = []
+	rand = random.Random(1)
+	seqA = randomSequence(600,rand)
+	seqB = seqA[:300]+"W"+seqA[320:]
+	pairs = [("1",seqA,seqB),("2",seqB,seqA),("3","HEAGAWGHEE","PAWHEAE")]
+	expected = [align.needle(a,b,GAP,matrixName=MATRIX,verbosity=SILENT).score for name,a,b in pairs]
+	parameters = {"gap":GAP,"matrixName":MATRIX,"engine":"tiled"}
+	output = StringIO()
+	counts = batch.alignPairs(pairs,output,parameters=parameters,outputFormat="jsonl",processes=processes,chunkSize=1)
+	scores = [json.loads(line)["score"] for line in output.getvalue().splitlines()]
+	if counts!=(3,0) or scores!=expected:
+		problems.append("batch/tiled: scores "+str(scores)+" instead of "+str(expected))
+	stderr = sys.stderr
+	sys.stderr = StringIO()
+	try:
+		counts = batch.alignPairs(pairs,StringIO(),parameters=parameters,processes=processes,chunkSize=1,aligner=failingAligner)
+		reported = sys.stderr.getvalue()
+	finally:
+		sys.stderr = stderr
+	if counts!=(0,3) or reported.count("failing engine")!=3:
+		problems.append("batch with a failing aligner: "+str(counts)+" pairs aligned and skipped instead of (0, 3)")
+	return problems
+
+def benchmark(pairs,names=engineOrder,limit=None):
+	"""Time the engines on the pairs (see timeEngine), printing one line per
+	engine and pair; a pair above the cell limit of an engine is skipped.
+	"""
+
+	print "%-8s %6s %6s %-22s %8s %10s %14s %10s" % ("pair","lenA","lenB","engine","score","seconds","cells/s","peak kB")
+	for kind,seqA,seqB in pairs:
+		cells = len(seqA)*len(seqB)
+		for name in names:
+			engine = name.split("/")[1]
+			engineLimit = limit
+			if engineLimit==None:
+				engineLimit = mutatedLimits.get(engine,cellLimits[engine]) if kind=="mutated" else cellLimits[engine]
+			if cells > engineLimit:
+				continue
+			found = timeEngine(name,seqA,seqB)
+			if found==None:
+				print "%-8s %6d %6d %-22s %8s" % (kind,len(seqA),len(seqB),name,"failed")
+				continue
+			score,seconds,peak = found
+			print "%-8s %6d %6d %-22s %8s %10.4f %14.0f %10d" % (kind,len(seqA),len(seqB),name,score,seconds,\
+				cells/seconds if seconds > 0 else 0.0,peak)
+			sys.stdout.flush()
+
+if __name__=="__main__":
+	# Options (e.g. --lengths=10,100, --check) can be given anywhere on the command line
+	options = {}
+	for arg in sys.argv[1:]:
+		if arg.startswith("--"):
+			name,_,value = arg[2:].partition("=")
+			options[name] = value
+	args = [arg for arg in sys.argv if not arg.startswith("--")]
+
+	if len(args)!=1 or not set(options).issubset(["lengths","engines","limit","seed","check","bench"]):
+		print "Usage: python bench.py [options]"
+		print "  --lengths=10,100,1000,5000,20000: lengths of the pairs (a random pair and a mutated pair each)"
+		print "  --engines=needle/python,...: engines to time, default all ("+", ".join(engineOrder)+")"
+		print "  --limit=N: largest pair (cells) timed by any engine, default a limit per engine"
+		print "  --seed=1: seed of the random sequences"
+		print "  --check: only run the cross-checks"
+		print "  --bench: only time the engines"
+		exit(0)
+	try:
+		lengths = [int(length) for length in options.get("lengths",",".join(map(str,LENGTHS))).split(",")]
+		limit = float(options["limit"]) if "limit" in options else None
+		seed = int(options.get("seed",1))
+	except ValueError:
+		print "The lengths, limit and seed should be numbers."
+		exit(0)
+	names = options["engines"].split(",") if "engines" in options else engineOrder
+	if not set(names).issubset(engineOrder):
+		print "The engines should be some of: "+", ".join(engineOrder)+"."
+		exit(0)
+	pairs = createPairs(lengths,seed)
+
+	failed = 0
+	if "bench" not in options:
+		checked = 0
+		for kind,seqA,seqB in pairs+[("example",seqA,seqB) for seqA,seqB in EXAMPLES]:
+			if len(seqA)*len(seqB) <= CHECK_CELLS:
+				checked += 1
+				for problem in crossCheck(seqA,seqB):
+					print "FAILED ("+kind+" pair, lengths "+str(len(seqA))+", "+str(len(seqB))+"): "+problem
+					failed += 1
+		for problem in checkBatch():
+			print "FAILED (batch): "+problem
+			failed += 1
+		print "Cross-checked "+str(checked)+" pairs and a batch: "+(str(failed)+" problems." if failed else "all the checks passed.")
+	if "check" not in options:
+		benchmark(pairs,names,limit)
+	if failed:
+		exit(1)
@@ -0,0 +1,218 @@
+"""Cache of the results of needle and water (align.py and align_affine.py),
+so that the pipelines aligning the same sequences with the same parameters
+again and again, across jobs, only compute every alignment once.
+
+An entry is named after a hash of the encoded sequences and of all the
+scoring parameters (with the values of the scoring matrix, so an edited
+matrix gives new entries), and of CACHE_VERSION, to bump whenever a change
+of the aligners or of AlignmentResult can change a result: the entries of
+the older versions are then never used again, and are evicted in time.
+The most recently used results of a process are
+kept in memory (LRU), and all the results in a SQLite database in the cache
+directory, shared by all the processes; the least recently used ones are
+removed when it grows above its size limit.
+
+	from cache import cached
+	import align
+	needle = cached(align.needle)
+	result = needle("HEAGAWGHEE","PAWHEAE",8,matrixName="blosum50",verbosity=SILENT)
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import os
+import sys
+import copy
+import time
+import hashlib
+import inspect
+import sqlite3
+import cPickle
+from collections import OrderedDict
+from scoring import encodeSequence
+from matrices import getMatrix
+from result import AlignmentResult,SILENT
+
+MEMORY_ENTRIES = 4096 # results kept in memory by a process
+DISK_BYTES = 256*1024*1024 # size limit of the database
+EVICT_EVERY = 256 # the size of the database is checked after so many new results
+CACHE_VERSION = 1 # version of the results, part of every key (bump it when they can change)
+cachePath = os.path.join(os.path.expanduser("~"),".cache","compscimed","results.sqlite")
+
+# - state of the cache in this process
+memory = OrderedDict() # key => AlignmentResult, least recently used first
+database = {"connection":None,"opened":False,"added":0}
+matrixDigests = {} # matrix name => hash of its values
+
+def openDatabase():
+	"""Return the connection to the database, opening (and creating) it the
+	first time. The cache is only an optimisation, so it returns None if the
+	database can not be used.
+	"""
+
+	if database["opened"]:
+		return database["connection"]
+	database["opened"] = True
+	try:
+		if not os.path.isdir(os.path.dirname(cachePath)):
+			os.makedirs(os.path.dirname(cachePath))
+		connection = sqlite3.connect(cachePath,timeout=30)
+		connection.text_factory = str
+		connection.execute("PRAGMA journal_mode=WAL")
+		connection.execute("PRAGMA synchronous=NORMAL")
+		connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB, size INTEGER, used REAL)")
+		connection.execute("CREATE INDEX IF NOT EXISTS resultsUsed ON results (used)")
+		connection.commit()
+	except (sqlite3.Error,OSError):
+		return None
+	database["connection"] = connection
+	evict(connection)
+	return connection
+
+def cacheKey(function,arguments):
+	"""Return the key of a call of an aligner: a hash of CACHE_VERSION, of its
+	name, of the encoded sequences and of all the other arguments (but the
+	verbosity).
+	Returns None if a sequence is not valid (such calls are not cached).
+	"""
+
+	codesA,codesB = encodeSequence(arguments["seqA"]),encodeSequence(arguments["seqB"])
+	if codesA==None or codesB==None:
+		return None
+	key = hashlib.sha1("v"+str(CACHE_VERSION)+"|"+function)
+	key.update(str(len(codesA))+":"+str(codesA)+str(codesB))
+	for name in sorted(arguments):
+		if name not in ["seqA","seqB","verbosity"]:
+			# - "8" (from the command line) and 8 are the same value
+			value = arguments[name]
+			key.update("|"+name+"="+(repr(value) if value==None or isinstance(value,bool) else str(value)))
+	matrixName = arguments.get("matrixName")
+	if matrixName!=None:
+		if matrixName not in matrixDigests:
+			matrixDigests[matrixName] = hashlib.sha1(repr(getMatrix(matrixName))).hexdigest()
+		key.update("|"+matrixDigests[matrixName])
+	return key.hexdigest()
+
+def getResult(key):
+	"""Return the cached result of a key (from memory, or else from the
+	database), or None if it is not cached.
+	"""
+
+	if key in memory:
+		result = memory.pop(key)
+		memory[key] = result # - now the most recently used
+		return result
+	connection = openDatabase()
+	if connection==None:
+		return None
+	try:
+		row = connection.execute("SELECT value FROM results WHERE key=?",(key,)).fetchone()
+		if row==None:
+			return None
+		connection.execute("UPDATE results SET used=? WHERE key=?",(time.time(),key))
+		connection.commit()
+	except sqlite3.Error:
+		return None
+	result = AlignmentResult(*cPickle.loads(str(row[0])))
+	remember(key,result)
+	return result
+
+def putResult(key,result):
+	"""Cache the result of a key, in memory and in the database (without its
+	stats, which are only those of the computation, see stats.py).
+	"""
+
+	if result.stats!=None:
+		result = copy.copy(result)
+		result.stats = None
+	remember(key,result)
+	connection = openDatabase()
+	if connection==None:
+		return
+	value = cPickle.dumps((result.score,result.alignedA,result.alignedB,result.startA,result.endA,\
+		result.startB,result.endB,result.clipped),2)
+	try:
+		connection.execute("INSERT OR REPLACE INTO results VALUES (?,?,?,?)",\
+			(key,sqlite3.Binary(value),len(key)+len(value),time.time()))
+		connection.commit()
+	except sqlite3.Error:
+		return
+	database["added"] += 1
+	if database["added"] % EVICT_EVERY==0:
+		evict(connection)
+
+def remember(key,result):
+	"""Keep a result in memory, forgetting the least recently used one if
+	there are too many.
+	"""
+
+	memory[key] = result
+	if len(memory) > MEMORY_ENTRIES:
+		memory.popitem(last=False)
+
+def evict(connection,limit=None):
+	"""Remove the least recently used results from the database until it is
+	below 90% of its size limit, if it is above it.
+	"""
+
+	if limit==None:
+		limit = DISK_BYTES
+	try:
+		total = connection.execute("SELECT total(size) FROM results").fetchone()[0]
+		if total <= limit:
+			return
+		keys = []
+		for key,size in connection.execute("SELECT key,size FROM results ORDER BY used"):
+			if total <= 0.9*limit:
+				break
+			keys.append((key,))
+			total -= size
+		connection.executemany("DELETE FROM results WHERE key=?",keys)
+		connection.commit()
+	except sqlite3.Error:
+		pass
+
+def cached(aligner):
+	"""Return a version of an aligner (needle or water, from align.py or
+	align_affine.py) that takes the same arguments but first looks for the
+	result in the cache. Only the SILENT calls are answered from the cache
+	(the others print the alignment, so they are computed), but all the
+	results are cached. The cached results are shared: they should not be
+	modified.
+	"""
+
+	function = aligner.__module__+"."+aligner.__name__
+	def cachedAligner(*args,**kwargs):
+		arguments = inspect.getcallargs(aligner,*args,**kwargs)
+		key = cacheKey(function,arguments)
+		if key==None:
+			return aligner(*args,**kwargs)
+		if arguments["verbosity"]==SILENT:
+			result = getResult(key)
+			if result!=None:
+				return result
+		result = aligner(*args,**kwargs)
+		if result!=None:
+			putResult(key,result)
+		return result
+	cachedAligner.__name__ = aligner.__name__
+	cachedAligner.__doc__ = aligner.__doc__
+	return cachedAligner
+
+if __name__=="__main__":
+	if len(sys.argv)!=2 or sys.argv[1] not in ["stats","clear"]:
+		print "Usage: python cache.py stats|clear"
+		print "  stats: number and size of the cached results"
+		print "  clear: remove all the cached results"
+		exit(0)
+	connection = openDatabase()
+	if connection==None:
+		print "The cache "+cachePath+" can not be opened."
+		exit(0)
+	if sys.argv[1]=="clear":
+		connection.execute("DELETE FROM results")
+		connection.commit()
+		connection.execute("VACUUM")
+	count,total = connection.execute("SELECT count(*),total(size) FROM results").fetchone()
+	print cachePath+": "+str(count)+" results, "+str(int(total))+" bytes (limit "+str(DISK_BYTES)+")"
@@ -0,0 +1,141 @@
+"""Thin client of the alignment server (daemon.py): sends the pairs of a
+TSV file (or of the standard input), or a single pair, to the server and
+writes the records of the alignments as batch.py does. It only imports
+the standard modules it needs, so it starts in a few milliseconds.
+
+	python daemon.py &
+	python client.py HEAGAWGHEE PAWHEAE --matrix=blosum50
+	cut -f1,2 pairs.tsv | python client.py --mode=local --format=jsonl
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import os
+import sys
+import json
+import socket
+import threading
+
+socketPath = os.path.join(os.path.expanduser("~"),".cache","compscimed","align.sock") # - as in daemon.py
+fields = ["name","score","identity","startA","endA","startB","endB","gapOpens","clipped","alignedA","alignedB"] # - as in batch.py
+textOptions = ["model","mode","matrix","engine"]
+numericOptions = ["match","mismatch","gap","extend","band","xdrop"]
+
+def connect(path=None,port=None):
+	"""Return a socket connected to the server (on the Unix socket path, by
+	default socketPath, or on a localhost TCP port), or None if there is no
+	server.
+	"""
+
+	try:
+		if port!=None:
+			connection = socket.create_connection(("127.0.0.1",port))
+		else:
+			connection = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+			connection.connect(path or socketPath)
+	except socket.error:
+		return None
+	return connection
+
+def readPairs(pairFile):
+	"""Generate the (name,seqA,seqB) pairs of TSV lines (seqA, seqB or name,
+	seqA, seqB; the pairs without names are named after their line number).
+	"""
+
+	for lineNumber,line in enumerate(pairFile):
+		words = line.rstrip("\r\n").split("\t")
+		if not line.strip() or line.startswith("#"):
+			continue
+		if len(words)==2:
+			yield str(lineNumber+1),words[0].strip().upper(),words[1].strip().upper()
+		elif len(words)==3:
+			yield words[0],words[1].strip().upper(),words[2].strip().upper()
+		else:
+			sys.stderr.write("Line "+str(lineNumber+1)+" is not a pair of sequences.\n")
+
+def sendRequests(connection,pairs,options):
+	"""Send one request per pair, with the options, then close the sending
+	side of the connection.
+	"""
+
+	try:
+		for name,seqA,seqB in pairs:
+			request = dict(options)
+			request.update({"name":name,"seqA":seqA,"seqB":seqB})
+			connection.sendall(json.dumps(request)+"\n")
+		connection.shutdown(socket.SHUT_WR)
+	except socket.error:
+		pass # - the server is gone, the responses tell what was aligned
+
+def alignWithServer(connection,pairs,options,output,outputFormat="tsv"):
+	"""Align the (name,seqA,seqB) pairs with the server, writing the record of
+	each alignment to the output (the errors go to the standard error).
+	Returns the number of pairs aligned and the number of errors.
+	"""
+
+	sender = threading.Thread(target=sendRequests,args=(connection,pairs,options))
+	sender.daemon = True
+	sender.start()
+	aligned,errors = 0,0
+	if outputFormat=="tsv":
+		output.write("#"+"\t".join(fields)+"\n")
+	for line in connection.makefile("r"):
+		record = json.loads(line)
+		if "error" in record:
+			sys.stderr.write("Pair "+str(record.get("name"))+": "+record["error"]+"\n")
+			errors += 1
+			continue
+		if outputFormat=="jsonl":
+			output.write(json.dumps(record,sort_keys=True)+"\n")
+		else:
+			output.write("\t".join(["" if record[field]==None else str(record[field]) for field in fields])+"\n")
+		aligned += 1
+	sender.join()
+	return aligned,errors
+
+if __name__=="__main__":
+	# Options (e.g. --mode=local, --format=jsonl) can be given anywhere on the command line
+	options = {}
+	for arg in sys.argv[1:]:
+		if arg.startswith("--"):
+			name,_,value = arg[2:].partition("=")
+			options[name] = value
+	args = [arg for arg in sys.argv if not arg.startswith("--")]
+
+	if len(args) > 3 or not set(options).issubset(textOptions+numericOptions+["linear","socket","port","format"]) or\
+	 options.get("format","tsv") not in ["tsv","jsonl"]:
+		print "Usage: python client.py [pairs.tsv|-] [options]"
+		print "Usage: python client.py SEQA SEQB [options]"
+		print "  the pairs (TSV: seqA, seqB or name, seqA, seqB) are read from the standard input if no file is given"
+		print "  --model, --mode, --matrix, --match, --mismatch, --gap, --extend, --linear, --engine, --band, --xdrop:"
+		print "    as in batch.py"
+		print "  --socket=path: Unix socket of the server, default "+socketPath
+		print "  --port=N: localhost TCP port of the server, instead of the socket"
+		print "  --format=tsv|jsonl: format of the records, default tsv"
+		exit(0)
+	request = dict((name,options[name]) for name in textOptions if name in options)
+	try:
+		for name in numericOptions:
+			if name in options:
+				request[name] = int(options[name])
+		port = int(options["port"]) if "port" in options else None
+	except ValueError:
+		print "The numeric options should be integers."
+		exit(0)
+	if "linear" in options:
+		request["linear"] = True
+	connection = connect(options.get("socket"),port)
+	if connection==None:
+		print "There is no alignment server on "+("localhost:"+str(port) if port!=None else options.get("socket",socketPath))+\
+			" (start it with python daemon.py)."
+		exit(1)
+	if len(args)==3:
+		pairs = [("1",args[1].upper(),args[2].upper())]
+	else:
+		pairFile = sys.stdin if len(args)==1 or args[1]=="-" else open(args[1])
+		pairs = readPairs(pairFile)
+	aligned,errors = alignWithServer(connection,pairs,request,sys.stdout,options.get("format","tsv"))
+	connection.close()
+	if errors:
+		exit(1)
@@ -0,0 +1,253 @@
+"""Long-running alignment server, so that the alignments of the shell
+pipelines do not pay for starting Python, importing the aligners and
+loading the scoring matrices every time (see client.py).
+
+The server listens on a Unix socket (or on a localhost TCP port), and the
+clients send one JSON request per line: the two sequences (seqA, seqB) and
+the options of batch.py (model, mode, matrix, match, mismatch, gap,
+extend, linear, engine, band, xdrop), with an optional name. Every request
+is answered by one JSON line, in the order of the requests of the client:
+the record of the alignment (the fields of batch.py), or an error.
+The requests of all the clients are coalesced into batches, and the
+batches are shared by a pool of worker processes, which keep the aligners
+and the scoring matrices loaded. The alignments are only computed in the
+worker processes (even with one process), where what the aligners print
+(their errors) is kept for the response: the threads of the server never
+see the standard output change.
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import threading
+import multiprocessing
+import SocketServer
+from Queue import Queue,Empty
+from StringIO import StringIO
+from matrices import scoringMatrices,getMatrix
+from result import SILENT
+from batch import getAligner
+
+BATCH = 64 # requests aligned at a time by a worker process
+WAIT = 0.002 # seconds waited for more requests before a batch is aligned
+socketPath = os.path.join(os.path.expanduser("~"),".cache","compscimed","align.sock")
+
+# - the options of a request, and the arguments of the aligners they give
+requestOptions = ["name","seqA","seqB","model","mode","matrix","match","mismatch","gap","extend",\
+	"linear","engine","band","xdrop"]
+argumentNames = {"matrix":"matrixName","match":"match","mismatch":"mismatch","gap":"gap","extend":"extend",\
+	"linear":"linearSpace","engine":"engine","band":"band","xdrop":"xdrop"}
+
+# - state of a worker process, set once by initWorker
+worker = {}
+
+def initWorker(useCache):
+	"""Prepare the alignments in a worker process: load all the scoring
+	matrices, and keep what is printed (a worker process aligns one request
+	at a time, in one thread, see alignRequest).
+	"""
+
+	worker["useCache"] = useCache
+	worker["aligners"] = {}
+	for matrixName in scoringMatrices:
+		getMatrix(matrixName)
+	sys.stdout = StringIO()
+
+def alignRequest(request):
+	"""Align the pair of a request (a dict, see the description of the
+	module). Returns the record of the alignment, or a dict with the error.
+	"""
+
+	if not isinstance(request,dict) or not set(request).issubset(requestOptions):
+		return {"error":"The options of a request should be some of: "+", ".join(requestOptions)+"."}
+	model,mode = request.get("model","linear"),request.get("mode","global")
+	if model not in ["linear","affine"] or mode not in ["global","local"]:
+		return {"error":"The model should be linear or affine, and the mode global or local."}
+	if (model,mode) not in worker["aligners"]:
+		worker["aligners"][(model,mode)] = getAligner(model,mode,worker["useCache"])
+	parameters = {"gap":8}
+	if model=="affine":
+		parameters["extend"] = 1
+	if "match" not in request and "mismatch" not in request:
+		parameters["matrixName"] = "blosum62"
+	for name,value in request.items():
+		if name in argumentNames:
+			parameters[argumentNames[name]] = value
+	#Align, keeping what the aligner prints (its errors, see initWorker)
+	sys.stdout.seek(0)
+	sys.stdout.truncate()
+	try:
+		result = worker["aligners"][(model,mode)](request.get("seqA"),request.get("seqB"),verbosity=SILENT,**parameters)
+	except TypeError:
+		result = None
+		print "Some options are not supported by the "+mode+" alignment of the "+model+" gap model."
+	except Exception as error:
+		result = None
+		print "The alignment failed ("+type(error).__name__+": "+str(error)+")."
+	printed = sys.stdout.getvalue()
+	if result==None:
+		return {"name":request.get("name"),"error":printed.strip() or "No alignment."}
+	return {"name":request.get("name"),"score":result.score,"identity":round(result.identity,4),\
+		"startA":result.startA,"endA":result.endA,"startB":result.startB,"endB":result.endB,\
+		"gapOpens":result.gapOpens,"clipped":result.clipped,"alignedA":result.alignedA,"alignedB":result.alignedB}
+
+def alignBatch(requests):
+	"""Align a batch of requests in a worker process (see alignRequest).
+	"""
+
+	return [alignRequest(request) for request in requests]
+
+class Batcher(object):
+	"""Coalesce the requests of all the clients into batches, aligned by a
+	pool of worker processes.
+	"""
+
+	def __init__(self,processes,useCache):
+		self.queue = Queue()
+		self.processes = processes
+		self.pool = multiprocessing.Pool(processes,initWorker,(useCache,))
+		thread = threading.Thread(target=self.run)
+		thread.daemon = True
+		thread.start()
+
+	def submit(self,request):
+		"""Queue a request. Returns its slot: [event, response], the event
+		being set when the response is there.
+		"""
+
+		slot = [threading.Event(),None]
+		self.queue.put((request,slot))
+		return slot
+
+	def run(self):
+		while True:
+			#Wait for a request, then for more of them (a short while)
+			batch = [self.queue.get()]
+			deadline = time.time()+WAIT
+			while len(batch) < BATCH*self.processes:
+				try:
+					batch.append(self.queue.get(timeout=max(0,deadline-time.time())))
+				except Empty:
+					break
+			requests = [request for request,slot in batch]
+			# - one chunk per process
+			size = (len(requests)+self.processes-1)/self.processes
+			chunks = [requests[i:i+size] for i in range(0,len(requests),size)]
+			try:
+				responses = [response for chunk in self.pool.map(alignBatch,chunks,1) for response in chunk]
+			except Exception as error:
+				# - the batch is lost (e.g. a request that can not be sent to a
+				# worker), but every client gets its answer and the server goes on
+				responses = [{"name":request.get("name") if isinstance(request,dict) else None,\
+					"error":"The batch failed ("+type(error).__name__+": "+str(error)+")."} for request in requests]
+			for (request,slot),response in zip(batch,responses):
+				slot[1] = response
+				slot[0].set()
+
+class RequestHandler(SocketServer.StreamRequestHandler):
+	"""Answer the requests of a client, one JSON line each. The requests are
+	read and queued while the responses are written (in a thread of their
+	own, in the order of the requests), so a client can send many requests
+	at once.
+	"""
+
+	def handle(self):
+		slots = Queue()
+		writer = threading.Thread(target=self.writeResponses,args=(slots,))
+		writer.start()
+		try:
+			for line in iter(self.rfile.readline,""):
+				if not line.strip():
+					continue
+				try:
+					request = json.loads(line)
+				except ValueError:
+					slot = [threading.Event(),{"error":"A request should be a JSON object."}]
+					slot[0].set()
+				else:
+					slot = self.server.batcher.submit(request)
+				slots.put(slot)
+		finally:
+			slots.put(None)
+			writer.join()
+
+	def writeResponses(self,slots):
+		broken = False
+		for slot in iter(slots.get,None):
+			slot[0].wait()
+			if broken:
+				continue
+			try:
+				self.wfile.write(json.dumps(slot[1],sort_keys=True)+"\n")
+				if slots.empty():
+					self.wfile.flush()
+			except socket.error:
+				broken = True # - the client is gone, its other responses are dropped
+
+class UnixServer(SocketServer.ThreadingMixIn,SocketServer.UnixStreamServer):
+	daemon_threads = True
+
+class TCPServer(SocketServer.ThreadingMixIn,SocketServer.TCPServer):
+	daemon_threads = True
+	allow_reuse_address = True
+
+def serve(path=None,port=None,processes=None,useCache=False):
+	"""Answer the requests sent on a Unix socket (path, by default socketPath)
+	or on a localhost TCP port, until interrupted.
+	"""
+
+	if processes==None:
+		processes = multiprocessing.cpu_count()
+	if port!=None:
+		server = TCPServer(("127.0.0.1",port),RequestHandler)
+		where = "localhost:"+str(port)
+	else:
+		path = path or socketPath
+		if not os.path.isdir(os.path.dirname(os.path.abspath(path))):
+			os.makedirs(os.path.dirname(os.path.abspath(path)))
+		if os.path.exists(path):
+			os.remove(path) # - left by a server that was killed
+		server = UnixServer(path,RequestHandler)
+		where = path
+	server.batcher = Batcher(processes,useCache)
+	signal.signal(signal.SIGTERM,lambda signum,frame: sys.exit(0)) # - remove the socket when killed too
+	sys.stderr.write("Aligning the requests sent to "+where+" ("+str(processes)+" processes).\n")
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+		if port==None and os.path.exists(path):
+			os.remove(path)
+
+if __name__=="__main__":
+	# Options (e.g. --port=7777) can be given anywhere on the command line
+	options = {}
+	for arg in sys.argv[1:]:
+		if arg.startswith("--"):
+			name,_,value = arg[2:].partition("=")
+			options[name] = value
+	args = [arg for arg in sys.argv if not arg.startswith("--")]
+
+	if len(args)!=1 or not set(options).issubset(["socket","port","processes","cache"]) or\
+	 ("socket" in options and "port" in options):
+		print "Usage: python daemon.py [options]"
+		print "  --socket=path: Unix socket to listen on, default "+socketPath
+		print "  --port=N: localhost TCP port to listen on, instead of the socket"
+		print "  --processes=N: number of worker processes, default the number of cores"
+		print "  --cache: use the cache of the alignment results (see cache.py)"
+		exit(0)
+	try:
+		port = int(options["port"]) if "port" in options else None
+		processes = int(options["processes"]) if "processes" in options else None
+	except ValueError:
+		print "The port and the number of processes should be integers."
+		exit(0)
+	serve(options.get("socket"),port,processes,"cache" in options)
@@ -0,0 +1,44 @@
+"""Streaming reader for FASTA files (plain or gzip compressed), so that
+databases with hundreds of thousands of sequences are never loaded in memory
+at once.
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import sys
+import gzip
+
+def openText(path):
+	"""Open a text file for reading, decompressing it if its name ends with .gz
+	("-" is the standard input).
+	"""
+
+	if path=="-":
+		return sys.stdin
+	if path.endswith(".gz"):
+		return gzip.open(path,"rb")
+	return open(path,"r")
+
+def readFasta(path):
+	"""Generate the (name, sequence) records of a FASTA file, one at a time.
+	The name is the first word of the header line, and the sequence is
+	converted to upper case.
+	"""
+
+	fastaFile = openText(path)
+	name = None
+	parts = []
+	for line in fastaFile:
+		line = line.strip()
+		if line.startswith(">"):
+			if name!=None:
+				yield name,''.join(parts).upper()
+			words = line[1:].split()
+			name = words[0] if words else ""
+			parts = []
+		elif line and name!=None:
+			parts.append(line)
+	if name!=None:
+		yield name,''.join(parts).upper()
+	fastaFile.close()
@@ -0,0 +1,101 @@
+"""Registry of the scoring matrices shipped with the aligners (BLOSUM45,
+BLOSUM50, BLOSUM62, BLOSUM80, PAM30, PAM70 and PAM250).
+
+The matrices are kept as tab separated text files next to this module. The
+first time a matrix is used, it is parsed and compiled into a small binary
+file in the cache directory, named after the hash of the text file (so an
+edited matrix is compiled again). Later runs memory-map the binary file
+instead of parsing the text, and inside a process every matrix is only
+loaded once.
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import os
+import mmap
+import hashlib
+from array import array
+from scoring import aminoAcids
+
+scoringMatrices = ["blosum45","blosum50","blosum62","blosum80","pam30","pam70","pam250"]
+dataDir = os.path.dirname(os.path.abspath(__file__))
+cacheDir = os.path.join(os.path.expanduser("~"),".cache","compscimed","matrices")
+
+# - binary format: magic, residue order, then the 20x20 scores as signed bytes
+MAGIC = "SUBMAT01"
+HEADER = len(MAGIC)+len(aminoAcids)
+
+loadedMatrices = {} # matrices already loaded in this process, by name
+
+def getMatrix(matrixName):
+	"""Return the substitution matrix of a registered scoring matrix, indexed
+	by residue codes (substitution[codeA][codeB], see scoring.py). Returns
+	None if the name is not registered.
+	"""
+
+	if matrixName in loadedMatrices:
+		return loadedMatrices[matrixName]
+	if matrixName not in scoringMatrices:
+		return None
+	textPath = os.path.join(dataDir,matrixName+".txt")
+	text = open(textPath,"rb").read()
+	binPath = os.path.join(cacheDir,matrixName+"-"+hashlib.sha1(text).hexdigest()[:16]+".bin")
+	substitution = None
+	if os.path.isfile(binPath):
+		substitution = loadCompiledMatrix(binPath)
+	if substitution==None:
+		substitution = parseMatrix(text)
+		compileMatrix(substitution,binPath)
+	loadedMatrices[matrixName] = substitution
+	return substitution
+
+def parseMatrix(text):
+	"""Parse a scoring matrix in the text format (a header row with the
+	aminoacids, then one row per aminoacid, tab separated) into a substitution
+	matrix indexed by residue codes.
+	"""
+
+	rows = [line.split() for line in text.splitlines() if line.strip()]
+	order = [rows[0].index(aa) for aa in aminoAcids]
+	scores = dict((row[0],row[1:]) for row in rows[1:])
+	return [[int(scores[aa][col]) for col in order] for aa in aminoAcids]
+
+def compileMatrix(substitution,binPath):
+	"""Write the substitution matrix in the binary format. The cache is only
+	an optimisation, so nothing happens if the file can not be written.
+	"""
+
+	scores = array("b",[score for row in substitution for score in row])
+	try:
+		if not os.path.isdir(cacheDir):
+			os.makedirs(cacheDir)
+		tmpPath = binPath+".%d.tmp" % os.getpid()
+		binFile = open(tmpPath,"wb")
+		binFile.write(MAGIC+aminoAcids+scores.tostring())
+		binFile.close()
+		os.rename(tmpPath,binPath) # other processes never see a partial file
+	except (IOError,OSError):
+		pass
+
+def loadCompiledMatrix(binPath):
+	"""Memory-map a compiled matrix and return its substitution matrix, or
+	None if the file is not a valid compiled matrix.
+	"""
+
+	binFile = open(binPath,"rb")
+	try:
+		data = mmap.mmap(binFile.fileno(),0,access=mmap.ACCESS_READ)
+	except (ValueError,EnvironmentError):
+		binFile.close()
+		return None
+	size = len(aminoAcids)
+	if len(data)!=HEADER+size*size or data[:HEADER]!=MAGIC+aminoAcids:
+		data.close()
+		binFile.close()
+		return None
+	scores = array("b")
+	scores.fromstring(data[HEADER:])
+	data.close()
+	binFile.close()
+	return [scores[i*size:(i+1)*size].tolist() for i in range(size)]
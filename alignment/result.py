@@ -0,0 +1,66 @@
+"""The result of an alignment, as returned by needle and water in align.py
+and align_affine.py, and the verbosity levels of these functions.
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+# Verbosity levels of needle and water
+SILENT = 0 # print nothing
+SUMMARY = 1 # print the sequences and the alignment
+FULL = 2 # also print all the matrices (and the backtracking steps)
+verbosityLevels = {"silent":SILENT,"summary":SUMMARY,"full":FULL}
+
+class AlignmentResult(object):
+	"""An alignment of seqA[startA:endA] with seqB[startB:endB] (the whole
+	sequences for a global alignment), given as the two aligned strings with
+	'-' for the gaps. The number of identical columns (matches), the identity,
+	the number of gap characters in each aligned string (gapsA, gapsB) and the
+	number of gaps opened (gapOpens) are computed from the aligned strings.
+	For a banded or X-drop alignment, clipped is True if the optimal path may
+	have been cut off (the score is None if no path was found at all).
+	It can still be unpacked as (score, alignedA, alignedB).
+	If the instrumentation of stats.py is on, stats holds the timings of the
+	alignment (an AlignmentStats), and None otherwise.
+	"""
+
+	def __init__(self,score,alignedA,alignedB,startA,endA,startB,endB,clipped=False):
+		self.score = score
+		self.clipped = clipped
+		self.alignedA = alignedA
+		self.alignedB = alignedB
+		self.startA = startA
+		self.endA = endA
+		self.startB = startB
+		self.endB = endB
+		self.length = len(alignedA)
+		self.matches = sum([1 for aA,aB in zip(alignedA,alignedB) if aA==aB and aA!='-'])
+		self.gapsA = alignedA.count('-')
+		self.gapsB = alignedB.count('-')
+		self.gapOpens = countGapOpens(alignedA)+countGapOpens(alignedB)
+		self.identity = float(self.matches)/self.length if self.length else 0.0
+		self.stats = None
+
+	def __iter__(self):
+		return iter((self.score,self.alignedA,self.alignedB))
+
+	def __getitem__(self,index):
+		return (self.score,self.alignedA,self.alignedB)[index]
+
+	def __eq__(self,other):
+		return isinstance(other,AlignmentResult) and\
+			(self.score,self.alignedA,self.alignedB,self.startA,self.endA,self.startB,self.endB)==\
+			(other.score,other.alignedA,other.alignedB,other.startA,other.endA,other.startB,other.endB)
+
+	def __ne__(self,other):
+		return not self==other
+
+	def __repr__(self):
+		return "AlignmentResult(score=%s, A=%d-%d, B=%d-%d, identity=%.3f, gaps=%d)" %\
+			(self.score,self.startA,self.endA,self.startB,self.endB,self.identity,self.gapsA+self.gapsB)
+
+def countGapOpens(aligned):
+	"""Count the runs of '-' in an aligned string.
+	"""
+
+	return len([i for i,aa in enumerate(aligned) if aa=='-' and (i==0 or aligned[i-1]!='-')])
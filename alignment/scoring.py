@@ -0,0 +1,64 @@
+"""Scoring helpers shared by align.py and align_affine.py: encoding the
+sequences as residue codes, and looking up the substitution scores by code
+(the scoring matrices themselves are in matrices.py).
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+aminoAcids = "ARNDCQEGHILKMFPSTWYV"
+INVALID = 255 # code of anything that is not in aminoAcids
+
+# - translation table from characters to residue codes (indices in aminoAcids)
+codeTable = [chr(INVALID)]*256
+for code,aa in enumerate(aminoAcids):
+	codeTable[ord(aa)] = chr(code)
+codeTable = ''.join(codeTable)
+
+def encodeSequence(seq):
+	"""Encode an aminoacid sequence as a bytearray of residue codes (one uint8
+	per residue, the index in aminoAcids). Returns None if the sequence
+	contains anything else than aminoacids.
+	"""
+
+	codes = bytearray(str(seq).translate(codeTable))
+	if INVALID in codes:
+		return None
+	return codes
+
+def encodePair(seqA,seqB):
+	"""Encode the two sequences to be aligned (see encodeSequence). Prints an
+	error and returns None if one of them is not a valid aminoacid sequence.
+	"""
+
+	codesA = encodeSequence(seqA)
+	codesB = encodeSequence(seqB)
+	if codesA==None or codesB==None:
+		print "The sequences must be composed of aminoacids ("+aminoAcids+")."
+		return None
+	return codesA,codesB
+
+def decodeSequence(codes):
+	"""Return the aminoacid sequence of a list of residue codes.
+	"""
+
+	return ''.join([aminoAcids[code] for code in codes])
+
+def createSubstitutionMatrix(match,mismatch):
+	"""Create the substitution matrix indexed by residue codes for match/mismatch
+	scoring, so that substitution[codeA][codeB] is the score of aligning the two
+	aminoacids (matrices.getMatrix returns the same structure for the scoring
+	matrices).
+	"""
+
+	return [[match if codeA==codeB else mismatch for codeB in range(len(aminoAcids))]\
+		for codeA in range(len(aminoAcids))]
+
+def createProfile(codesA,substitution):
+	"""Create the query profile of an encoded sequence: for every residue code
+	b, the list of scores of b against each residue of the sequence. Row i of
+	the matrix of pair scores of seqA and seqB is profile[codesB[i]], so the
+	matrix does not need to be built.
+	"""
+
+	return [[substitution[codeA][codeB] for codeA in codesA] for codeB in range(len(aminoAcids))]
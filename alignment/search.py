@@ -0,0 +1,179 @@
+"""This is a Python script for searching an aminoacid sequence (the query)
+against a database of sequences in a FASTA file, using the Smith-Waterman
+algorithm with the affine gap model (see align_affine.py).
+
+The database is streamed in chunks to a pool of processes that only compute
+the local alignment scores (with the striped engine if NumPy is installed).
+The best hits are kept in a bounded heap, and only they are aligned in the
+end.
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import os
+import sys
+import heapq
+import multiprocessing
+from collections import deque
+from fasta import readFasta
+from scoring import aminoAcids,encodeSequence
+from matrices import scoringMatrices,getMatrix
+from result import SILENT
+from align_affine import water,waterEnd,createQueryProfile,stripedWater,numpy,STRIPEDMIN
+
+CHUNK = 256 # database sequences sent to a worker at a time
+TOP = 10 # number of hits reported
+
+# - state of a worker process, set once by initWorker
+worker = {}
+
+def initWorker(query,matrixName,gap,extend):
+	"""Prepare the scoring of the query in a worker process: the encoded query,
+	the substitution matrix and (with NumPy) the striped query profile, unless
+	the query is shorter than STRIPEDMIN (see align_affine.waterScore).
+	"""
+
+	worker["codesA"] = encodeSequence(query)
+	worker["substitution"] = getMatrix(matrixName)
+	worker["gap"] = gap
+	worker["extend"] = extend
+	worker["profile"] = None
+	if numpy!=None and len(worker["codesA"]) >= STRIPEDMIN:
+		worker["profile"] = createQueryProfile(worker["codesA"],worker["substitution"])
+
+def scoreChunk(seqs):
+	"""Compute the best local alignment score of the query with each sequence
+	of a chunk. Returns (score,position in the chunk) pairs; the sequences
+	that are empty or not aminoacid sequences are skipped.
+	"""
+
+	scores = []
+	for pos,seq in enumerate(seqs):
+		codesB = encodeSequence(seq)
+		if codesB==None or len(codesB)==0:
+			continue
+		if worker["profile"] is not None: # a NumPy array
+			score = stripedWater(worker["profile"],codesB,worker["gap"],worker["extend"])[0]
+		else:
+			score = waterEnd(worker["codesA"],codesB,worker["gap"],worker["extend"],worker["substitution"])[0]
+		scores.append((score,pos))
+	return scores
+
+def readChunks(databasePath,chunkSize):
+	"""Generate the database in chunks of (index,name,sequence) records.
+	"""
+
+	chunk = []
+	for index,(name,seq) in enumerate(readFasta(databasePath)):
+		chunk.append((index,name,seq))
+		if len(chunk)==chunkSize:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+def search(query,databasePath,matrixName="blosum62",gap=10,extend=1,top=TOP,processes=None,chunkSize=CHUNK):
+	"""Search the query against all the sequences of a FASTA database.
+	Returns the best hits (best score first, then database order) as a list of
+	(name,AlignmentResult) pairs, the number of sequences searched and the
+	number of sequences skipped (not aminoacid sequences). Returns None if the
+	arguments are not valid.
+	"""
+
+	query = query.upper()
+	if encodeSequence(query)==None or len(query)==0:
+		print "The query must be composed of aminoacids ("+aminoAcids+")."
+		return
+	if matrixName not in scoringMatrices:
+		print "Do not have the values for this matrix."
+		return
+	gap,extend,top = int(gap),int(extend),int(top)
+	if top < 1:
+		print "The number of hits to report must be at least 1."
+		return
+	if processes==None:
+		processes = multiprocessing.cpu_count()
+
+	#Score the database, keeping the best hits in a min-heap of
+	# (score,-index,name,sequence), so that earlier sequences win the ties
+	heap = []
+	counts = [0,0] # searched, skipped
+	def merge(chunk,scores):
+		counts[0] += len(chunk)
+		counts[1] += len(chunk)-len(scores)
+		for score,pos in scores:
+			index,name,seq = chunk[pos]
+			entry = (score,-index,name,seq)
+			if len(heap) < top:
+				heapq.heappush(heap,entry)
+			elif entry > heap[0]:
+				heapq.heappushpop(heap,entry)
+
+	if processes==1:
+		initWorker(query,matrixName,gap,extend)
+		for chunk in readChunks(databasePath,chunkSize):
+			merge(chunk,scoreChunk([seq for index,name,seq in chunk]))
+	else:
+		pool = multiprocessing.Pool(processes,initWorker,(query,matrixName,gap,extend))
+		# - only a few chunks per process are in flight, so the database is
+		# never read in memory as a whole
+		pending = deque()
+		for chunk in readChunks(databasePath,chunkSize):
+			pending.append((chunk,pool.apply_async(scoreChunk,([seq for index,name,seq in chunk],))))
+			if len(pending) >= 4*processes:
+				chunk,scores = pending.popleft()
+				merge(chunk,scores.get())
+		while pending:
+			chunk,scores = pending.popleft()
+			merge(chunk,scores.get())
+		pool.close()
+		pool.join()
+
+	#Align the query with the best hits (in linear space, as they can be long)
+	hits = []
+	for score,index,name,seq in sorted(heap,reverse=True):
+		hits.append((name,water(query,seq,gap,extend,matrixName=matrixName,linearSpace=True,verbosity=SILENT)))
+	return hits,counts[0],counts[1]
+
+if __name__=="__main__":
+	# Options (e.g. --top=20) can be given anywhere on the command line
+	options = {}
+	for arg in sys.argv[1:]:
+		if arg.startswith("--"):
+			name,_,value = arg[2:].partition("=")
+			options[name] = value
+	args = [arg for arg in sys.argv if not arg.startswith("--")]
+
+	if len(args)!=3 or not set(options).issubset(["matrix","gap","extend","top","processes","chunk"]):
+		print "Usage: python search.py QUERY database.fasta [options]"
+		print "  QUERY: an aminoacid sequence, or a FASTA file (its first sequence is used)"
+		print "  --matrix=name: scoring matrix ("+", ".join(scoringMatrices)+"), default blosum62"
+		print "  --gap=10 --extend=1: gap opening and extension penalties"
+		print "  --top=10: number of hits to report"
+		print "  --processes=N: number of worker processes, default the number of cores"
+		print "  --chunk=256: database sequences sent to a worker at a time"
+		exit(0)
+	query = args[1]
+	if os.path.isfile(query):
+		query = next(readFasta(query),(None,""))[1]
+	try:
+		gap,extend = int(options.get("gap",10)),int(options.get("extend",1))
+		top,chunkSize = int(options.get("top",TOP)),int(options.get("chunk",CHUNK))
+		processes = int(options["processes"]) if "processes" in options else None
+	except ValueError:
+		print "The numeric options should be integers."
+		exit(0)
+	if top < 1:
+		print "The number of hits to report (--top) must be at least 1."
+		exit(0)
+	found = search(query,args[2],matrixName=options.get("matrix","blosum62"),gap=gap,extend=extend,\
+		top=top,processes=processes,chunkSize=chunkSize)
+	if found!=None:
+		hits,searched,skipped = found
+		print "Searched "+str(searched)+" sequences of "+args[2]+" ("+str(skipped)+" skipped)."
+		for rank,(name,result) in enumerate(hits):
+			print "%d. %s score %d, identity %.2f, query %d-%d, subject %d-%d" %\
+				(rank+1,name,result.score,result.identity,result.startA+1,result.endA,result.startB+1,result.endB)
+			print result.alignedA
+			print result.alignedB
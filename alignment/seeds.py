@@ -0,0 +1,331 @@
+"""This is a Python script for a fast heuristic (BLAST-like) local search of
+an aminoacid sequence (the query) against a database of sequences in a FASTA
+file.
+
+The database is indexed once by its words of k aminoacids; the index is saved
+next to the database and reused by the following searches. For every word of
+the query, the neighbor words scoring at least a threshold against it (with
+the scoring matrix) are looked up in the index. Two hits on the same diagonal
+close to each other start an ungapped extension, and only the segments that
+score well enough are aligned with Smith-Waterman (affine gap model, see
+align_affine.py), on a window around them, widened while the alignment
+reaches its edges and its score improves (see alignWindow).
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import os
+import sys
+import heapq
+import struct
+from array import array
+from bisect import bisect_right
+from fasta import readFasta
+from scoring import aminoAcids,encodeSequence,decodeSequence
+from matrices import scoringMatrices,getMatrix
+from result import AlignmentResult,SILENT
+from align_affine import water
+
+WORD = 3 # length of the indexed words
+THRESHOLD = 11 # minimum score of a neighbor word against a query word
+WINDOW = 40 # maximum distance between two hits starting an extension
+XDROP = 16 # the ungapped extension stops this much below its best score
+MIN_UNGAPPED = 30 # minimum score of an ungapped segment to be aligned
+PAD = 32 # residues around an ungapped segment given to the gapped alignment, at first
+TOP = 10 # number of hits reported
+
+# Index file: header, then the arrays (in the byte order of the machine)
+MAGIC = "KMERIDX1"
+HEADER = struct.Struct("<8sIIIQdI") # magic, k, sequences, residues, database size and time, names length
+
+def buildIndex(databasePath,k=WORD):
+	"""Build the word index of a FASTA database: the encoded sequences are
+	concatenated in residues (starts[s] is where sequence s begins), and the
+	positions in residues of each word w (numbered in base 20, from the
+	residue codes) are postings[offsets[w]:offsets[w+1]]. The sequences that
+	are not aminoacid sequences are left out.
+	"""
+
+	names = []
+	starts = array("I",[0])
+	residues = bytearray()
+	for name,seq in readFasta(databasePath):
+		codes = encodeSequence(seq)
+		if codes==None or len(codes)==0:
+			continue
+		names.append(name)
+		residues.extend(codes)
+		starts.append(len(residues))
+
+	# - count the words, then place their positions (two passes, so that the
+	# postings are a single array)
+	numWords = len(aminoAcids)**k
+	counts = array("I",[0])*(numWords+1)
+	for s in range(len(names)):
+		for pos,word in sequenceWords(residues,starts[s],starts[s+1],k):
+			counts[word+1] += 1
+	offsets = array("I",[0])*(numWords+1)
+	for word in range(numWords):
+		offsets[word+1] = offsets[word]+counts[word+1]
+	postings = array("I",[0])*offsets[numWords]
+	fill = array("I",offsets)
+	for s in range(len(names)):
+		for pos,word in sequenceWords(residues,starts[s],starts[s+1],k):
+			postings[fill[word]] = pos
+			fill[word] += 1
+	stat = os.stat(databasePath)
+	return {"k":k,"names":names,"starts":starts,"residues":residues,\
+		"offsets":offsets,"postings":postings,"size":stat.st_size,"mtime":stat.st_mtime}
+
+def sequenceWords(residues,start,end,k):
+	"""Generate the (position,word) pairs of the words of residues[start:end].
+	"""
+
+	numWords = len(aminoAcids)**k
+	word = 0
+	for pos in range(start,end):
+		word = (word*len(aminoAcids)+residues[pos]) % numWords
+		if pos-start >= k-1:
+			yield pos-k+1,word
+
+def saveIndex(index,indexPath):
+	"""Write the index to a file (see MAGIC and HEADER for the layout).
+	"""
+
+	names = "\n".join(index["names"])
+	indexFile = open(indexPath,"wb")
+	indexFile.write(HEADER.pack(MAGIC,index["k"],len(index["names"]),len(index["residues"]),\
+		index["size"],index["mtime"],len(names)))
+	indexFile.write(names)
+	index["starts"].tofile(indexFile)
+	indexFile.write(index["residues"])
+	index["offsets"].tofile(indexFile)
+	index["postings"].tofile(indexFile)
+	indexFile.close()
+
+def loadIndex(indexPath):
+	"""Read an index written by saveIndex. Returns None if the file is not an
+	index.
+	"""
+
+	indexFile = open(indexPath,"rb")
+	header = indexFile.read(HEADER.size)
+	if len(header)!=HEADER.size or header[:len(MAGIC)]!=MAGIC:
+		indexFile.close()
+		return None
+	magic,k,numSeqs,numResidues,size,mtime,namesLength = HEADER.unpack(header)
+	names = indexFile.read(namesLength).split("\n") if numSeqs else []
+	starts = array("I")
+	starts.fromfile(indexFile,numSeqs+1)
+	residues = bytearray(indexFile.read(numResidues))
+	offsets = array("I")
+	offsets.fromfile(indexFile,len(aminoAcids)**k+1)
+	postings = array("I")
+	postings.fromfile(indexFile,offsets[-1])
+	indexFile.close()
+	return {"k":k,"names":names,"starts":starts,"residues":residues,\
+		"offsets":offsets,"postings":postings,"size":size,"mtime":mtime}
+
+def openIndex(databasePath,k=WORD,indexPath=None):
+	"""Return the index of a database, reading it from indexPath (by default
+	next to the database) if it is up to date, or building and saving it.
+	"""
+
+	if indexPath==None:
+		indexPath = databasePath+".kmers"
+	stat = os.stat(databasePath)
+	if os.path.isfile(indexPath):
+		index = loadIndex(indexPath)
+		if index!=None and index["k"]==k and index["size"]==stat.st_size and index["mtime"]==stat.st_mtime:
+			return index
+	index = buildIndex(databasePath,k)
+	saveIndex(index,indexPath)
+	return index
+
+def neighborWords(codes,substitution,threshold):
+	"""Return the words (numbered as in the index) that score at least the
+	threshold against the encoded word codes, without trying the prefixes
+	that can not reach it any more.
+	"""
+
+	best = [max(substitution[code]) for code in codes]
+	# - bestRest[p] is the best score of the positions p... of the word
+	bestRest = [sum(best[p:]) for p in range(len(codes)+1)]
+	words = [(0,0)] # (word, score) of the prefixes
+	for p,code in enumerate(codes):
+		longer = []
+		for word,score in words:
+			for other in range(len(aminoAcids)):
+				newScore = score+substitution[code][other]
+				if newScore+bestRest[p+1] >= threshold:
+					longer.append((word*len(aminoAcids)+other,newScore))
+		words = longer
+	return [word for word,score in words]
+
+def extendUngapped(codesA,residues,posA,posB,startB,endB,length,substitution,xdrop):
+	"""Extend the hit of codesA[posA:posA+length] with residues[posB:posB+length]
+	along its diagonal in both directions, without gaps, until the score drops
+	xdrop below the best one (or a sequence ends, the subject being
+	residues[startB:endB]). Returns the best score and the start of the
+	segment in codesA and residues, and its length.
+	"""
+
+	score = sum([substitution[codesA[posA+p]][residues[posB+p]] for p in range(length)])
+	# - to the right
+	best,bestEnd = score,length
+	p = length
+	while posA+p < len(codesA) and posB+p < endB and score > best-xdrop:
+		score += substitution[codesA[posA+p]][residues[posB+p]]
+		p += 1
+		if score > best:
+			best,bestEnd = score,p
+	# - to the left
+	score = best
+	left = 0
+	p = 1
+	while posA-p >= 0 and posB-p >= startB and score > best-xdrop:
+		score += substitution[codesA[posA-p]][residues[posB-p]]
+		if score > best:
+			best,left = score,p
+		p += 1
+	return best,posA-left,posB-left,left+bestEnd
+
+def alignWindow(codesA,residues,posA,posB,length,startS,endS,gap,extend,matrixName):
+	"""Align with water the ungapped segment of codesA[posA:posA+length] and
+	residues[posB:posB+length] (the subject being residues[startS:endS]) on a
+	window of PAD residues around it. While the alignment reaches an edge of
+	the window that is not the end of a sequence, the padding is doubled, as
+	long as this improves the score. Returns the AlignmentResult, with the
+	coordinates in the query and in the whole subject.
+	"""
+
+	pad = PAD
+	best = None
+	while True:
+		startA,endA = max(0,posA-pad),min(len(codesA),posA+length+pad)
+		startB,endB = max(startS,posB-pad),min(endS,posB+length+pad)
+		result = water(decodeSequence(codesA[startA:endA]),decodeSequence(residues[startB:endB]),\
+			gap,extend,matrixName=matrixName,verbosity=SILENT)
+		if best!=None and result.score <= best.score:
+			break # - a wider window did not help
+		best = AlignmentResult(result.score,result.alignedA,result.alignedB,result.startA+startA,\
+			result.endA+startA,result.startB+startB-startS,result.endB+startB-startS)
+		# - the edges of the window that the alignment reaches and that can move
+		clipped = (result.startA==0 and startA > 0) or (result.endA==endA-startA and endA < len(codesA)) or\
+			(result.startB==0 and startB > startS) or (result.endB==endB-startB and endB < endS)
+		if not clipped:
+			break
+		pad *= 2
+	return best
+
+def seedSearch(query,index,matrixName="blosum62",gap=10,extend=1,threshold=THRESHOLD,\
+	window=WINDOW,xdrop=XDROP,minScore=MIN_UNGAPPED,top=TOP):
+	"""Search the query in an indexed database (see openIndex). The best
+	ungapped segment of each database sequence that scores at least minScore
+	is aligned with water on a window around it (see alignWindow): the scores
+	are the ones of the alignments found in these windows, which can be lower
+	than the best local alignment of the whole sequences (a heuristic, as
+	the seeds are).
+	Returns the best hits (best score first, then database order) as a list of
+	(name,AlignmentResult) pairs, with the coordinates in the whole sequences.
+	Returns None if the arguments are not valid.
+	"""
+
+	codesA = encodeSequence(query.upper())
+	if codesA==None or len(codesA)==0:
+		print "The query must be composed of aminoacids ("+aminoAcids+")."
+		return
+	if matrixName not in scoringMatrices:
+		print "Do not have the values for this matrix."
+		return
+	substitution = getMatrix(matrixName)
+	k = index["k"]
+	starts,residues = index["starts"],index["residues"]
+	offsets,postings = index["offsets"],index["postings"]
+
+	#Find the pairs of hits on the same diagonal and extend them
+	lastHit = {} # diagonal => position in the query of its last hit
+	extendedTo = {} # diagonal => end in the query of its last extension
+	segments = {} # sequence => best ungapped segment (score,posA,posB,length)
+	for posA in range(len(codesA)-k+1):
+		for word in neighborWords(codesA[posA:posA+k],substitution,threshold):
+			for posB in postings[offsets[word]:offsets[word+1]]:
+				diagonal = posB-posA
+				if extendedTo.get(diagonal,-1) > posA:
+					continue # already covered by an extension
+				last = lastHit.get(diagonal)
+				if last!=None and posA-last < k:
+					continue # overlaps the last hit
+				lastHit[diagonal] = posA
+				if last==None or posA-last > window:
+					continue
+				s = bisect_right(starts,posB)-1
+				if posB+k > starts[s+1] or posB-(posA-last) < starts[s]:
+					continue # the two hits are not in the same sequence
+				segment = extendUngapped(codesA,residues,posA,posB,starts[s],starts[s+1],k,substitution,xdrop)
+				extendedTo[diagonal] = segment[1]+segment[3]
+				if segment[0] >= minScore and (s not in segments or segment[0] > segments[s][0]):
+					segments[s] = segment
+
+	#Align the best segments with gaps, on a window around them
+	heap = []
+	for s,(score,posA,posB,length) in segments.items():
+		result = alignWindow(codesA,residues,posA,posB,length,starts[s],starts[s+1],gap,extend,matrixName)
+		entry = (result.score,-s,result)
+		if len(heap) < top:
+			heapq.heappush(heap,entry)
+		elif entry[:2] > heap[0][:2]:
+			heapq.heappushpop(heap,entry)
+	return [(index["names"][-negS],result) for score,negS,result in sorted(heap,reverse=True)]
+
+if __name__=="__main__":
+	# Options (e.g. --k=4, --threshold=13) can be given anywhere on the command line
+	options = {}
+	for arg in sys.argv[1:]:
+		if arg.startswith("--"):
+			name,_,value = arg[2:].partition("=")
+			options[name] = value
+	args = [arg for arg in sys.argv if not arg.startswith("--")]
+
+	if not ((len(args)==3 and args[1]=="index") or (len(args)==4 and args[1]=="search")) or\
+	 not set(options).issubset(["k","matrix","gap","extend","threshold","window","xdrop","minscore","top"]):
+		print "Usage: python seeds.py index database.fasta [--k=3]"
+		print "Usage: python seeds.py search QUERY database.fasta [options]"
+		print "  QUERY: an aminoacid sequence, or a FASTA file (its first sequence is used)"
+		print "  --k=3: length of the indexed words"
+		print "  --matrix=name: scoring matrix ("+", ".join(scoringMatrices)+"), default blosum62"
+		print "  --gap=10 --extend=1: gap opening and extension penalties"
+		print "  --threshold=11: minimum score of a neighbor word"
+		print "  --window=40: maximum distance between two hits on a diagonal"
+		print "  --xdrop=16: drop of the ungapped extensions"
+		print "  --minscore=30: minimum ungapped score for a gapped alignment"
+		print "  --top=10: number of hits to report"
+		exit(0)
+	try:
+		k = int(options.get("k",WORD))
+		gap,extend = int(options.get("gap",10)),int(options.get("extend",1))
+		threshold,window = int(options.get("threshold",THRESHOLD)),int(options.get("window",WINDOW))
+		xdrop,minScore = int(options.get("xdrop",XDROP)),int(options.get("minscore",MIN_UNGAPPED))
+		top = int(options.get("top",TOP))
+	except ValueError:
+		print "The numeric options should be integers."
+		exit(0)
+	if args[1]=="index":
+		index = buildIndex(args[2],k)
+		saveIndex(index,args[2]+".kmers")
+		print "Indexed "+str(len(index["names"]))+" sequences ("+str(len(index["residues"]))+\
+			" residues) of "+args[2]+" in "+args[2]+".kmers"
+	else:
+		query = args[2]
+		if os.path.isfile(query):
+			query = next(readFasta(query),(None,""))[1]
+		index = openIndex(args[3],k)
+		hits = seedSearch(query,index,matrixName=options.get("matrix","blosum62"),gap=gap,extend=extend,\
+			threshold=threshold,window=window,xdrop=xdrop,minScore=minScore,top=top)
+		if hits!=None:
+			for rank,(name,result) in enumerate(hits):
+				print "%d. %s score %d, identity %.2f, query %d-%d, subject %d-%d" %\
+					(rank+1,name,result.score,result.identity,result.startA+1,result.endA,result.startB+1,result.endB)
+				print result.alignedA
+				print result.alignedB
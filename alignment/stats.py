@@ -0,0 +1,126 @@
+"""Instrumentation of needle and water (align.py and align_affine.py): the
+wall time of each phase of an alignment (setup, pair scores, fill,
+traceback, output), its number of cells, the cells computed per second and
+the peak memory of the process.
+
+It is off by default, and then costs one test per phase. When it is on
+(enableStats), every AlignmentResult has a stats attribute (an
+AlignmentStats, None otherwise), and the stats of many alignments can be
+added up in a StatsSummary (see batch.py).
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import time
+import resource
+
+phases = ["setup","pair scores","fill","traceback","output"]
+settings = {"enabled":False}
+
+def enableStats(enabled=True):
+	"""Switch the instrumentation on (or off) in this process.
+	"""
+
+	settings["enabled"] = enabled
+
+def startStats(seqA,seqB):
+	"""Return the AlignmentStats of a new alignment of two sequences, or None
+	if the instrumentation is off.
+	"""
+
+	if not settings["enabled"]:
+		return None
+	# - the arguments are not verified yet
+	if not isinstance(seqA,basestring) or not isinstance(seqB,basestring):
+		return AlignmentStats(0)
+	return AlignmentStats(len(seqA)*len(seqB))
+
+def markStats(stats,phase):
+	"""Count the time since the previous mark in a phase.
+	"""
+
+	if stats!=None:
+		stats.mark(phase)
+
+def finishStats(stats,result):
+	"""Count the time since the previous mark as output, and attach the stats
+	to the result of the alignment. Returns the result.
+	"""
+
+	if stats!=None:
+		stats.mark("output")
+		stats.finish()
+		result.stats = stats
+	return result
+
+def peakMemory():
+	"""Return the peak resident memory of the process, in kilobytes.
+	"""
+
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+class AlignmentStats(object):
+	"""The wall time of the phases of one alignment (seconds), the number of
+	cells of its dynamic programming matrix (len(seqA)*len(seqB), also for the
+	engines computing only some of them, as usual for the GCUPS) and the
+	peak memory of the process at its end (kilobytes).
+	"""
+
+	def __init__(self,cells):
+		self.cells = cells
+		self.seconds = dict((phase,0.0) for phase in phases)
+		self.total = 0.0
+		self.peakMemory = 0
+		self.start = self.last = time.time()
+
+	def mark(self,phase):
+		now = time.time()
+		self.seconds[phase] += now-self.last
+		self.last = now
+
+	def finish(self):
+		self.total = self.last-self.start
+		self.peakMemory = peakMemory()
+
+	def cellsPerSecond(self):
+		return self.cells/self.total if self.total > 0 else 0.0
+
+	def __repr__(self):
+		return "AlignmentStats(cells=%d, total=%.6fs, %s, GCUPS=%.4f, peak=%dkB)" %\
+			(self.cells,self.total,", ".join(["%s=%.6fs" % (phase,self.seconds[phase]) for phase in phases]),\
+			self.cellsPerSecond()/1e9,self.peakMemory)
+
+class StatsSummary(object):
+	"""The stats of many alignments added up (the peak memory is the largest
+	one). Summaries of different processes can be added too.
+	"""
+
+	def __init__(self):
+		self.alignments = 0
+		self.cells = 0
+		self.seconds = dict((phase,0.0) for phase in phases)
+		self.total = 0.0
+		self.peakMemory = 0
+
+	def add(self,stats):
+		"""Add an AlignmentStats or a StatsSummary.
+		"""
+
+		self.alignments += getattr(stats,"alignments",1)
+		self.cells += stats.cells
+		for phase in phases:
+			self.seconds[phase] += stats.seconds[phase]
+		self.total += stats.total
+		self.peakMemory = max(self.peakMemory,stats.peakMemory)
+
+	def lines(self):
+		"""Return the summary as lines of text.
+		"""
+
+		lines = ["Alignments: %d, cells: %d, time: %.3fs, GCUPS: %.4f, peak memory: %dkB" %\
+			(self.alignments,self.cells,self.total,(self.cells/self.total/1e9 if self.total > 0 else 0.0),self.peakMemory)]
+		for phase in phases:
+			share = 100*self.seconds[phase]/self.total if self.total > 0 else 0.0
+			lines.append("  %-12s %10.3fs %5.1f%%" % (phase,self.seconds[phase],share))
+		return lines
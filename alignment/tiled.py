@@ -0,0 +1,258 @@
+"""Tiled multi-core dynamic programming for a single huge alignment, with
+the linear gap model of needle and water in align.py.
+
+The dynamic programming matrix is cut in tiles of TILE x TILE cells. A tile
+only depends on the last row of the tile above it and on the last column of
+the tile on its left, so the tiles of an anti-diagonal of tiles are computed
+in parallel by a pool of processes. These borders are passed between the
+processes through shared memory (multiprocessing.sharedctypes). The
+traceback of every cell is kept in shared memory too or, with checkpoint,
+only the borders are kept and the tiles crossed by the alignment are
+computed again during the backtracking (O(len(seqA)+len(seqB)) memory for
+the borders, instead of O(len(seqA)*len(seqB))).
+The scores and the alignment are the same as with the python engine.
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import sys
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+from fasta import readFasta
+from scoring import aminoAcids,encodePair,createSubstitutionMatrix,createProfile
+from matrices import scoringMatrices,getMatrix
+
+TILE = 512 # rows and columns of a tile
+
+# Traceback of a cell, one byte per cell: the direction, as in align.py
+# ('\\', '|', '-'), and a flag for the zeros of a local alignment
+DIAGONAL, UP, LEFT = 0,1,2
+DIRECTION = 3 # the bits of the direction
+ZERO = 4
+
+# - state of a worker process, set once by initWorker
+worker = {}
+
+def initWorker(codesA,codesB,gap,substitution,local,tile,borderRows,borderCols,track):
+	"""Prepare the computation of the tiles in a worker process (the shared
+	arrays are inherited from the parent process).
+	"""
+
+	worker["codesA"] = codesA
+	worker["codesB"] = codesB
+	worker["profile"] = createProfile(codesA,substitution)
+	worker["gap"] = gap
+	worker["local"] = local
+	worker["tile"] = tile
+	worker["borderRows"] = borderRows
+	worker["borderCols"] = borderCols
+	worker["track"] = track
+
+def tileBounds(r,c):
+	"""Return the first and last rows and columns of tile (r,c), including
+	the row and the column of its top and left borders.
+	"""
+
+	tile = worker["tile"]
+	return r*tile,min((r+1)*tile,len(worker["codesB"])),c*tile,min((c+1)*tile,len(worker["codesA"]))
+
+def computeTile(r,c,keep=False):
+	"""Compute tile (r,c) from its top and left borders, write its last row
+	and last column to the shared borders (and its traceback to the shared
+	traceback, if it is kept). Returns the best local score of the tile and
+	its cell, the first one in row order ((-1,None,None) for a global
+	alignment); with keep, also returns the traceback of the tile, row by
+	row (used by the backtracking with checkpoints).
+	"""
+
+	gap,local,profile,codesB = worker["gap"],worker["local"],worker["profile"],worker["codesB"]
+	borderRows,borderCols,track = worker["borderRows"],worker["borderCols"],worker["track"]
+	width,height = len(worker["codesA"])+1,len(codesB)+1
+	i0,i1,j0,j1 = tileBounds(r,c)
+	prev = borderRows[r*width+j0:r*width+j1+1]
+	left = borderCols[c*height+i0:c*height+i1+1]
+	best = [-1,None,None]
+	directions = [None]
+	for i in range(i0+1,i1+1):
+		pairScores = profile[codesB[i-1]]
+		row = [left[i-i0]]
+		rowTrack = bytearray(j1-j0+1)
+		for j in range(j0+1,j1+1):
+			diag = prev[j-1-j0] + pairScores[j-1]
+			up = prev[j-j0] - gap
+			horizontal = row[-1] - gap
+			# - the same preferences as the python engine ('\\', then '|', then '-')
+			if diag >= up and diag >= horizontal:
+				maxVal,direction = diag,DIAGONAL
+			elif up >= horizontal:
+				maxVal,direction = up,UP
+			else:
+				maxVal,direction = horizontal,LEFT
+			if local and maxVal <= 0:
+				maxVal,direction = 0,direction|ZERO
+			row.append(maxVal)
+			rowTrack[j-j0] = direction
+			if maxVal > best[0]:
+				best = [maxVal,i,j]
+		if track!=None:
+			track[i*width+j0+1:i*width+j1+1] = str(rowTrack[1:])
+		borderCols[(c+1)*height+i] = row[-1]
+		if keep:
+			directions.append(rowTrack)
+		prev = row
+	borderRows[(r+1)*width+j0+1:(r+1)*width+j1+1] = prev[1:]
+	if not local:
+		best = [-1,None,None]
+	if keep:
+		return best,directions
+	return best
+
+def fillTile(position):
+	"""Compute a tile in a worker process (see computeTile).
+	"""
+
+	return computeTile(*position)
+
+def tiledAlign(codesA,codesB,gap,substitution,local,tile=TILE,processes=None,checkpoint=False):
+	"""Align two encoded sequences (globally, or locally if local is True)
+	with the linear gap model, computing the tiles of each anti-diagonal of
+	tiles in parallel (see the description of the module).
+	Inside a worker process of a pool (a daemonic process, which can not have
+	children, e.g. in batch.py or daemon.py), the tiles are computed by this
+	process only.
+	Returns the score, the two aligned sequences and the start and end of the
+	alignment in seqA and seqB.
+	"""
+
+	lenA,lenB = len(codesA),len(codesB)
+	width,height = lenA+1,lenB+1
+	numRows,numCols = max(1,(lenB+tile-1)/tile),max(1,(lenA+tile-1)/tile)
+	if processes==None:
+		processes = multiprocessing.cpu_count()
+	if multiprocessing.current_process().daemon:
+		processes = 1
+
+	#Allocate the shared borders: borderRows[r] is the row r*tile of the
+	# matrix, and borderCols[c] its column c*tile
+	borderRows = RawArray("i",(numRows+1)*width)
+	borderCols = RawArray("i",(numCols+1)*height)
+	if not local:
+		borderRows[0:width] = [-gap*j for j in range(width)]
+		borderCols[0:height] = [-gap*i for i in range(height)]
+		# - the first cell of the other borders is on the first row or column
+		for r in range(1,numRows+1):
+			borderRows[r*width] = -gap*min(r*tile,lenB)
+		for c in range(1,numCols+1):
+			borderCols[c*height] = -gap*min(c*tile,lenA)
+	track = None
+	if not checkpoint:
+		track = RawArray("c",width*height) # - the first row and column are not used
+	initWorker(codesA,codesB,gap,substitution,local,tile,borderRows,borderCols,track)
+
+	#Compute the tiles, one anti-diagonal of tiles at a time
+	best = [-1,None,None]
+	pool = None
+	if processes > 1 and numRows*numCols > 1:
+		pool = multiprocessing.Pool(processes,initWorker,\
+			(codesA,codesB,gap,substitution,local,tile,borderRows,borderCols,track))
+	for diagonal in range(numRows+numCols-1):
+		positions = [(r,diagonal-r) for r in range(max(0,diagonal-numCols+1),min(numRows,diagonal+1))]
+		if pool!=None:
+			found = pool.map(fillTile,positions,1)
+		else:
+			found = [fillTile(position) for position in positions]
+		# - the first maximum in row order, as found by the python engine
+		for tileBest in found:
+			if tileBest[0] > best[0] or (tileBest[0]==best[0] and tileBest[1:] < best[1:]):
+				best = tileBest
+	if pool!=None:
+		pool.close()
+		pool.join()
+
+	#Backtracking (same preferences as the python engine)
+	if local:
+		score,endB,endA = best
+		if endB==None: # - an empty sequence
+			score,endB,endA = 0,min(1,lenB),min(1,lenA)
+	else:
+		score,endB,endA = borderRows[numRows*width+lenA],lenB,lenA
+	loc = (endB,endA)
+	alignment = [[],[]]
+	current = None
+	while loc != (0,0):
+		i,j = loc
+		if i==0 or j==0:
+			if local:
+				break
+			direction = LEFT if i==0 else UP
+		elif track!=None:
+			direction = ord(track[i*width+j])
+		else:
+			# - compute again the tile of the cell from its borders
+			r,c = (i-1)/tile,(j-1)/tile
+			if current!=(r,c):
+				current = (r,c)
+				i0,i1,j0,j1 = tileBounds(r,c)
+				directions = computeTile(r,c,keep=True)[1]
+			direction = directions[i-i0][j-j0]
+		if local and direction & ZERO:
+			break
+		direction &= DIRECTION
+		if direction==LEFT:
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append('-')
+			loc = (i,j-1)
+		elif direction==UP:
+			alignment[0].append('-')
+			alignment[1].append(aminoAcids[codesB[i-1]])
+			loc = (i-1,j)
+		else:
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append(aminoAcids[codesB[i-1]])
+			loc = (i-1,j-1)
+	return score,''.join(reversed(alignment[0])),''.join(reversed(alignment[1])),loc[1],endA,loc[0],endB
+
+if __name__=="__main__":
+	# Options (e.g. --tile=1024, --checkpoint) can be given anywhere on the command line
+	options = {}
+	for arg in sys.argv[1:]:
+		if arg.startswith("--"):
+			name,_,value = arg[2:].partition("=")
+			options[name] = value
+	args = [arg for arg in sys.argv if not arg.startswith("--")]
+
+	if len(args)!=4 or args[1] not in ["global","local"] or\
+	 not set(options).issubset(["matrix","match","mismatch","gap","tile","processes","checkpoint"]) or\
+	 ("matrix" in options)==("match" in options or "mismatch" in options):
+		print "Usage: python tiled.py global|local seqA.fasta seqB.fasta --matrix=blosum62 [options]"
+		print "Usage: python tiled.py global|local seqA.fasta seqB.fasta --match=1 --mismatch=-1 [options]"
+		print "  the first sequence of each FASTA file is aligned"
+		print "  --matrix=name: scoring matrix ("+", ".join(scoringMatrices)+")"
+		print "  --gap=8: gap penalty"
+		print "  --tile=512: rows and columns of a tile"
+		print "  --processes=N: number of worker processes, default the number of cores"
+		print "  --checkpoint: only keep the tile borders, and compute again the tiles of the traceback"
+		exit(0)
+	try:
+		gap,tile = int(options.get("gap",8)),int(options.get("tile",TILE))
+		processes = int(options["processes"]) if "processes" in options else None
+		if "matrix" not in options:
+			match,mismatch = int(options.get("match")),int(options.get("mismatch"))
+	except (TypeError,ValueError):
+		print "The numeric options should be integers."
+		exit(0)
+	if "matrix" in options and options["matrix"] not in scoringMatrices:
+		print "Do not have the values for this matrix."
+		exit(0)
+	seqA = next(readFasta(args[2]),(None,""))[1]
+	seqB = next(readFasta(args[3]),(None,""))[1]
+	encoded = encodePair(seqA,seqB)
+	if encoded!=None:
+		substitution = getMatrix(options["matrix"]) if "matrix" in options else createSubstitutionMatrix(match,mismatch)
+		score,alignedA,alignedB,startA,endA,startB,endB = tiledAlign(encoded[0],encoded[1],gap,substitution,\
+			args[1]=="local",tile,processes,"checkpoint" in options)
+		print "Here is a "+args[1]+" alignment (score "+str(score)+", seqA "+str(startA+1)+"-"+str(endA)+\
+			", seqB "+str(startB+1)+"-"+str(endB)+"):"
+		print alignedA
+		print alignedB
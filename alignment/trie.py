@@ -0,0 +1,152 @@
+"""Global alignment of one query against many targets sharing prefixes
+(isoforms, panels of variants), with the linear gap model of needle in
+align.py.
+
+A row of the dynamic programming matrix of needle only depends on the row
+above it, i.e. on the residues of the target up to that row: targets with a
+common prefix share the first rows of their matrices. The targets are
+walked depth first in their trie (the sorted targets, as consecutive ones
+share the path of the trie down to their common prefix), keeping the rows
+of the current path on a stack, so each row is computed once per node of
+the trie, and the alignment of a target is traced back on the stack when
+its last residue is reached.
+The scores and the alignments are the same as with the python engine.
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import sys
+from fasta import readFasta
+from scoring import aminoAcids,encodeSequence,createSubstitutionMatrix,createProfile
+from matrices import scoringMatrices,getMatrix
+
+# Traceback of a cell, as in align.py ('\\', '|', '-')
+DIAGONAL, UP, LEFT = 0,1,2
+
+def sharedPrefix(codesA,codesB):
+	"""Return the length of the common prefix of two encoded sequences.
+	"""
+
+	length = 0
+	for codeA,codeB in zip(codesA,codesB):
+		if codeA!=codeB:
+			break
+		length += 1
+	return length
+
+def trieRow(prev,pairScores,gap):
+	"""Compute a row of the dynamic programming matrix of needle from the row
+	above it. Returns the row and its traceback.
+	"""
+
+	row = [prev[0]-gap]
+	track = bytearray(len(prev))
+	track[0] = UP
+	for j in range(len(pairScores)):
+		diag = prev[j] + pairScores[j]
+		up = prev[j+1] - gap
+		left = row[j] - gap
+		# - the same preferences as the python engine ('\\', then '|', then '-')
+		if diag >= up and diag >= left:
+			row.append(diag)
+		elif up >= left:
+			row.append(up)
+			track[j+1] = UP
+		else:
+			row.append(left)
+			track[j+1] = LEFT
+	return row,track
+
+def trieBacktrack(codesA,codesB,tracks):
+	"""Return the two aligned sequences of a target from the tracebacks of its
+	rows (tracks[i] is the traceback of row i, the first one is not used).
+	"""
+
+	alignment = [[],[]]
+	i,j = len(codesB),len(codesA)
+	while (i,j) != (0,0):
+		direction = LEFT if i==0 else tracks[i][j]
+		if direction==LEFT:
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append('-')
+			j -= 1
+		elif direction==UP:
+			alignment[0].append('-')
+			alignment[1].append(aminoAcids[codesB[i-1]])
+			i -= 1
+		else:
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append(aminoAcids[codesB[i-1]])
+			i -= 1
+			j -= 1
+	return ''.join(reversed(alignment[0])),''.join(reversed(alignment[1]))
+
+def trieAlign(codesA,targets,gap,substitution):
+	"""Globally align an encoded query with encoded targets (see the
+	description of the module). Returns the (score, alignedA, alignedB) of the
+	targets, in their order, and the number of rows computed.
+	"""
+
+	profile = createProfile(codesA,substitution)
+	rows = [range(0,-gap*(len(codesA)+1),-gap)] # - the rows of the current path
+	tracks = [None]
+	path = bytearray()
+	alignments = [None]*len(targets)
+	computed = 0
+	for index in sorted(range(len(targets)),key=lambda index: targets[index]):
+		codesB = targets[index]
+		#Go back up the trie to the common prefix, and down to the target
+		depth = sharedPrefix(path,codesB)
+		del rows[depth+1:],tracks[depth+1:],path[depth:]
+		for codeB in codesB[depth:]:
+			row,track = trieRow(rows[-1],profile[codeB],gap)
+			rows.append(row)
+			tracks.append(track)
+			path.append(codeB)
+			computed += 1
+		alignedA,alignedB = trieBacktrack(codesA,codesB,tracks)
+		alignments[index] = (rows[-1][-1],alignedA,alignedB)
+	return alignments,computed
+
+if __name__=="__main__":
+	# Options (e.g. --matrix=blosum62, --gap=8) can be given anywhere on the command line
+	options = {}
+	for arg in sys.argv[1:]:
+		if arg.startswith("--"):
+			name,_,value = arg[2:].partition("=")
+			options[name] = value
+	args = [arg for arg in sys.argv if not arg.startswith("--")]
+
+	if len(args)!=3 or not set(options).issubset(["matrix","match","mismatch","gap"]) or\
+	 ("matrix" in options)==("match" in options or "mismatch" in options):
+		print "Usage: python trie.py query.fasta targets.fasta --matrix=blosum62 [--gap=8]"
+		print "Usage: python trie.py query.fasta targets.fasta --match=1 --mismatch=-1 [--gap=8]"
+		print "  the first sequence of query.fasta is aligned with all the sequences of targets.fasta"
+		print "  --matrix=name: scoring matrix ("+", ".join(scoringMatrices)+")"
+		print "  --gap=8: gap penalty"
+		exit(0)
+	try:
+		gap = int(options.get("gap",8))
+		if "matrix" not in options:
+			match,mismatch = int(options.get("match")),int(options.get("mismatch"))
+	except (TypeError,ValueError):
+		print "The numeric options should be integers."
+		exit(0)
+	if "matrix" in options and options["matrix"] not in scoringMatrices:
+		print "Do not have the values for this matrix."
+		exit(0)
+	query = next(readFasta(args[1]),(None,""))[1]
+	targets = list(readFasta(args[2]))
+	codesA = encodeSequence(query)
+	codes = [encodeSequence(seq) for name,seq in targets]
+	if codesA==None or None in codes:
+		print "The sequences must be composed of aminoacids ("+aminoAcids+")."
+		exit(0)
+	substitution = getMatrix(options["matrix"]) if "matrix" in options else createSubstitutionMatrix(match,mismatch)
+	alignments,computed = trieAlign(codesA,codes,gap,substitution)
+	for (name,seq),(score,alignedA,alignedB) in zip(targets,alignments):
+		print "Here is a global alignment with "+name+" (score "+str(score)+"):"
+		print alignedA
+		print alignedB
+	print "Computed "+str(computed)+" rows for "+str(sum([len(seq) for name,seq in targets]))+" target residues."
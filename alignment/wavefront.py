@@ -0,0 +1,272 @@
+"""The wavefront alignment algorithm (WFA) for the global alignment of two
+sequences scored with match/mismatch values, with the linear gap model of
+align.py and the affine gap model of align_affine.py.
+
+The scores are turned into penalties, a match costing nothing: for every
+penalty s, the wavefront keeps the furthest cell reached on each diagonal
+with that penalty, and the matches following it are skipped at once. The
+work is O(n*s), so similar sequences are aligned much faster than with the
+whole dynamic programming matrix.
+With the match value m, a mismatch value x and gap values d (open) and e
+(extension), the penalties are 2(m-x) for a mismatch, 2d+m for the first
+residue of a gap and 2e+m for the next ones, and the score of an alignment
+of penalty s is (m*(lenA+lenB)-s)/2.
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+from scoring import aminoAcids
+
+MININF = float("-inf") # no cell reached
+BLOCK = 64 # residues compared at once when skipping matches
+
+def extendMatches(codesA,codesB,j,k):
+	"""Return the offset reached from offset j of diagonal k (the cell
+	(j-k,j)) following the matches.
+	"""
+
+	i = j-k
+	lenA,lenB = len(codesA),len(codesB)
+	while j+BLOCK <= lenA and i+BLOCK <= lenB and codesA[j:j+BLOCK]==codesB[i:i+BLOCK]:
+		j += BLOCK
+		i += BLOCK
+	while j < lenA and i < lenB and codesA[j]==codesB[i]:
+		j += 1
+		i += 1
+	return j
+
+def offsetAt(waves,s,state,k):
+	"""Return the offset of diagonal k in the given state of wavefront s,
+	minus infinity if it was not reached.
+	"""
+
+	if s < 0 or waves[s]==None:
+		return MININF
+	lo,offsets = waves[s][0],waves[s][state+1]
+	if lo <= k < lo+len(offsets):
+		return offsets[k-lo]
+	return MININF
+
+def diagonalRange(waves,sources):
+	"""Return the range of diagonals reachable from the wavefronts of the
+	sources (penalty,state) (None if none), one diagonal further on each side.
+	"""
+
+	lo,hi = None,None
+	for s,state in sources:
+		if s >= 0 and waves[s]!=None:
+			offsets = waves[s][state+1]
+			if lo==None or waves[s][0]-1 < lo: lo = waves[s][0]-1
+			if hi==None or waves[s][0]+len(offsets) > hi: hi = waves[s][0]+len(offsets)
+	return lo,hi
+
+def validOffset(j,k,lenA,lenB):
+	"""Return the offset j of diagonal k if it is a cell of the matrix, minus
+	infinity otherwise.
+	"""
+
+	if j!=MININF and j <= lenA and 0 <= j-k <= lenB:
+		return j
+	return MININF
+
+def linearSources(waves,s,k,x,g,lenA,lenB):
+	"""Return the (offset,penalty,diagonal) of the cells of diagonal k reached
+	with penalty s from the previous wavefronts: by a mismatch, a gap in seqB
+	and a gap in seqA.
+	"""
+
+	return [(validOffset(offsetAt(waves,s-x,0,k)+1,k,lenA,lenB),s-x,k),\
+		(validOffset(offsetAt(waves,s-g,0,k-1)+1,k,lenA,lenB),s-g,k-1),\
+		(validOffset(offsetAt(waves,s-g,0,k+1),k,lenA,lenB),s-g,k+1)]
+
+def wavefrontLinear(codesA,codesB,match,mismatch,gap):
+	"""Globally align two encoded sequences with the linear gap model (as
+	needle in align.py), computing the wavefronts of increasing penalty until
+	the bottom right cell is reached.
+	Returns the score and the two aligned sequences (None if the scoring
+	values can not be turned into penalties).
+	"""
+
+	x,g = 2*(match-mismatch),2*gap+match
+	if x <= 0 or g <= 0:
+		print "The wavefront engine needs match > mismatch and match+2*gap > 0."
+		return
+	lenA,lenB = len(codesA),len(codesB)
+	kEnd = lenA-lenB
+	waves = [] # waves[s] is [first diagonal, offsets] or None
+	s = 0
+	while True:
+		if s==0:
+			lo,hi = 0,0
+		else:
+			lo,hi = diagonalRange(waves,[(s-x,0),(s-g,0)])
+		wave = None
+		if lo!=None:
+			lo,hi = max(lo,-lenB),min(hi,lenA)
+			wave = [lo,[]]
+			for k in range(lo,hi+1):
+				j = max([offset for offset,source,diagonal in linearSources(waves,s,k,x,g,lenA,lenB)])
+				if s==0 and k==0:
+					j = 0
+				if j!=MININF:
+					j = extendMatches(codesA,codesB,j,k)
+				wave[1].append(j)
+		waves.append(wave)
+		if offsetAt(waves,s,0,kEnd)==lenA:
+			break
+		s += 1
+	score = (match*(lenA+lenB)-s)/2
+
+	#Backtracking, from the bottom right cell
+	alignment = [[],[]]
+	k,j = kEnd,lenA
+	while (k,j) != (0,0):
+		# - the matches skipped, back to the cell reached with penalty s
+		sources = linearSources(waves,s,k,x,g,lenA,lenB)
+		start = 0 if s==0 and k==0 else max([offset for offset,source,diagonal in sources if offset <= j])
+		while j > start:
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append(aminoAcids[codesB[j-1-k]])
+			j -= 1
+		if (k,j)==(0,0):
+			break
+		for offset,source,diagonal in sources:
+			if offset==j:
+				break
+		if diagonal==k: # mismatch
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append(aminoAcids[codesB[j-1-k]])
+			j -= 1
+		elif diagonal==k-1: # gap in seqB
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append('-')
+			j -= 1
+		else: # gap in seqA
+			alignment[0].append('-')
+			alignment[1].append(aminoAcids[codesB[j-k-1]])
+		s,k = source,diagonal
+	return score,''.join(reversed(alignment[0])),''.join(reversed(alignment[1]))
+
+def matchSources(codesA,codesB,waves,s,k,x,lenA,lenB):
+	"""Return the (offset,penalty,state) of the cells of diagonal k reached in
+	state M with penalty s, before skipping the matches: by a mismatch from
+	any state, or by a match after a gap.
+	"""
+
+	sources = [(validOffset(offsetAt(waves,s-x,state,k)+1,k,lenA,lenB),s-x,state) for state in (1,0,2)]
+	for state in (0,2):
+		j = offsetAt(waves,s,state,k)
+		if j!=MININF and j < lenA and j-k < lenB and codesA[j]==codesB[j-k]:
+			sources.append((j+1,s,state))
+	return sources
+
+def wavefrontAffine(codesA,codesB,match,mismatch,gap,extend):
+	"""Globally align two encoded sequences with the affine gap model (as
+	needle in align_affine.py), computing the wavefronts of increasing penalty
+	until the bottom right cell is reached. There are three states, as in the
+	dynamic programming: M (the cell is reached by a diagonal move), Iy (by a
+	gap in seqB) and Ix (by a gap in seqA); a gap is only opened from M, but a
+	gap starting in the top left corner may turn once (as with the margins
+	of the matrices of needle).
+	As a gap can not directly follow a gap in the other direction, the
+	furthest cell of a diagonal is only sure to be the best one to continue
+	from if a mismatch costs at most two gap extensions and a gap extension
+	at most a gap opening; other scoring values are refused.
+	Returns the score and the two aligned sequences (None if the scoring
+	values can not be turned into penalties).
+	"""
+
+	x,o,e = 2*(match-mismatch),2*gap+match,2*extend+match
+	if x <= 0 or e <= 0 or e > o or x > 2*e:
+		print "The wavefront engine needs match > mismatch, match+2*extend > 0, extend <= gap and mismatch >= -2*extend."
+		return
+	lenA,lenB = len(codesA),len(codesB)
+	kEnd = lenA-lenB
+	waves = [] # waves[s] is [first diagonal, Iy offsets, M offsets, Ix offsets] or None
+	s = 0
+	while True:
+		if s==0:
+			lo,hi = 0,0
+		else:
+			lo,hi = diagonalRange(waves,[(s-x,0),(s-x,1),(s-x,2),(s-o,1),(s-e,0),(s-e,2)])
+		# - a gap of this length starting in the top left corner (the margins)
+		margin = (s-o)/e+1 if s >= o and (s-o)%e==0 else None
+		if margin!=None:
+			lo = -margin if lo==None else min(lo,-margin)
+			hi = margin if hi==None else max(hi,margin)
+		wave = None
+		if lo!=None:
+			lo,hi = max(lo,-lenB),min(hi,lenA)
+			wave = [lo,[],[],[]]
+			for k in range(lo,hi+1):
+				jIy = max(validOffset(offsetAt(waves,s-o,1,k-1)+1,k,lenA,lenB),\
+					validOffset(offsetAt(waves,s-e,0,k-1)+1,k,lenA,lenB))
+				jIx = max(validOffset(offsetAt(waves,s-o,1,k+1),k,lenA,lenB),\
+					validOffset(offsetAt(waves,s-e,2,k+1),k,lenA,lenB))
+				if margin!=None and k==-margin:
+					jIy = max(jIy,0) # left margin
+				if margin!=None and k==margin:
+					jIx = max(jIx,k) # top margin
+				wave[1].append(jIy)
+				wave[3].append(jIx)
+				wave[2].append(MININF)
+		waves.append(wave)
+		if wave!=None:
+			for k in range(lo,hi+1):
+				jM = max([offset for offset,source,state in matchSources(codesA,codesB,waves,s,k,x,lenA,lenB)])
+				if s==0 and k==0:
+					jM = 0
+				if jM!=MININF:
+					jM = extendMatches(codesA,codesB,jM,k)
+				wave[2][k-lo] = jM
+		ends = [offsetAt(waves,s,state,kEnd) for state in range(3)]
+		if lenA in ends:
+			state = ends.index(lenA)
+			break
+		s += 1
+	score = (match*(lenA+lenB)-s)/2
+
+	#Backtracking, from the bottom right cell (same states as in needle)
+	alignment = [[],[]]
+	k,j = kEnd,lenA
+	while (k,j) != (0,0):
+		i = j-k
+		if state==1:
+			# - the matches skipped, back to the cell reached with penalty s
+			sources = matchSources(codesA,codesB,waves,s,k,x,lenA,lenB)
+			start = 0 if s==0 and k==0 else max([offset for offset,source,previous in sources if offset <= j])
+			while j > start:
+				alignment[0].append(aminoAcids[codesA[j-1]])
+				alignment[1].append(aminoAcids[codesB[j-1-k]])
+				j -= 1
+			if (k,j)==(0,0):
+				break
+			for offset,source,previous in sources:
+				if offset==j:
+					break
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append(aminoAcids[codesB[j-1-k]])
+			j -= 1
+			s,state = source,previous
+		elif state==0 and j==0: # left margin, go up
+			alignment[0].extend('-'*i)
+			alignment[1].extend([aminoAcids[codesB[b]] for b in range(i-1,-1,-1)])
+			k = 0
+		elif state==2 and i==0: # top margin, go left
+			alignment[0].extend([aminoAcids[codesA[a]] for a in range(j-1,-1,-1)])
+			alignment[1].extend('-'*j)
+			k,j = 0,0
+		elif state==0:
+			alignment[0].append(aminoAcids[codesA[j-1]])
+			alignment[1].append('-')
+			if offsetAt(waves,s-o,1,k-1)==j-1: s,state = s-o,1 #from M
+			else: s = s-e #from Iy
+			k,j = k-1,j-1
+		else:
+			alignment[0].append('-')
+			alignment[1].append(aminoAcids[codesB[i-1]])
+			if offsetAt(waves,s-o,1,k+1)==j: s,state = s-o,1 #from M
+			else: s = s-e #from Ix
+			k = k+1
+	return score,''.join(reversed(alignment[0])),''.join(reversed(alignment[1]))
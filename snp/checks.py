@@ -0,0 +1,80 @@
+"""This is a Python script that checks the statistics and the lookups of
+the snps: the no-calls and the call rates of snpstats.py on hemizygous
+data, and, if a genome directory is given (see genome.py), the lookups by
+identifier in its regions (see lookup.py) against a scan of each region.
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import sys
+from genome import loadGenome,parseRegion
+from snpstats import SnpStatistics,NOCALL
+
+def checkRegions(genomePath):
+	"""Check the lookups in the regions of a genome (each chromosome, and
+	its middle third) against a scan of the region: each identifier of the
+	region is found at its first row in the region, and the identifiers of
+	the snps around the region are not found unless they are in it too.
+	Returns the number of failures, or None if the genome can not be read.
+	"""
+
+	genome = loadGenome(genomePath)
+	if genome==None:
+		return
+	failures = 0
+	for code,name in enumerate(genome.chromosomes):
+		chromosome = genome.view(genome.regionRows(name))
+		if len(chromosome)==0:
+			continue
+		low,high = chromosome.position[len(chromosome)/3],chromosome.position[2*len(chromosome)/3]
+		for region in [name,name+":"+str(low)+"-"+str(high)]:
+			view = genome.region(region)
+			rsids = [view.rsid(row) for row in range(len(view))]
+			expected = {}
+			for row,rsid in enumerate(rsids):
+				expected.setdefault(rsid,row)
+			rows = view.lookup(rsids)
+			wrong = [rsid for rsid,row in zip(rsids,rows) if row!=expected[rsid]]
+			# - the snps just before and after the region
+			rowRange = genome.regionRows(*parseRegion(region))
+			around = [genome.rsid(row) for row in range(max(0,rowRange.start-5),min(len(genome),rowRange.stop+5))\
+				if not rowRange.start <= row < rowRange.stop]
+			wrong += [rsid for rsid,row in zip(around,view.lookup(around)) if row!=expected.get(rsid,-1)]
+			if wrong:
+				failures += 1
+				print "Lookup in "+region+" is wrong for "+", ".join(wrong[:5])
+	print "Lookups in the regions checked: "+str(failures)+" failures"
+	return failures
+
+def checkNoCalls():
+	"""Check that the no-calls and the call rate agree on hemizygous data
+	(X with A, -, -- and AG genotypes). Returns the number of failures.
+	"""
+
+	statistics = SnpStatistics()
+	statistics.addRecords([["rs1","X","1","A"],["rs2","X","2","-"],["rs3","X","3","--"],["rs4","X","4","AG"],\
+		["i5","1","5","--"],["rs6","1","6","CC"]])
+	classes = statistics.classCounts()
+	noCalls = statistics.noCalls()
+	X,first = statistics.chromosomes.index("X"),statistics.chromosomes.index("1")
+	failures = 0
+	if list(noCalls[[X,first]])!=[1,1] or list(classes[X])!=[0,1,2,1,0] or list(classes[first])!=[1,0,0,1,0]:
+		print "The no-calls are "+str(list(noCalls[[X,first]]))+" and the classes of X "+str(list(classes[X]))
+		failures += 1
+	if noCalls.sum()!=classes[:,NOCALL].sum() or classes[X].sum()-noCalls[X]!=3:
+		print "The no-calls and the call rate disagree."
+		failures += 1
+	print "No-calls checked: "+str(failures)+" failures"
+	return failures
+
+if __name__=="__main__":
+	if len(sys.argv) > 2:
+		print "Usage: python checks.py [genome_pa.genome]"
+		print "  check the no-calls of the statistics, and the lookups in the regions of a genome directory"
+		exit(0)
+	failures = checkNoCalls()
+	if len(sys.argv)==2:
+		regionFailures = checkRegions(sys.argv[1])
+		failures += 1 if regionFailures==None else regionFailures
+	exit(1 if failures else 0)
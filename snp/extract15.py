@@ -1,45 +1,102 @@
-"""This is a Python script that reads the pickled data file downloaded from
-23andMe, and extracts chromosome 15 data.
+"""This is a Python script that reads the snp data downloaded from 23andMe,
+and extracts chromosome 15 data (or the data of any chromosomes or regions,
+e.g. chr15:28,000,000-28,500,000 for OCA2/HERC2).
 
-Run txt2p.py first.
+The data is read from a genome directory (see genome.py), where the snps
+of a chromosome are found at once and the ones of a region by a binary
+search, or from the pickled file of txt2p.py, which is scanned as a whole.
+
+Run txt2p.py (and genome.py) first.
 
 Author: Paula Petcu
 Created: 1 October 2011
 Licensed under: GNU General Public License v2
 """
 
+import os
 import cPickle
 import sys
+from txt2p import dumpRecords
+from genome import loadGenome,writeGenome,parseRegion
 
-def extractChr15(snpFileName,chr15FileName):
-	""" Save the data for chromosome 15 in a file. snpFileName is the
-	file with the entire list of personal snp data
+def readRegions(snpFileName,regions):
+	"""Return the snps of each region (see genome.parseRegion), as lists of
+	[rsid, chromosome, position, genotype] records, from a genome directory
+	or a pickled file. Returns None if a region or the file is not valid.
 	"""
-	
+
+	parsed = [parseRegion(region) for region in regions]
+	if None in parsed:
+		return
+	if os.path.isdir(snpFileName):
+		genome = loadGenome(snpFileName)
+		if genome==None:
+			return
+		return [list(genome.view(genome.regionRows(*region)).records()) for region in parsed]
+
 	# Read SNP pickle file (first row is ["rsid","chromosome","position","genotype"])
 	snpFile = open(snpFileName,"rb")
 	snps = cPickle.load(snpFile)
 	snpFile.close()
-	
-	# Select data for chromosome 15
-	chr15 = [snps[0]] # first line are the field names
+
+	# Select data for the regions
+	found = [[] for region in parsed]
 	for line in snps[1:]:
-		if line[1] == "15":
-			chr15.append(line)
-	
-	# Dump chromosome 15 data
-	chr15File = open(chr15FileName,"wb")
-	cPickle.dump(chr15,chr15File)
-	chr15File.close()
-	
-	print "Output generated in file "+chr15FileName
-	return chr15FileName
-
-if len(sys.argv)!=2 and len(sys.argv)!=3:
-	print "Usage: extract15.py genome_pa_snp.p"
-	print "Usage: extract15.py genome_pa_snp.p chr15.p"
-	exit(0)
-elif len(sys.argv)==2:
-	extractChr15(snpFileName=sys.argv[1],chr15FileName="chr15.p")
-else:
-	extractChr15(snpFileName=sys.argv[1],chr15FileName=sys.argv[2])
+		for i,(chromosome,start,end) in enumerate(parsed):
+			if line[1]==chromosome and (start==None or start <= int(line[2]) <= end):
+				found[i].append(line)
+	return found
+
+def extractRegions(snpFileName,regions,outputFileName):
+	""" Save the data of some chromosomes or regions in a file: a pickled file
+	as the one of txt2p.py, or a genome directory if its name ends with
+	.genome. snpFileName is the file (or genome directory) with the entire
+	list of personal snp data
+	"""
+
+	found = readRegions(snpFileName,regions)
+	if found==None:
+		return
+
+	# Dump the data of the regions
+	if outputFileName.endswith(".genome"):
+		writeGenome(found,outputFileName)
+	else:
+		outputFile = open(outputFileName,"wb")
+		dumpRecords(found,outputFile)
+		outputFile.close()
+
+	print "Output generated in file "+outputFileName+" ("+str(sum([len(snps) for snps in found]))+" snps)"
+	return outputFileName
+
+def extractChr15(snpFileName,chr15FileName):
+	""" Save the data for chromosome 15 in a file. snpFileName is the
+	file with the entire list of personal snp data
+	"""
+
+	return extractRegions(snpFileName,["15"],chr15FileName)
+
+if __name__=="__main__":
+	# Options (e.g. --regions="chr15:28,000,000-28,500,000;X") can be given anywhere on the command line
+	options = {}
+	for arg in sys.argv[1:]:
+		if arg.startswith("--"):
+			name,_,value = arg[2:].partition("=")
+			options[name] = value
+	args = [arg for arg in sys.argv if not arg.startswith("--")]
+
+	if (len(args)!=2 and len(args)!=3) or not set(options).issubset(["regions"]):
+		print "Usage: extract15.py genome_pa_snp.p"
+		print "Usage: extract15.py genome_pa_snp.p chr15.p"
+		print "Usage: extract15.py genome_pa.genome regions.p --regions=\"chr15:28,000,000-28,500,000;X\""
+		print "  the data can be a pickled file of txt2p.py or a genome directory of genome.py"
+		print "  --regions: chromosomes (15, chrX) or regions (chr15:28000000-28500000), separated"
+		print "    by ';' or spaces, default chromosome 15"
+		print "  the output is a pickled file, or a genome directory if its name ends with .genome"
+		exit(0)
+	regions = options.get("regions","15").replace(";"," ").split()
+	if len(args)==3:
+		outputFileName = args[2]
+	else:
+		outputFileName = "chr15.p" if "regions" not in options else "regions.p"
+	extractRegions(args[1],regions,outputFileName)
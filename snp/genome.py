@@ -0,0 +1,397 @@
+"""Columnar binary store of the snp data of a 23andMe file, instead of the
+pickled list of [rsid, chromosome, position, genotype] lists of txt2p.py.
+
+A genome is a directory with one binary file per column, memory-mapped
+with NumPy when the genome is opened (so opening it is almost instant, and
+a scan only reads the columns it uses):
+- chromosome: uint8 code (index in the chromosome names: 1-22, X, Y, MT)
+- position: uint32
+- genotype: uint8 code (index in the genotype names, e.g. "AG", "--")
+- idType: uint8, RS for the rs identifiers, I for the internal ones (i...)
+  and OTHER for anything else
+- idNumber: uint32, the number of the identifier (rs123 => 123), or the
+  index of an OTHER identifier in the list of the other identifiers
+and the names, the other identifiers and the number of snps in genome.json.
+The snps are sorted by chromosome code and position, and genome.json also
+has the offset of the first snp of each chromosome code: the snps of a
+chromosome are found at once, and the ones of a region by a binary search
+on the positions of the chromosome, as views of the columns (not copies).
+The identifiers are indexed too: indexKeys has the keys of the identifiers
+(the type and the number, see idKey) in sorted order, and indexRows their
+rows, so many identifiers are looked up at once by a binary search.
+
+	python genome.py genome_pa.p    (or genome_pa.txt, .zip, .gz)
+	genome = loadGenome("genome_pa.genome")
+	oca2 = genome.region("chr15:28,000,000-28,500,000")
+	print len(oca2), oca2.record(0)
+	rows = genome.lookup(["rs12913832","rs1805007"]) # - -1 if not found
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import os
+import gc
+import sys
+import json
+import shutil
+import cPickle
+from array import array
+import numpy
+from txt2p import CHUNK,readRecords
+
+FORMAT = "GENOME03"
+# - the columns: name, NumPy type, type code of the array module
+columns = [("chromosome","uint8","B"),("position","uint32","I"),("genotype","uint8","B"),\
+	("idType","uint8","B"),("idNumber","uint32","I")]
+chromosomeNames = [""]+[str(i) for i in range(1,23)]+["X","Y","MT"] # - code 0 is not used
+genotypeNames = ["--"]+[a+b for a in "ACGT" for b in "ACGT" if a<=b]+list("ACGT")+["DD","DI","II","D","I"]
+RS, I, OTHER = 0,1,2 # types of identifiers
+MAXNUMBER = 2**32-1 # larger identifier numbers are OTHER identifiers
+
+class Genome(object):
+	"""The columns of a genome (NumPy arrays, memory-mapped if it was loaded
+	from a directory), with the names of the chromosome and genotype codes
+	and the OTHER identifiers.
+	"""
+
+	def __init__(self,arrays,chromosomes,genotypes,otherIds,offsets,indexKeys,indexRows,firstRow=0):
+		for name,dtype,typecode in columns:
+			setattr(self,name,arrays[name])
+		self.chromosomes = chromosomes
+		self.genotypes = genotypes
+		self.otherIds = otherIds
+		self.offsets = offsets # - the snps of chromosome code c are offsets[c]:offsets[c+1]
+		self.indexKeys = indexKeys # - the index of the identifiers of the whole genome (shared by the views)
+		self.indexRows = indexRows
+		self.firstRow = firstRow # - the row of the whole genome of row 0 (for a view)
+		self.otherNumbers = None
+
+	def __len__(self):
+		return len(self.position)
+
+	def chromosomeCode(self,name):
+		"""Return the code of a chromosome name, None if it is not in the
+		genome.
+		"""
+
+		return self.chromosomes.index(name) if name in self.chromosomes else None
+
+	def regionRows(self,chromosome,start=None,end=None):
+		"""Return the rows (a slice) of the snps of a chromosome (its name),
+		or of the ones at positions start to end (included) on it.
+		"""
+
+		code = self.chromosomeCode(chromosome)
+		if code==None:
+			return slice(0,0)
+		first,last = int(self.offsets[code]),int(self.offsets[code+1])
+		positions = self.position[first:last]
+		if start!=None:
+			first,last = first+int(positions.searchsorted(start,"left")),first+int(positions.searchsorted(end,"right"))
+		return slice(first,last)
+
+	def view(self,rows):
+		"""Return the snps of the rows (a slice, with no step) as a Genome
+		sharing the columns and the index of this one.
+		"""
+
+		arrays = dict((name,getattr(self,name)[rows]) for name,dtype,typecode in columns)
+		start,stop,step = rows.indices(len(self))
+		offsets = numpy.clip(self.offsets-start,0,max(0,stop-start))
+		return Genome(arrays,self.chromosomes,self.genotypes,self.otherIds,offsets,\
+			self.indexKeys,self.indexRows,self.firstRow+start)
+
+	def region(self,region):
+		"""Return the snps of a region (see parseRegion) as a view (see view),
+		or None if the region is not valid.
+		"""
+
+		parsed = parseRegion(region)
+		if parsed==None:
+			return
+		return self.view(self.regionRows(*parsed))
+
+	def lookup(self,rsids):
+		"""Return the rows of identifiers (e.g. "rs12913832"), as a NumPy array
+		with -1 for the ones that are not in the genome (or in the view: the
+		index of the whole genome is used, keeping only the rows of the view).
+		The first row of an identifier found more than once is returned.
+		"""
+
+		if self.otherNumbers==None:
+			self.otherNumbers = dict((rsid,number) for number,rsid in enumerate(self.otherIds))
+		keys = numpy.array([idKey(rsid,self.otherNumbers) for rsid in rsids],dtype="uint64")
+		rows = numpy.zeros(len(keys),dtype="int64")-1
+		if len(self.indexKeys)==0 or len(self)==0:
+			return rows
+		# - the rows of a key are indexRows[first:last], in increasing order
+		first,last = self.indexKeys.searchsorted(keys,"left"),self.indexKeys.searchsorted(keys,"right")
+		start,stop = self.firstRow,self.firstRow+len(self)
+		found = self.indexRows[first.clip(0,len(self.indexRows)-1)].astype("int64")
+		inside = (first < last) & (found >= start) & (found < stop)
+		rows[inside] = found[inside]-start
+		# - identifiers found more than once, the first row being before the view
+		for query in numpy.nonzero((last-first > 1) & (found < start))[0]:
+			run = self.indexRows[first[query]:last[query]]
+			position = int(run.searchsorted(start))
+			if position < len(run) and run[position] < stop:
+				rows[query] = int(run[position])-start
+		return rows
+
+	def rsid(self,index):
+		"""Return the identifier of a snp (e.g. "rs4477212").
+		"""
+
+		idType,idNumber = self.idType[index],int(self.idNumber[index])
+		if idType==RS:
+			return "rs"+str(idNumber)
+		if idType==I:
+			return "i"+str(idNumber)
+		return self.otherIds[idNumber]
+
+	def record(self,index):
+		"""Return a snp as the [rsid, chromosome, position, genotype] strings of
+		txt2p.py.
+		"""
+
+		return [self.rsid(index),self.chromosomes[self.chromosome[index]],str(self.position[index]),\
+			self.genotypes[self.genotype[index]]]
+
+	def records(self,indices=None):
+		"""Generate the snps (all of them, or the ones at the given indices) as
+		in record.
+		"""
+
+		for index in (xrange(len(self)) if indices==None else indices):
+			yield self.record(index)
+
+def parseRegion(region):
+	"""Parse a region: a chromosome ("15", "chrX") or positions on it
+	("chr15:28,000,000-28,500,000", "15:28000000", 1-based and included).
+	Returns (chromosome,start,end), with None for the start and the end of a
+	whole chromosome, or None if the region is not valid.
+	"""
+
+	chromosome,_,positions = region.strip().partition(":")
+	if chromosome.lower().startswith("chr"):
+		chromosome = chromosome[3:]
+	if chromosome=="M":
+		chromosome = "MT"
+	if not chromosome:
+		print "Not a valid region: "+region
+		return
+	if not positions:
+		return chromosome,None,None
+	start,_,end = positions.replace(",","").partition("-")
+	try:
+		start = int(start)
+		end = int(end) if end else start
+	except ValueError:
+		print "Not a valid region: "+region
+		return
+	return chromosome,start,end
+
+def parseId(rsid):
+	"""Return the type and the number of an rs or i identifier (rs or i
+	followed by a number), or None for the OTHER identifiers.
+	"""
+
+	for prefix,idType in [("rs",RS),("i",I)]:
+		number = rsid[len(prefix):]
+		if rsid.startswith(prefix) and number.isdigit() and int(number) <= MAXNUMBER and str(int(number))==number:
+			return idType,int(number)
+
+def splitId(rsid,otherIds):
+	"""Return the type and the number of an identifier (adding it to the
+	OTHER identifiers if it is not rs or i followed by a number).
+	"""
+
+	parsed = parseId(rsid)
+	if parsed!=None:
+		return parsed
+	otherIds.append(rsid)
+	return OTHER,len(otherIds)-1
+
+def idKey(rsid,otherNumbers):
+	"""Return the key of an identifier in the index: its type in the high 32
+	bits and its number in the low ones (otherNumbers gives the numbers of
+	the OTHER identifiers). An unknown identifier gets a key that is never
+	in the index.
+	"""
+
+	parsed = parseId(rsid)
+	if parsed!=None:
+		return parsed[0] << 32 | parsed[1]
+	if rsid in otherNumbers:
+		return OTHER << 32 | otherNumbers[rsid]
+	return 2**64-1
+
+def writeGenome(batches,genomePath):
+	"""Write the batches of [rsid, chromosome, position, genotype] records
+	(see txt2p.readRecords) as a genome directory, one batch at a time.
+	Returns the number of snps written, or None if the records can not be
+	written (nothing is left of the genome then, see removeGenome).
+	"""
+
+	created = not os.path.isdir(genomePath)
+	if created:
+		os.makedirs(genomePath)
+	chromosomes,genotypes,otherIds = list(chromosomeNames),list(genotypeNames),[]
+	chromosomeCodes = dict((name,code) for code,name in enumerate(chromosomes))
+	genotypeCodes = dict((name,code) for code,name in enumerate(genotypes))
+	columnFiles = {}
+	written = False
+	try:
+		for name,dtype,typecode in columns:
+			columnFiles[name] = open(os.path.join(genomePath,name+".bin"),"wb")
+		count = 0
+		for batch in batches:
+			values = dict((name,array(typecode)) for name,dtype,typecode in columns)
+			for record in batch:
+				try:
+					rsid,chromosome,position,genotype = record
+					position = int(position)
+				except ValueError:
+					print "Not a valid snp record: "+"\t".join(record)
+					return
+				if (chromosome not in chromosomeCodes and len(chromosomes)==256) or\
+				 (genotype not in genotypeCodes and len(genotypes)==256):
+					print "Too many different chromosomes or genotypes for the uint8 codes."
+					return
+				if chromosome not in chromosomeCodes:
+					chromosomeCodes[chromosome] = len(chromosomes)
+					chromosomes.append(chromosome)
+				if genotype not in genotypeCodes:
+					genotypeCodes[genotype] = len(genotypes)
+					genotypes.append(genotype)
+				idType,idNumber = splitId(rsid,otherIds)
+				values["chromosome"].append(chromosomeCodes[chromosome])
+				values["position"].append(position)
+				values["genotype"].append(genotypeCodes[genotype])
+				values["idType"].append(idType)
+				values["idNumber"].append(idNumber)
+			for name,dtype,typecode in columns:
+				numpy.frombuffer(values[name],dtype=dtype).tofile(columnFiles[name])
+			count += len(batch)
+		for columnFile in columnFiles.values():
+			columnFile.close()
+		offsets = sortColumns(genomePath,count,len(chromosomes))
+		indexIds(genomePath)
+		metaFile = open(os.path.join(genomePath,"genome.json"),"w")
+		json.dump({"format":FORMAT,"count":count,"chromosomes":chromosomes,"genotypes":genotypes,\
+			"otherIds":otherIds,"offsets":offsets},metaFile)
+		metaFile.close()
+		written = True
+	finally:
+		for columnFile in columnFiles.values():
+			columnFile.close()
+		if not written:
+			removeGenome(genomePath,created)
+	return count
+
+def removeGenome(genomePath,created):
+	"""Remove a genome that could not be written: the whole directory if it
+	was created for it, and otherwise only the files of a genome in it.
+	"""
+
+	if created:
+		shutil.rmtree(genomePath,ignore_errors=True)
+		return
+	for fileName in [name+".bin" for name,dtype,typecode in columns]+["indexKeys.bin","indexRows.bin","genome.json"]:
+		if os.path.isfile(os.path.join(genomePath,fileName)):
+			os.remove(os.path.join(genomePath,fileName))
+
+def sortColumns(genomePath,count,numChromosomes):
+	"""Sort the columns of a genome directory by chromosome code and position
+	(a stable sort: the 23andMe files are usually sorted already, and then
+	nothing is written). Returns the offsets of the chromosome codes.
+	"""
+
+	chromosome = numpy.fromfile(os.path.join(genomePath,"chromosome.bin"),dtype="uint8")
+	position = numpy.fromfile(os.path.join(genomePath,"position.bin"),dtype="uint32")
+	if count > 1 and ((chromosome[1:] < chromosome[:-1]) |\
+	 ((chromosome[1:]==chromosome[:-1]) & (position[1:] < position[:-1]))).any():
+		order = numpy.lexsort((position,chromosome))
+		for name,dtype,typecode in columns:
+			path = os.path.join(genomePath,name+".bin")
+			numpy.fromfile(path,dtype=dtype)[order].tofile(path)
+		chromosome = chromosome[order]
+	return [int(offset) for offset in chromosome.searchsorted(numpy.arange(numChromosomes+1),"left")]
+
+def indexIds(genomePath):
+	"""Write the index of the identifiers of a genome directory (a stable
+	sort of their keys: the first snp of an identifier is found first).
+	"""
+
+	idType = numpy.fromfile(os.path.join(genomePath,"idType.bin"),dtype="uint8")
+	idNumber = numpy.fromfile(os.path.join(genomePath,"idNumber.bin"),dtype="uint32")
+	keys = idType.astype("uint64") << numpy.uint64(32) | idNumber
+	order = keys.argsort(kind="mergesort")
+	keys[order].tofile(os.path.join(genomePath,"indexKeys.bin"))
+	order.astype("uint32").tofile(os.path.join(genomePath,"indexRows.bin"))
+
+def loadGenome(genomePath):
+	"""Open a genome directory, memory-mapping its columns. Returns the
+	Genome, or None if it is not a genome directory.
+	"""
+
+	try:
+		metaFile = open(os.path.join(genomePath,"genome.json"),"r")
+		meta = json.load(metaFile)
+		metaFile.close()
+	except (IOError,ValueError):
+		print "Not a genome directory: "+genomePath
+		return
+	if meta.get("format")!=FORMAT:
+		print "Unknown genome format: "+str(meta.get("format"))+" (convert the genome again with genome.py)"
+		return
+	arrays = {}
+	for name,dtype in [(name,dtype) for name,dtype,typecode in columns]+[("indexKeys","uint64"),("indexRows","uint32")]:
+		if meta["count"]==0:
+			arrays[name] = numpy.zeros(0,dtype=dtype) # - an empty file can not be mapped
+		else:
+			arrays[name] = numpy.memmap(os.path.join(genomePath,name+".bin"),dtype=dtype,mode="r",shape=(meta["count"],))
+	return Genome(arrays,[str(name) for name in meta["chromosomes"]],[str(name) for name in meta["genotypes"]],\
+		[str(rsid) for rsid in meta["otherIds"]],numpy.array(meta["offsets"]),arrays["indexKeys"],arrays["indexRows"])
+
+def pickleBatches(snpFileName,chunkSize=CHUNK):
+	"""Generate the records of a pickled file of txt2p.py in batches (the
+	pickle is read as a whole, as cPickle can only load it at once).
+	"""
+
+	snpFile = open(snpFileName,"rb")
+	gc.disable() # - the collector would scan the lists again and again while they are loaded
+	try:
+		snps = cPickle.load(snpFile)
+	finally:
+		gc.enable()
+		snpFile.close()
+	for start in range(1,len(snps),chunkSize): # - the first row is the field names
+		yield snps[start:start+chunkSize]
+
+def convertGenome(fileName,genomePath):
+	"""Convert a pickled file of txt2p.py (.p), or a 23andMe file (.txt, .zip,
+	.gz, read as a stream), to a genome directory.
+	"""
+
+	batches = pickleBatches(fileName) if fileName.endswith(".p") else readRecords(fileName)
+	count = writeGenome(batches,genomePath)
+	if count!=None:
+		print "Output generated in directory "+genomePath+" ("+str(count)+" snps)"
+	return genomePath
+
+if __name__=="__main__":
+	if len(sys.argv)!=2 and len(sys.argv)!=3:
+		print "Usage: python genome.py genome_pa.p"
+		print "Usage: python genome.py genome_pa.p genome_pa.genome"
+		print "  the input can also be the 23andMe file (.txt, .zip or .gz)"
+		exit(0)
+	elif len(sys.argv)==2:
+		genomePath = sys.argv[1]
+		for ext in [".gz",".zip",".txt",".p"]:
+			if genomePath.endswith(ext):
+				genomePath = genomePath[:-len(ext)]
+		convertGenome(sys.argv[1],genomePath+".genome")
+	else:
+		convertGenome(sys.argv[1],sys.argv[2])
@@ -0,0 +1,71 @@
+"""This is a Python script that looks up snps by their identifiers (e.g.
+rs12913832) in a genome directory (see genome.py), using its index of the
+identifiers: the identifiers are looked up all at once, so thousands of
+them take about as long as one. The lookup can be restricted to a region
+(e.g. chr15:28,000,000-28,500,000, see genome.parseRegion).
+
+Run genome.py first.
+
+Created: 18 October 2026
+Licensed under: GNU General Public License v2
+"""
+
+import os
+import sys
+from genome import loadGenome
+
+def readIds(idFileName):
+	"""Return the identifiers of a file (separated by spaces or new lines),
+	or of the standard input if idFileName is "-".
+	"""
+
+	idFile = sys.stdin if idFileName=="-" else open(idFileName,"r")
+	rsids = idFile.read().split()
+	if idFile!=sys.stdin:
+		idFile.close()
+	return rsids
+
+def lookupIds(genomePath,rsids,output=sys.stdout,region=None):
+	"""Write the snp of each identifier (TAB-separated: rsid, chromosome,
+	position, genotype) to the output, or "not found" (in the region, if one
+	is given). Returns the number of identifiers found, or None if the genome
+	can not be read or the region is not valid.
+	"""
+
+	if not os.path.isdir(genomePath):
+		print "Not a genome directory: "+genomePath+" (convert the genome with genome.py first)"
+		return
+	genome = loadGenome(genomePath)
+	if genome==None:
+		return
+	if region!=None:
+		genome = genome.region(region)
+		if genome==None:
+			return
+	rows = genome.lookup(rsids)
+	for rsid,row in zip(rsids,rows):
+		if row < 0:
+			output.write(rsid+"\tnot found\n")
+		else:
+			output.write("\t".join(genome.record(row))+"\n")
+	return int((rows >= 0).sum())
+
+if __name__=="__main__":
+	# Options (e.g. --file=rsids.txt) can be given anywhere on the command line
+	options = {}
+	for arg in sys.argv[1:]:
+		if arg.startswith("--"):
+			name,_,value = arg[2:].partition("=")
+			options[name] = value
+	args = [arg for arg in sys.argv if not arg.startswith("--")]
+
+	if len(args) < 2 or not set(options).issubset(["file","region"]) or (len(args)==2 and "file" not in options):
+		print "Usage: python lookup.py genome_pa.genome rs12913832 rs1805007 ..."
+		print "Usage: python lookup.py genome_pa.genome --file=rsids.txt"
+		print "  --file: file of identifiers, separated by spaces or new lines ('-' for the standard input)"
+		print "  --region: only look up in a region (chr15:28,000,000-28,500,000) or a chromosome"
+		exit(0)
+	rsids = args[2:]
+	if "file" in options:
+		rsids += readIds(options["file"])
+	lookupIds(args[1],rsids,region=options.get("region"))
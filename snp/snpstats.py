@@ -1,64 +1,211 @@
 """This is a Python script that prints some statistics about the data
-contained in a pickled 23andMe data file (i.e. total number of SNPs,
-number of SNPs per chromosome, etc.) 
+contained in a 23andMe data file (i.e. total number of SNPs, number of
+SNPs per chromosome, call rate and heterozygosity rate per chromosome,
+etc.)
 
-Run txt2p.py first.
+The data can be a pickled file of txt2p.py, a genome directory of
+genome.py, or the 23andMe file itself (.txt, .zip or .gz), which is read
+as a stream without building the pickle. It is read in a single pass, in
+batches: the snps of a batch are coded as integers (chromosome, genotype
+and type of identifier) and counted at once with NumPy (see
+SnpStatistics); the statistics are computed from these counts at the end.
+
+Run txt2p.py (or genome.py) first, or give the 23andMe file.
 
 Author: Paula Petcu
 Created: 24 September 2011
 Licensed under: GNU General Public License v2
 """
 
-import cPickle
 import os
 import sys
+import numpy
+from txt2p import readRecords
+from genome import chromosomeNames,RS,I,OTHER,loadGenome,pickleBatches
+
+# - the classes of the genotypes
+genotypeClasses = ["homozygous","heterozygous","hemizygous","no-call","other"]
+HOMOZYGOUS, HETEROZYGOUS, HEMIZYGOUS, NOCALL, OTHERCLASS = range(len(genotypeClasses))
+
+def genotypeClass(genotype):
+	"""Return the class of a genotype: HOMOZYGOUS (AA, DD), HETEROZYGOUS
+	(AG, DI), HEMIZYGOUS (A, -, on X, Y and MT), NOCALL (--, the only no-call,
+	as counted by snpstats.py since the beginning) or OTHERCLASS.
+	"""
+
+	if genotype=="--":
+		return NOCALL
+	if len(genotype)==1:
+		return HEMIZYGOUS
+	if len(genotype)==2:
+		return HOMOZYGOUS if genotype[0]==genotype[1] else HETEROZYGOUS
+	return OTHERCLASS
+
+def idTypeOf(rsid):
+	"""Return the type of an identifier, as the counts of snpstats.py have
+	always done it: RS if it starts with rs, I if it starts with i.
+	"""
+
+	return RS if rsid.startswith("rs") else (I if rsid.startswith("i") else OTHER)
+
+class SnpStatistics(object):
+	"""Counts of the snps per chromosome, genotype and type of identifier
+	(a NumPy array indexed by the codes of the three), added batch by batch.
+	The chromosome and genotype names get their codes as they are found.
+	"""
+
+	def __init__(self):
+		self.chromosomes = chromosomeNames[1:] # - the usual ones first, in this order
+		self.genotypes = []
+		self.counts = numpy.zeros((len(self.chromosomes),0,3),dtype="int64")
+
+	def codes(self,names,known):
+		"""Return the codes of some names (a NumPy array), adding the new ones
+		to the known names.
+		"""
+
+		for name in names:
+			if name not in known:
+				known.append(name)
+		position = dict((name,code) for code,name in enumerate(known))
+		return numpy.array([position[name] for name in names],dtype="int64")
+
+	def addCodes(self,chromosomeCodes,genotypeCodes,idTypes):
+		"""Count snps given by the codes of their chromosomes and genotypes and
+		the types of their identifiers (NumPy arrays).
+		"""
+
+		numChromosomes,numGenotypes = len(self.chromosomes),len(self.genotypes)
+		if self.counts.shape[:2]!=(numChromosomes,numGenotypes):
+			# - new names were coded: grow the counts
+			counts = numpy.zeros((numChromosomes,numGenotypes,3),dtype="int64")
+			counts[:self.counts.shape[0],:self.counts.shape[1]] = self.counts
+			self.counts = counts
+		keys = (chromosomeCodes*numGenotypes+genotypeCodes)*3+idTypes
+		self.counts += numpy.bincount(keys,minlength=self.counts.size).reshape(self.counts.shape)
+
+	def addRecords(self,records):
+		"""Count a batch of [rsid, chromosome, position, genotype] records.
+		"""
+
+		if not records:
+			return
+		columns = numpy.array(records,dtype=str)
+		# - each distinct name is coded once per batch
+		names,inverse = numpy.unique(columns[:,1],return_inverse=True)
+		chromosomeCodes = self.codes(list(names),self.chromosomes)[inverse]
+		names,inverse = numpy.unique(columns[:,3],return_inverse=True)
+		genotypeCodes = self.codes(list(names),self.genotypes)[inverse]
+		# - the prefixes of the identifiers, by truncating them
+		idTypes = numpy.where(columns[:,0].astype("S2")=="rs",RS,numpy.where(columns[:,0].astype("S1")=="i",I,OTHER))
+		self.addCodes(chromosomeCodes,genotypeCodes,idTypes)
+
+	def addGenome(self,genome):
+		"""Count the snps of a Genome (see genome.py), from its columns.
+		"""
+
+		if len(genome)==0:
+			return
+		chromosomeCodes = self.codes(genome.chromosomes,self.chromosomes)[genome.chromosome]
+		genotypeCodes = self.codes(genome.genotypes,self.genotypes)[genome.genotype]
+		# - the OTHER identifiers are typed by their names, as in addRecords
+		otherTypes = numpy.array([idTypeOf(rsid) for rsid in genome.otherIds]+[OTHER],dtype="int64")
+		idTypes = numpy.where(genome.idType==OTHER,otherTypes[numpy.minimum(genome.idNumber,len(genome.otherIds))],genome.idType)
+		self.addCodes(chromosomeCodes,genotypeCodes,idTypes)
+
+	def perChromosome(self):
+		"""Return the chromosomes to report: the usual ones and any other one
+		that has snps.
+		"""
+
+		return [code for code,name in enumerate(self.chromosomes) if code < len(chromosomeNames)-1 or self.counts[code].sum() > 0]
+
+	def classCounts(self):
+		"""Return the numbers of snps per chromosome and genotype class.
+		"""
+
+		classes = numpy.array([genotypeClass(genotype) for genotype in self.genotypes],dtype="int64")
+		counts = numpy.zeros((len(self.chromosomes),len(genotypeClasses)),dtype="int64")
+		for genotypeClassCode in range(len(genotypeClasses)):
+			counts[:,genotypeClassCode] = self.counts[:,classes==genotypeClassCode,:].sum(axis=(1,2))
+		return counts
+
+	def noCalls(self):
+		"""Return the numbers of no-calls per chromosome (the NOCALL class of
+		classCounts, used by all the statistics of the no-calls).
+		"""
+
+		return self.classCounts()[:,NOCALL]
+
+def readStatistics(fileName):
+	"""Count the snps of a file: a pickled file of txt2p.py (.p), a genome
+	directory, or a 23andMe file (.txt, .zip, .gz, read as a stream).
+	Returns the SnpStatistics, or None if the file can not be read.
+	"""
+
+	statistics = SnpStatistics()
+	if os.path.isdir(fileName):
+		genome = loadGenome(fileName)
+		if genome==None:
+			return
+		statistics.addGenome(genome)
+		return statistics
+	batches = pickleBatches(fileName) if fileName.endswith(".p") else readRecords(fileName)
+	for batch in batches:
+		statistics.addRecords(batch)
+	return statistics
 
 def printStatistics(snpFileName):
-	"""Read the dumped SNP data and print some statistics
+	"""Read the SNP data and print some statistics
 	"""
-	
-	snpFile = open(snpFileName,"rb")
-	snps = cPickle.load(snpFile)
-	snpFile.close()
-	
+
+	statistics = readStatistics(snpFileName)
+	if statistics==None:
+		return
+	counts = statistics.counts
+	byType = counts.sum(axis=(0,1))
+	byChromosome = counts.sum(axis=1)
+	classes = statistics.classCounts()
+	noCalls = statistics.noCalls()
+
 	print "# Number of SNPs: "
-	print str(len(snps)-1) # first row is column title
-	
-	RS = 0
-	I = 0
-	NC = 0
-	snpsPerChrom = {'X':[0,0,0,0],'Y':[0,0,0,0],'MT':[0,0,0,0]}
-	for i in range(1,23): snpsPerChrom[str(i)] = [0,0,0,0]
-	for line in snps[1:]:
-		snpsPerChrom[line[1]][0] += 1
-		if line[0].startswith("rs"): 
-			RS += 1
-			snpsPerChrom[line[1]][1] += 1
-		elif line[0].startswith("i"): 
-			I += 1
-			snpsPerChrom[line[1]][2] += 1
-		if line[3] == '--':
-			NC += 1
-			snpsPerChrom[line[1]][3] += 1
-	
+	print str(counts.sum())
 	print "# Number of rs identifiers: "
-	print str(RS)
+	print str(byType[RS])
 	print "# Number of internal identifiers: "
-	print str(I)
+	print str(byType[I])
 	print "# Number of no-calls: "
-	print str(NC)
+	print str(noCalls.sum())
 	print "# Number of SNPs per chromosome (total number of snps, number of rsid, \
 	number of iid, number of no-call genotypes): "
-	#print str(snpsPerChrom)
-	for elem in snpsPerChrom:
-		print elem+" "+" ".join(str(snpsPerChrom[elem])[1:-1].split(","))
-
-if len(sys.argv)!=2:
-	print "Usage: python snpstats.py snps.p"
-	exit(0)
-else:
-	if not sys.argv[1].endswith('.p'):
-		print "Not a valid filetype. Run 'python txt2p.py genome_you.txt' first."
+	for code in statistics.perChromosome():
+		snpsPerChrom = [int(byChromosome[code].sum()),int(byChromosome[code][RS]),int(byChromosome[code][I]),int(noCalls[code])]
+		print statistics.chromosomes[code]+" "+" ".join(str(snpsPerChrom)[1:-1].split(","))
+	print "# Call rate and heterozygosity rate per chromosome (called genotypes / snps, \
+	heterozygous / diploid called genotypes): "
+	for code in statistics.perChromosome():
+		total = classes[code].sum()
+		diploid = classes[code][HOMOZYGOUS]+classes[code][HETEROZYGOUS]
+		callRate = "%.4f" % (1-float(noCalls[code])/total) if total else "-"
+		heterozygosity = "%.4f" % (float(classes[code][HETEROZYGOUS])/diploid) if diploid else "-"
+		print statistics.chromosomes[code]+" "+callRate+" "+heterozygosity
+	print "# Number of genotypes per class and chromosome ("+", ".join(genotypeClasses)+"): "
+	for code in statistics.perChromosome():
+		print statistics.chromosomes[code]+" "+" ".join([str(count) for count in classes[code]])
+	print "# Number of SNPs per genotype: "
+	byGenotype = counts.sum(axis=(0,2))
+	for code in numpy.argsort(statistics.genotypes):
+		if byGenotype[code] > 0: # - the genotype names of a genome directory are not all found
+			print statistics.genotypes[code]+" "+str(byGenotype[code])
+
+if __name__=="__main__":
+	if len(sys.argv)!=2:
+		print "Usage: python snpstats.py snps.p"
+		print "  the data can also be a genome directory of genome.py, or the 23andMe file (.txt, .zip or .gz)"
 		exit(0)
-	snpFileName = sys.argv[1]
-	printStatistics(snpFileName)
+	else:
+		snpFileName = sys.argv[1]
+		if not (os.path.isdir(snpFileName) or snpFileName.endswith(('.p','.txt','.zip','.gz'))):
+			print "Not a valid filetype. Run 'python txt2p.py genome_you.txt' first."
+			exit(0)
+		printStatistics(snpFileName)
@@ -1,43 +1,196 @@
-"""This is a Python script for reading the data file that can be downloaded 
+"""This is a Python script for reading the data file that can be downloaded
 from 23andMe. It reads the file and transforms it into a pickled file.
 
+The file can be the .txt file, or the downloaded .zip or .gz file. It is
+read as a stream of batches of records (see readRecords), so the memory
+used does not depend on the size of the file, and the other scripts can
+use the records without reading them all in memory.
+
+A large .txt file can also be converted by several processes (see
+dumpRanges): the file is memory-mapped and split into ranges of lines,
+each range is parsed and pickled by a process of a pool, and the pickles
+are written in order. The pickled file is the same as with one process.
+
 Author: Paula Petcu
 Created: 24 September 2011
 Licensed under: GNU General Public License v2
 """
 
+import io
+import os
+import gzip
+import mmap
+import zipfile
 import cPickle
 import sys
+import multiprocessing
+from array import array
 
-def readTxtFile(genomeFileName,snpFileName):
-	"""Read a 23andMe txt file with TAB-separated snp data into a list and 
-	dump the structure using pickle.
+CHUNK = 65536 # records per batch
+RANGESIZE = 8*2**20 # bytes of the file parsed at a time by a process
+fieldNames = ["rsid","chromosome","position","genotype"]
+
+def openGenome(genomeFileName):
+	"""Open a 23andMe file (.txt, .gz, or .zip with the .txt file in it) for
+	reading its lines.
 	"""
-	
-	genomeFile = open(genomeFileName,"r")
-	allLines = genomeFile.readlines()
-	genomeFile.close()
 
-	snps = [["rsid","chromosome","position","genotype"]]
-	for i,line in enumerate(allLines):
-		#if i%1000==0: print i
+	if genomeFileName.endswith(".gz"):
+		return io.BufferedReader(gzip.open(genomeFileName,"rb"))
+	if genomeFileName.endswith(".zip"):
+		archive = zipfile.ZipFile(genomeFileName)
+		names = [name for name in archive.namelist() if name.endswith(".txt")] or archive.namelist()
+		return archive.open(names[0])
+	return open(genomeFileName,"r")
+
+def readRecords(genomeFileName,chunkSize=CHUNK):
+	"""Generate the snp records of a 23andMe file ([rsid, chromosome, position,
+	genotype], as strings) in batches (lists) of chunkSize records.
+	"""
+
+	genomeFile = openGenome(genomeFileName)
+	batch = []
+	for line in genomeFile:
 		if not line[0]=="#":
-			info = line.rstrip().split('\t')
-			snps.append(info)
-	
+			batch.append(line.rstrip().split('\t'))
+			if len(batch)==chunkSize:
+				yield batch
+				batch = []
+	genomeFile.close()
+	if batch:
+		yield batch
+
+def dumpRecords(batches,snpFile):
+	"""Pickle the batches of records as one list (the field names first),
+	written batch by batch: the file is the same as with cPickle.dump on the
+	whole list, but the list is never in memory.
+	"""
+
+	# - protocol 2: an empty list, then the records of each batch appended at once
+	snpFile.write("\x80\x02]")
+	snpFile.write("("+pickleRecord(fieldNames)+"e")
+	for batch in batches:
+		snpFile.write("("+"".join([pickleRecord(record) for record in batch])+"e")
+	snpFile.write(".")
+
+def pickleRecord(record):
+	"""Return the pickle of a record, without its protocol header and STOP.
+	"""
+
+	return cPickle.dumps(record,2)[2:-1]
+
+def byteRanges(genomeFileName,rangeSize=RANGESIZE):
+	"""Return the (start,end) byte offsets of ranges of whole lines of a file,
+	of about rangeSize bytes each.
+	"""
+
+	size = os.path.getsize(genomeFileName)
+	if size==0:
+		return [] # - an empty file can not be mapped
+	genomeFile = open(genomeFileName,"rb")
+	data = mmap.mmap(genomeFile.fileno(),0,access=mmap.ACCESS_READ)
+	ranges = []
+	start = 0
+	while start < size:
+		# - the range ends after the first new line from start+rangeSize on
+		end = data.find("\n",min(start+rangeSize,size)-1)+1 or size
+		ranges.append((start,end))
+		start = end
+	data.close()
+	genomeFile.close()
+	return ranges
+
+def parseRange(arguments):
+	"""Parse and pickle the records of a range of lines of a file (the file
+	name, and the start and end offsets), as readRecords and dumpRecords do.
+	Returns the pickles of the records (one string) and the end offset of
+	each of them in the string (an array).
+	"""
+
+	genomeFileName,start,end = arguments
+	genomeFile = open(genomeFileName,"rb")
+	data = mmap.mmap(genomeFile.fileno(),0,access=mmap.ACCESS_READ)
+	lines = data[start:end].split("\n")
+	data.close()
+	genomeFile.close()
+	if lines[-1]=="":
+		lines.pop() # - after the last new line
+	pickles = [pickleRecord(line.rstrip().split('\t')) for line in lines if not line[:1]=="#"]
+	ends = array("I")
+	offset = 0
+	for pickle in pickles:
+		offset += len(pickle)
+		ends.append(offset)
+	return "".join(pickles),ends
+
+def dumpRanges(genomeFileName,snpFile,processes=None,rangeSize=RANGESIZE):
+	"""Parse a 23andMe txt file with a pool of processes (one range of lines
+	of the file at a time, see parseRange) and write the pickled list of its
+	records, the same as dumpRecords(readRecords(genomeFileName),snpFile).
+	"""
+
+	pool = multiprocessing.Pool(processes)
+	snpFile.write("\x80\x02]")
+	snpFile.write("("+pickleRecord(fieldNames)+"e")
+	pieces = [] # - the pickles of the current batch
+	count = 0 # - the number of records in the current batch
+	try:
+		for pickles,ends in pool.imap(parseRange,[(genomeFileName,start,end) for start,end in byteRanges(genomeFileName,rangeSize)]):
+			# - the records are appended CHUNK at a time, as in dumpRecords
+			used,offset = 0,0
+			while len(ends)-used >= CHUNK-count:
+				used += CHUNK-count
+				pieces.append(pickles[offset:ends[used-1]])
+				snpFile.write("("+"".join(pieces)+"e")
+				pieces,count,offset = [],0,ends[used-1]
+			pieces.append(pickles[offset:])
+			count += len(ends)-used
+	finally:
+		pool.terminate()
+	if count:
+		snpFile.write("("+"".join(pieces)+"e")
+	snpFile.write(".")
+
+def readTxtFile(genomeFileName,snpFileName,processes=1):
+	"""Read a 23andMe txt file with TAB-separated snp data into a list and
+	dump the structure using pickle (with a pool of processes, for a .txt
+	file larger than a range, see dumpRanges).
+	"""
+
 	snpFile = open(snpFileName,"wb")
-	cPickle.dump(snps,snpFile)
+	if processes > 1 and not genomeFileName.endswith((".gz",".zip")) and os.path.getsize(genomeFileName) > RANGESIZE:
+		dumpRanges(genomeFileName,snpFile,processes)
+	else:
+		dumpRecords(readRecords(genomeFileName),snpFile)
 	snpFile.close()
-	
+
 	print "Output generated in file "+snpFileName
 	return snpFileName
-	
-if len(sys.argv)!=2 and len(sys.argv)!=3:
-	print "Usage: txt2p.py genome_pa.txt"
-	print "Usage: txt2p.py genome_pa.txt genome_pa.p"
-	exit(0)
-elif len(sys.argv)==2:
-	readTxtFile(genomeFileName=sys.argv[1],snpFileName=sys.argv[1].replace(".txt",".p"))
-else:
-	readTxtFile(genomeFileName=sys.argv[1],snpFileName=sys.argv[2])
-	
\ No newline at end of file
+
+if __name__=="__main__":
+	# Options (e.g. --processes=4) can be given anywhere on the command line
+	options = {}
+	for arg in sys.argv[1:]:
+		if arg.startswith("--"):
+			name,_,value = arg[2:].partition("=")
+			options[name] = value
+	args = [arg for arg in sys.argv if not arg.startswith("--")]
+
+	if (len(args)!=2 and len(args)!=3) or not set(options).issubset(["processes"]) or\
+	 not options.get("processes","1").isdigit() or options.get("processes")=="0":
+		print "Usage: txt2p.py genome_pa.txt"
+		print "Usage: txt2p.py genome_pa.txt genome_pa.p"
+		print "  the genome file can also be the downloaded .zip or .gz file"
+		print "  --processes=N: number of processes parsing a large .txt file, default the number of cores"
+		exit(0)
+	processes = int(options["processes"]) if "processes" in options else multiprocessing.cpu_count()
+	if len(args)==2:
+		snpFileName = args[1]
+		for ext in [".gz",".zip"]:
+			if snpFileName.endswith(ext):
+				snpFileName = snpFileName[:-len(ext)]
+		if snpFileName.endswith(".txt"):
+			snpFileName = snpFileName[:-len(".txt")]
+		readTxtFile(genomeFileName=args[1],snpFileName=snpFileName+".p",processes=processes)
+	else:
+		readTxtFile(genomeFileName=args[1],snpFileName=args[2],processes=processes)